@@ -0,0 +1,329 @@
+# Bancada de desempenho sem janela: mede os caminhos quentes da simulação
+# (cálculo das posições do quadro, parse_number, construção e atualização das
+# órbitas e CameraController.update) no corpos.yaml distribuído e em catálogos
+# sintéticos de 10 a 100 mil corpos, e compara com a linha de base gravada nesta
+# máquina (benchmarks/linhas_base/, fora do controle de versão).
+#
+# Uso: python -m benchmarks.bancada                      # mede e compara com a linha de base
+#      python -m benchmarks.bancada --gravar-linha-base  # mede e grava a linha de base desta máquina
+#      python -m benchmarks.bancada --casos orbitas_construir --tamanhos 1000 10000
+import argparse, functools, gc, hashlib, json, os, platform, re, sys, time, tracemalloc
+
+import numpy as np
+import panda3d
+import yaml
+from panda3d.core import Camera, NodePath, PerspectiveLens
+
+from benchmarks.sinteticos import astros_sinteticos, valores_numericos
+from src.camera import CameraController
+from src.catalogo import AU, CAMINHO_PADRAO, MODEL_SIZE_FACTOR, compilar_catalogo, parse_number
+from src.efemerides import Efemerides
+from src.orbitas import Orbitas
+from src.simulacao import Simulacao, passo_kepleriano
+
+TAMANHOS_PADRAO = (10, 100, 1000, 10000, 100000)
+CATALOGO_DISTRIBUIDO = 'corpos.yaml'
+DIRETORIO_LINHAS_BASE = os.path.join(os.path.dirname(__file__), 'linhas_base')
+TEMPO_MIN_MEDICAO = 0.1   # Segundos por medição: o número de chamadas dobra até atingi-lo
+REPETICOES = 7            # Medições por caso; vale a mais rápida (a menos perturbada)
+CONFIRMACOES = 5          # Novas medições de um caso apontado como mais lento antes de acusar regressão
+PAUSA_CONFIRMACAO = 2.0   # Segundos entre elas: as perturbações da máquina duram alguns segundos
+TOLERANCIA_TEMPO = 0.25   # Alta relativa acima da qual o tempo é apontado como regressão
+TOLERANCIA_MEMORIA = 0.10
+DT_QUADRO = 1 / 60
+
+
+class _Janela:
+    """Janela falsa: CameraController só consulta a altura em pixels"""
+
+    def __init__(self, altura=720):
+        self.altura = altura
+
+    def getYSize(self):
+        return self.altura
+
+
+class AppSemJanela:
+    """O mínimo de ShowBase usado por CameraController, sem abrir janela nem contexto gráfico"""
+
+    def __init__(self):
+        self.render = NodePath('render')
+        self.camera = self.render.attachNewNode('camera')
+        self.cam = self.camera.attachNewNode(Camera('cam', PerspectiveLens()))
+        self.win = _Janela()
+
+    def disableMouse(self):
+        pass
+
+
+# Cada caso recebe o dicionário bruto dos astros e devolve a função medida,
+# já preparada (o preparo não entra na medição)
+
+def caso_calcular_posicoes(astros):
+    """Um quadro de SistemaSolar.calcular_posicoes: passo de física kepleriano síncrono e amostragem"""
+    catalogo = compilar_catalogo(astros)
+    efemerides = Efemerides.de_catalogo(catalogo, escala=AU * MODEL_SIZE_FACTOR)
+    simulacao = Simulacao(functools.partial(passo_kepleriano, efemerides), 0.0, lambda: 86400.0, sincrona=True)
+
+    def quadro():
+        simulacao.avancar(DT_QUADRO)
+        return simulacao.amostrar_quadro(efemerides)
+    return quadro
+
+
+def caso_parse_number(astros):
+    """Todos os valores numéricos do catálogo passados por parse_number"""
+    valores = valores_numericos(astros)
+
+    def converter():
+        return [parse_number(valor) for valor in valores]
+    return converter
+
+
+def caso_orbitas_construir(astros):
+    """Construção dos nós persistentes de todas as órbitas (laço de Orbitas.__init__)"""
+    efemerides = Efemerides.de_catalogo(compilar_catalogo(astros), escala=AU * MODEL_SIZE_FACTOR)
+
+    def construir():
+        raiz = NodePath('render')
+        orbitas = Orbitas(dict.fromkeys(range(len(efemerides.nomes)), raiz), efemerides)
+        raiz.removeNode()
+        return orbitas
+    return construir
+
+
+def caso_orbitas_atualizar(astros):
+    """Um quadro de Orbitas.atualizar com todas as órbitas visíveis"""
+    efemerides = Efemerides.de_catalogo(compilar_catalogo(astros), escala=AU * MODEL_SIZE_FACTOR)
+    orbitas = Orbitas(dict.fromkeys(range(len(efemerides.nomes)), NodePath('render')), efemerides)
+    visiveis = set(orbitas.pivos)
+    efemerides.posicoes_locais_em((0.0,))
+    anomalias = efemerides.ultimas_anomalias
+
+    def atualizar():
+        orbitas.atualizar(visiveis, anomalias)
+    return atualizar
+
+
+def caso_camera(astros):
+    """CameraController.update em transição contínua de zoom (não depende do número de corpos)"""
+    controlador = CameraController(AppSemJanela())
+    controlador.initialize_camera((1.0, 2.0, 0.0))
+    chamadas = [0]
+
+    def atualizar():
+        chamadas[0] += 1
+        if chamadas[0] % 100 == 0:
+            # Alterna o alvo do zoom para que a lente continue sendo recalculada
+            controlador.zoom_target = 1000.0 if controlador.zoom_target == 1.0 else 1.0
+            controlador.set_target((chamadas[0] % 7, 0.0, 1.0))
+        return controlador.update(DT_QUADRO)
+    return atualizar
+
+
+CASOS = {
+    'calcular_posicoes': (caso_calcular_posicoes, True),
+    'parse_number': (caso_parse_number, True),
+    'orbitas_construir': (caso_orbitas_construir, True),
+    'orbitas_atualizar': (caso_orbitas_atualizar, True),
+    'camera': (caso_camera, False),  # (fábrica, escala com o número de corpos)
+}
+
+
+def cronometrar(funcao, tempo_min=TEMPO_MIN_MEDICAO, repeticoes=REPETICOES):
+    """Segundos por chamada (melhor e mediana das repetições) e chamadas por repetição.
+
+    O número de chamadas dobra até uma repetição durar tempo_min. A melhor
+    repetição é a menos perturbada pelo resto da máquina e é a que vale na
+    comparação; a mediana vai para o relatório.
+    """
+    chamadas = 1
+    while True:
+        duracao = _medir(funcao, chamadas)
+        if duracao >= tempo_min:
+            break
+        chamadas *= 2
+    duracoes = [duracao] + [_medir(funcao, chamadas) for _ in range(repeticoes - 1)]
+    return min(duracoes) / chamadas, float(np.median(duracoes)) / chamadas, chamadas
+
+
+def _medir(funcao, chamadas):
+    gc.collect()
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        funcao()
+    return time.perf_counter() - inicio
+
+
+def alocacoes(funcao):
+    """Pico de memória e blocos alocados por uma chamada, segundo o tracemalloc.
+
+    Cobre objetos Python e arrays NumPy; memória interna do Panda3D (C++) não aparece.
+    """
+    funcao()  # Aquece caches internos para medir só o custo recorrente
+    gc.collect()
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        resultado = funcao()
+        _, pico = tracemalloc.get_traced_memory()
+        depois = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del resultado
+    blocos = sum(diferenca.count_diff for diferenca in depois.compare_to(antes, 'filename') if diferenca.count_diff > 0)
+    return pico - base, blocos
+
+
+def catalogo(tamanho, semente=0):
+    if tamanho == CATALOGO_DISTRIBUIDO:
+        with open(CAMINHO_PADRAO, encoding='utf8') as f:
+            return yaml.safe_load(f)
+    return astros_sinteticos(int(tamanho), semente)
+
+
+def medir(nome, tamanho, tempo_min=TEMPO_MIN_MEDICAO):
+    """Medida de um caso em um tamanho de catálogo"""
+    astros = catalogo(tamanho)
+    funcao = CASOS[nome][0](astros)
+    segundos, mediana, chamadas = cronometrar(funcao, tempo_min)
+    pico, blocos = alocacoes(funcao)
+    return {
+        'caso': nome,
+        'tamanho': tamanho,
+        'corpos': len(astros),
+        'ms_por_chamada': segundos * 1000,
+        'ms_mediana': mediana * 1000,
+        'us_por_corpo': segundos * 1e6 / len(astros),
+        'pico_kib': pico / 1024,
+        'blocos': blocos,
+        'chamadas': chamadas,
+    }
+
+
+def imprimir(medida, saida=sys.stdout):
+    print('%-18s %11s %12.4f ms (mediana %9.4f) %10.3f µs/corpo %12.1f KiB %9d blocos' % (
+        medida['caso'], medida['tamanho'], medida['ms_por_chamada'], medida['ms_mediana'],
+        medida['us_por_corpo'], medida['pico_kib'], medida['blocos']), file=saida, flush=True)
+
+
+def executar(casos, tamanhos, tempo_min=TEMPO_MIN_MEDICAO, saida=sys.stdout):
+    """Mede cada caso em cada tamanho de catálogo; devolve {'caso/tamanho': medida}"""
+    resultados = {}
+    for nome in casos:
+        for tamanho in (tamanhos if CASOS[nome][1] else (CATALOGO_DISTRIBUIDO,)):
+            medida = resultados['%s/%s' % (nome, tamanho)] = medir(nome, tamanho, tempo_min)
+            imprimir(medida, saida)
+    return resultados
+
+
+def ambiente():
+    """Identifica a máquina: comparações com linhas de base de outra máquina são só indicativas"""
+    return {
+        'maquina': platform.node(),
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'panda3d': panda3d.__version__,
+    }
+
+
+def caminho_linha_base(ambiente):
+    """Arquivo da linha de base desta máquina e destas versões, em benchmarks/linhas_base/"""
+    nome = re.sub(r'[^\w.-]', '_', ambiente['maquina'] or 'maquina')
+    resumo = hashlib.sha1(json.dumps(ambiente, sort_keys=True).encode('utf8')).hexdigest()[:8]
+    return os.path.join(DIRETORIO_LINHAS_BASE, '%s-%s.json' % (nome, resumo))
+
+
+def comparar(resultados, linha_base, tolerancia_tempo=TOLERANCIA_TEMPO, tolerancia_memoria=TOLERANCIA_MEMORIA):
+    """Lista de regressões (chave, grandeza, valor da linha de base, valor atual)"""
+    regressoes = []
+    for chave, atual in resultados.items():
+        base = linha_base.get(chave)
+        if base is None:
+            continue
+        if atual['ms_por_chamada'] > base['ms_por_chamada'] * (1 + tolerancia_tempo):
+            regressoes.append((chave, 'ms_por_chamada', base['ms_por_chamada'], atual['ms_por_chamada']))
+        # Uma folga fixa de 1 KiB evita alarmes por ruído em casos que quase não alocam
+        if atual['pico_kib'] > base['pico_kib'] * (1 + tolerancia_memoria) + 1:
+            regressoes.append((chave, 'pico_kib', base['pico_kib'], atual['pico_kib']))
+    return regressoes
+
+
+def confirmar(resultados, regressoes, tempo_min=TEMPO_MIN_MEDICAO, confirmacoes=CONFIRMACOES, saida=sys.stdout):
+    """Mede de novo os casos apontados como mais lentos e fica com a melhor medida de cada um.
+
+    As novas medições são espaçadas no tempo: uma perturbação passageira da
+    máquina some em alguma delas, e uma regressão de verdade continua lá.
+    """
+    for chave in sorted({chave for chave, grandeza, _, _ in regressoes if grandeza == 'ms_por_chamada'}):
+        atual = resultados[chave]
+        for _ in range(confirmacoes):
+            time.sleep(PAUSA_CONFIRMACAO)
+            nova = medir(atual['caso'], atual['tamanho'], tempo_min)
+            if nova['ms_por_chamada'] < atual['ms_por_chamada']:
+                atual.update(ms_por_chamada=nova['ms_por_chamada'], us_por_corpo=nova['us_por_corpo'])
+        print('(nova medição) ', end='', file=saida)
+        imprimir(atual, saida)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede os caminhos quentes da simulação sem abrir janela")
+    parser.add_argument('--casos', nargs='+', choices=list(CASOS), default=list(CASOS))
+    parser.add_argument('--tamanhos', nargs='+', type=int, default=list(TAMANHOS_PADRAO),
+                        help="Números de corpos dos catálogos sintéticos (corpos.yaml é sempre incluído)")
+    parser.add_argument('--tempo-min', type=float, default=TEMPO_MIN_MEDICAO, help="Segundos por medição")
+    parser.add_argument('--linha-base',
+                        help="Arquivo JSON da linha de base (padrão: o desta máquina em benchmarks/linhas_base/)")
+    parser.add_argument('--gravar-linha-base', action='store_true',
+                        help="Grava as medidas como nova linha de base (mescla com as existentes)")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_TEMPO,
+                        help="Alta relativa de tempo tolerada antes de apontar regressão")
+    parser.add_argument('--saida', help="Grava também as medidas deste ciclo em JSON")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.casos, [CATALOGO_DISTRIBUIDO] + args.tamanhos, args.tempo_min)
+    relatorio = {'ambiente': ambiente(), 'medidas': resultados}
+    caminho = args.linha_base or caminho_linha_base(relatorio['ambiente'])
+
+    linha_base = None
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf8') as f:
+            linha_base = json.load(f)
+
+    if args.gravar_linha_base:
+        medidas = dict(linha_base['medidas']) if linha_base is not None else {}
+        medidas.update(resultados)
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with open(caminho, 'w', encoding='utf8') as f:
+            json.dump({'ambiente': relatorio['ambiente'], 'medidas': medidas}, f, indent=2, ensure_ascii=False)
+        print("Linha de base gravada em %s" % caminho)
+        return 0
+
+    regressoes = []
+    if linha_base is None:
+        print("Sem linha de base desta máquina em %s (use --gravar-linha-base)" % caminho)
+    else:
+        if linha_base.get('ambiente') != relatorio['ambiente']:
+            print("Aviso: a linha de base foi gravada em outro ambiente; as comparações são só indicativas")
+        regressoes = comparar(resultados, linha_base['medidas'], args.tolerancia)
+        if regressoes:
+            confirmar(resultados, regressoes, args.tempo_min)
+            regressoes = comparar(resultados, linha_base['medidas'], args.tolerancia)
+        for chave, grandeza, base, atual in regressoes:
+            print("REGRESSÃO %-28s %-15s %12.4f -> %12.4f (%+.0f%%)" % (
+                chave, grandeza, base, atual, 100 * (atual / base - 1) if base else float('inf')))
+        if not regressoes:
+            print("Nenhuma regressão em relação à linha de base")
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# Catálogos sintéticos no mesmo formato de corpos.yaml (dicionário bruto, antes
+# da compilação), para medir como cada etapa escala com o número de corpos.
+import numpy as np
+
+FRACAO_PLANETAS = 0.1  # Os demais corpos são luas de um planeta sorteado
+
+
+def astros_sinteticos(n, semente=0):
+    """Dicionário de n astros: um sol, planetas em torno dele e luas em torno dos planetas.
+
+    Como em corpos.yaml, os períodos das luas são escritos como expressões
+    ('27.3/365.25'), o que também exercita o caminho de avaliação de parse_number.
+    """
+    rng = np.random.default_rng(semente)
+    astros = {'sol': {'nome': 'Sol', 'massa': 1.989e30, 'raio': 6.9634e8, 'cor': '#ffcc00'}}
+    num_planetas = max(1, min(n - 1, round((n - 1) * FRACAO_PLANETAS)))
+    num_luas = n - 1 - num_planetas
+    for k in range(num_planetas):
+        a = float(rng.uniform(0.3, 40.0))
+        astros['planeta%d' % k] = {
+            'nome': 'Planeta %d' % k,
+            'massa': float(10 ** rng.uniform(22, 27)),
+            'raio': float(10 ** rng.uniform(6, 7.8)),
+            'cor': '#%06x' % int(rng.integers(0, 0xffffff)),
+            'orbital': _elementos(rng, a, a ** 1.5),
+        }
+    for k in range(num_luas):
+        a = float(rng.uniform(0.001, 0.03))
+        astros['lua%d' % k] = {
+            'nome': 'Lua %d' % k,
+            'massa': float(10 ** rng.uniform(18, 23)),
+            'raio': float(10 ** rng.uniform(4, 6.5)),
+            'cor': '#%06x' % int(rng.integers(0, 0xffffff)),
+            'pai': 'planeta%d' % rng.integers(num_planetas),
+            'orbital': _elementos(rng, a, '%.3f/365.25' % rng.uniform(0.5, 60.0)),
+        }
+    return astros
+
+
+def _elementos(rng, a, T):
+    return {
+        'a': a,
+        'T': T,
+        'e': float(rng.uniform(0.0, 0.3)),
+        'i': float(rng.uniform(0.0, 20.0)),
+        'Ω': float(rng.uniform(0.0, 360.0)),
+        'ω': float(rng.uniform(0.0, 360.0)),
+        'M': float(rng.uniform(0.0, 360.0)),
+    }
+
+
+def valores_numericos(astros):
+    """Todos os valores que compilar_catalogo passa por parse_number, na mesma ordem"""
+    valores = []
+    for astro in astros.values():
+        valores.append(astro.get('massa', 0))
+        valores.append(astro.get('raio', 0))
+        orbital = astro.get('orbital')
+        if orbital is not None:
+            valores.append(orbital['T'])
+            valores.extend(orbital.get(elemento, 0) for elemento in ('a', 'e', 'i', 'Ω', 'ω', 'M'))
+    return valores
@@ -1,8 +1,72 @@
-# Importa a classe que gerencia o sistema solar.
+# Importa a classe que gerencia o sistema solar (o início é marcado antes, para
+# que o relatório de partida inclua o tempo das importações).
+import time
+INICIO = time.perf_counter()
+import argparse
 from src.sistema import SistemaSolar
+from src.gravacao import DT_PADRAO
+from src.vistas import ler_vista
 
 # Inicia o programa quando executado diretamente.
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulação 3D do Sistema Solar")
+    parser.add_argument('--corpos-menores', metavar='ARQUIVO',
+                        help="catálogo de asteroides/cometas (CSV do SBDB ou MPCORB.DAT)")
+    parser.add_argument('--limite-corpos-menores', type=int, metavar='N',
+                        help="carrega apenas os primeiros N corpos do catálogo")
+    parser.add_argument('--tabela-efemerides', metavar='ARQUIVO',
+                        help="tabela de Chebyshev gerada com python -m src.chebyshev")
+    parser.add_argument('--fisica-sincrona', action='store_true',
+                        help="calcula a física no próprio quadro, sem a thread de simulação")
+    parser.add_argument('--perfil', metavar='ARQUIVO',
+                        help="grava ao sair os tempos por etapa do quadro (JSON); Shift+P grava a qualquer momento")
+    parser.add_argument('--gravar', metavar='ARQUIVO',
+                        help="grava as ações de controle e a época inicial da sessão (JSON)")
+    parser.add_argument('--reproduzir', metavar='ARQUIVO',
+                        help="reproduz uma sessão gravada com passo fixo e mede o tempo de cada quadro")
+    parser.add_argument('--resultado', metavar='ARQUIVO',
+                        help="arquivo JSON com os tempos de quadro da reprodução")
+    parser.add_argument('--dt', type=float, default=DT_PADRAO,
+                        help="passo fixo da reprodução, em segundos (padrão: 1/60)")
+    parser.add_argument('--offscreen', action='store_true',
+                        help="renderiza em um buffer fora da tela, sem abrir janela")
+    parser.add_argument('--tinydisplay', action='store_true',
+                        help="usa o rasterizador em software do Panda3D (p3tinydisplay)")
+    parser.add_argument('--tempos-partida', metavar='ARQUIVO', nargs='?', const='-',
+                        help="mostra a duração de cada etapa da partida e, com ARQUIVO, grava em JSON")
+    parser.add_argument('--servidor', action='append', metavar='ENDERECO',
+                        help="transmite as posições de cada quadro (ws://host:porta ou unix:/caminho; repetível)")
+    parser.add_argument('--vista', action='append', default=[], metavar='ALVO[:ZOOM]',
+                        help="vista adicional, lado a lado com a principal (ex.: jupiter:0.05; repetível)")
+    args = parser.parse_args()
+    if args.gravar and args.reproduzir:
+        parser.error("--gravar e --reproduzir não podem ser usados juntos")
+    if args.servidor:
+        from src.servidor import ler_endereco
+        try:
+            for endereco in args.servidor:
+                ler_endereco(endereco)
+        except ValueError as erro:
+            parser.error(str(erro))
+    try:
+        vistas = [ler_vista(texto) for texto in args.vista]
+    except ValueError as erro:
+        parser.error(str(erro))
+
     # Instancia e executa a aplicação do sistema solar.
-    app = SistemaSolar()
-    app.run()
\ No newline at end of file
+    app = SistemaSolar(corpos_menores=args.corpos_menores,
+                       limite_corpos_menores=args.limite_corpos_menores,
+                       tabela_efemerides=args.tabela_efemerides,
+                       fisica_sincrona=args.fisica_sincrona,
+                       perfil=args.perfil,
+                       gravar=args.gravar,
+                       reproduzir=args.reproduzir,
+                       resultado_reproducao=args.resultado,
+                       dt_reproducao=args.dt,
+                       offscreen=args.offscreen,
+                       tinydisplay=args.tinydisplay,
+                       tempos_partida=args.tempos_partida,
+                       inicio_partida=INICIO,
+                       servidor=args.servidor,
+                       vistas=vistas)
+    app.run()
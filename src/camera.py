@@ -1,11 +1,13 @@
-from panda3d.core import Vec3, ClockObject
+from panda3d.core import Vec3, Vec3D, ClockObject
 import math
 
 class CameraController:
-    def __init__(self, app, base_near=0.01, base_far=1e12):
+    def __init__(self, app, base_near=0.01, base_far=1e12, camera=None, lens=None, regiao=None):
+        # camera, lens e regiao (DisplayRegion) permitem várias vistas; o padrão é a câmera do ShowBase
         self.app = app
-        self.camera = app.camera
-        self.lens = app.cam.node().getLens()
+        self.camera = camera if camera is not None else app.camera
+        self.lens = lens if lens is not None else app.cam.node().getLens()
+        self.regiao = regiao
         self.base_near = base_near
         self.base_far = base_far
         
@@ -21,10 +23,11 @@ class CameraController:
         self.horizontal_rotation = 0.0  # Rotação horizontal inicial
         self.target_rotation = 0.0      # Rotação horizontal alvo
         self.transition_speed = 5.0
+        self._zoom_lente = None  # Zoom usado na última atualização da lente
         
-        # Posições da câmera
-        self.camera_target_pos = Vec3(0, 0, 0)
-        self.camera_current_pos = Vec3(0, 0, 0)
+        # Posições da câmera (em precisão dupla: são subtraídas de posições muito grandes)
+        self.camera_target_pos = Vec3D(0, 0, 0)
+        self.camera_current_pos = Vec3D(0, 0, 0)
         
         # Define a direção base da câmera
         self.camera_base_direction = Vec3(0, 0, -1)
@@ -32,9 +35,9 @@ class CameraController:
         
     def initialize_camera(self, initial_position=None, initial_target=None):
         """Inicializa a câmera em uma posição específica ou usa os valores padrão"""
-        if initial_position:
-            self.camera_current_pos = Vec3(initial_position)
-            self.camera_target_pos = Vec3(initial_position)
+        if initial_position is not None:
+            self.camera_current_pos = Vec3D(*initial_position)
+            self.camera_target_pos = Vec3D(*initial_position)
         
         # Desativa o controle de mouse padrão da Panda3D
         self.app.disableMouse()
@@ -50,7 +53,7 @@ class CameraController:
         
     def set_target(self, target_pos):
         """Define a posição alvo da câmera"""
-        self.camera_target_pos = Vec3(target_pos)
+        self.camera_target_pos = Vec3D(*target_pos)
     
     def update_from_simulation_state(self, simulation_state):
         """Atualiza os parâmetros da câmera a partir do estado da simulação"""
@@ -63,7 +66,10 @@ class CameraController:
         self.target_rotation = simulation_state['target_rotation']
 
     def update_lens(self):
-        """Atualiza os parâmetros da lente da câmera"""
+        """Atualiza os parâmetros da lente da câmera (só quando o zoom muda)"""
+        if self.zoom_current == self._zoom_lente:
+            return
+        self._zoom_lente = self.zoom_current
         new_near = max(self.base_near / self.zoom_current, 1e-6)
         new_far = self.base_far / self.zoom_current
         self.lens.setNear(new_near)
@@ -74,6 +80,9 @@ class CameraController:
         # Aplica transições suaves
         self.camera_current_pos += (self.camera_target_pos - self.camera_current_pos) * min(self.transition_speed * dt, 1)
         self.zoom_current += (self.zoom_target - self.zoom_current) * min(self.transition_speed * dt, 1)
+        if abs(self.zoom_target - self.zoom_current) <= 1e-9 * self.zoom_target:
+            # Encerra a transição: sem isso o zoom se aproximaria do alvo para sempre
+            self.zoom_current = self.zoom_target
         self.camera_inclination += (self.target_inclination - self.camera_inclination) * min(self.transition_speed * dt, 1)
         self.horizontal_rotation += (self.target_rotation - self.horizontal_rotation) * min(self.transition_speed * dt, 1)
         
@@ -99,6 +108,16 @@ class CameraController:
             'horizontal_rotation': self.horizontal_rotation
         }
         
+    def posicao_no_mundo(self):
+        """Posição da câmera no referencial da simulação (sem o deslocamento do alvo)"""
+        return self.camera_current_pos + Vec3D(*self.camera.getPos())
+
+    def fator_projecao(self):
+        """Pixels ocupados por um objeto de tamanho 1 a uma distância 1 da câmera"""
+        altura_px = self.regiao.getPixelHeight() if self.regiao is not None else self.app.win.getYSize()
+        fov_vertical = self.lens.getFov()[1]
+        return altura_px / (2 * math.tan(math.radians(fov_vertical) / 2))
+
     def get_zoom_limit_for_target(self, target_scale):
         """Calcula o limite de zoom para um objeto com uma determinada escala"""
         min_distance = 4 * target_scale
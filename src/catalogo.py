@@ -0,0 +1,171 @@
+# Compila corpos.yaml em uma tabela tipada, imutável e baseada em arrays,
+# com cache binário em disco indexado pelo hash do arquivo YAML.
+import hashlib, os
+from dataclasses import dataclass, fields
+from functools import cached_property
+
+import numpy as np
+
+AU = 1.496e11
+MODEL_SIZE_FACTOR = 2e-7
+VERSAO_CACHE = 1  # Incrementar quando o layout da tabela mudar
+CAMINHO_PADRAO = os.path.join(os.path.dirname(__file__), 'parametros', 'corpos.yaml')
+
+
+def parse_number(val):
+    # Converte valores para float, avaliando expressões simples se necessário
+    if isinstance(val, (int, float)):
+        return float(val)
+    try:
+        return float(eval(val, {"__builtins__": None}, {}))
+    except Exception:
+        return float(val)
+
+
+def parse_cor(cor):
+    # Converte '#rrggbb' em componentes RGBA entre 0 e 1
+    cor = cor.lstrip('#')
+    return tuple(int(cor[k:k + 2], 16) / 255.0 for k in (0, 2, 4)) + (1.0,)
+
+
+@dataclass(frozen=True)
+class Catalogo:
+    """Tabela compilada dos corpos celestes (um array por coluna, somente leitura)"""
+    chaves: tuple          # Chaves em minúsculas, na ordem do YAML
+    nomes: tuple           # Nomes de exibição
+    pais: np.ndarray       # Índice do corpo pai (-1 quando orbita a origem)
+    tem_orbita: np.ndarray
+    massa: np.ndarray      # kg
+    raio: np.ndarray       # m
+    raio_cena: np.ndarray  # Raio já convertido para a escala da cena
+    cores: np.ndarray      # (corpos × 4) RGBA
+    a: np.ndarray          # Semieixo maior em UA
+    a_cena: np.ndarray     # Semieixo maior na escala da cena
+    periodo_dias: np.ndarray
+    e: np.ndarray
+    um_menos_e2: np.ndarray
+    i: np.ndarray          # Ângulos em radianos
+    Ω: np.ndarray
+    ω: np.ndarray
+    M: np.ndarray
+
+    def __post_init__(self):
+        for campo in fields(self):
+            valor = getattr(self, campo.name)
+            if isinstance(valor, np.ndarray):
+                valor.flags.writeable = False
+
+    def __len__(self):
+        return len(self.chaves)
+
+    @cached_property
+    def indice(self):
+        return {chave: k for k, chave in enumerate(self.chaves)}
+
+
+def compilar_catalogo(astros):
+    """Converte o dicionário bruto do YAML em um Catalogo com constantes derivadas"""
+    chaves = tuple(key.lower() for key in astros)
+    indice = {chave: k for k, chave in enumerate(chaves)}
+    n = len(chaves)
+    colunas = {nome: np.zeros(n) for nome in ('massa', 'raio', 'a', 'e', 'i', 'Ω', 'ω', 'M')}
+    periodo_dias = np.ones(n)
+    pais = np.full(n, -1, dtype=np.int64)
+    tem_orbita = np.zeros(n, dtype=bool)
+    cores = np.ones((n, 4), dtype=np.float32)
+    for k, astro in enumerate(astros.values()):
+        colunas['massa'][k] = parse_number(astro.get('massa', 0))
+        colunas['raio'][k] = parse_number(astro.get('raio', 0))
+        cores[k] = parse_cor(astro.get('cor', '#ffffff'))
+        if 'orbital' not in astro or chaves[k] == 'sol':
+            continue
+        orb = astro['orbital']
+        tem_orbita[k] = True
+        periodo_dias[k] = parse_number(orb['T']) * 365.25
+        for elemento in ('a', 'e', 'i', 'Ω', 'ω', 'M'):
+            colunas[elemento][k] = parse_number(orb.get(elemento, 0))
+        pai = astro.get('pai')
+        if pai is not None:
+            if pai.lower() not in indice:
+                raise ValueError("Corpo pai desconhecido para '%s': %s" % (chaves[k], pai))
+            pais[k] = indice[pai.lower()]
+    for k in range(n):
+        # Uma cadeia de pais mais longa que o número de corpos só pode ser um ciclo
+        pai, passos = pais[k], 0
+        while pai >= 0:
+            passos += 1
+            if passos > n:
+                raise ValueError("Hierarquia cíclica em corpos.yaml envolvendo '%s'" % chaves[k])
+            pai = pais[pai]
+    return Catalogo(
+        chaves=chaves,
+        nomes=tuple(astro.get('nome', key) for key, astro in astros.items()),
+        pais=pais,
+        tem_orbita=tem_orbita,
+        massa=colunas['massa'],
+        raio=colunas['raio'],
+        raio_cena=colunas['raio'] * MODEL_SIZE_FACTOR,
+        cores=cores,
+        a=colunas['a'],
+        a_cena=colunas['a'] * AU * MODEL_SIZE_FACTOR,
+        periodo_dias=periodo_dias,
+        e=colunas['e'],
+        um_menos_e2=1 - colunas['e'] ** 2,
+        i=np.radians(colunas['i']),
+        Ω=np.radians(colunas['Ω']),
+        ω=np.radians(colunas['ω']),
+        M=np.radians(colunas['M']),
+    )
+
+
+def salvar_catalogo(catalogo, caminho):
+    """Grava o catálogo em formato .npz (sem pickle)"""
+    arrays = {campo.name: getattr(catalogo, campo.name) for campo in fields(catalogo)}
+    arrays['chaves'] = np.array(catalogo.chaves, dtype=str)
+    arrays['nomes'] = np.array(catalogo.nomes, dtype=str)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temporario, caminho)
+
+
+def ler_catalogo(caminho):
+    """Lê um catálogo gravado por salvar_catalogo"""
+    with np.load(caminho, allow_pickle=False) as dados:
+        valores = {campo.name: dados[campo.name] for campo in fields(Catalogo)}
+    valores['chaves'] = tuple(str(chave) for chave in valores['chaves'])
+    valores['nomes'] = tuple(str(nome) for nome in valores['nomes'])
+    return Catalogo(**valores)
+
+
+def chave_cache(conteudo):
+    # O hash cobre o YAML e a versão do layout
+    h = hashlib.sha256(conteudo)
+    h.update(str(VERSAO_CACHE).encode('ascii'))
+    return h.hexdigest()[:32]
+
+
+def carregar_catalogo(caminho_yaml=CAMINHO_PADRAO, dir_cache=None):
+    """Carrega o catálogo do cache binário ou compila o YAML e grava o cache.
+
+    Em uma partida com cache válido o YAML não é interpretado.
+    """
+    with open(caminho_yaml, 'rb') as f:
+        conteudo = f.read()
+    if dir_cache is None:
+        dir_cache = os.path.join(os.path.dirname(caminho_yaml), '.cache')
+    caminho_cache = os.path.join(dir_cache, 'corpos-%s.npz' % chave_cache(conteudo))
+    if os.path.exists(caminho_cache):
+        try:
+            return ler_catalogo(caminho_cache)
+        except (OSError, KeyError, ValueError):
+            pass  # Cache corrompido ou de outra versão: recompila abaixo
+
+    import yaml
+    catalogo = compilar_catalogo(yaml.safe_load(conteudo.decode('utf8')))
+    try:
+        os.makedirs(dir_cache, exist_ok=True)
+        salvar_catalogo(catalogo, caminho_cache)
+    except OSError:
+        pass  # Sem permissão de escrita: segue sem cache
+    return catalogo
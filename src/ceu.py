@@ -0,0 +1,102 @@
+# Céu de fundo: esfera vista por dentro com o panorama da Via Láctea (projeção
+# equirretangular em coordenadas galácticas), orientada no referencial da cena
+# (eclíptica J2000). A esfera acompanha a posição da câmera mas não a sua rotação,
+# e é desenhada antes de tudo, sem escrever nem testar profundidade, com um raio
+# pouco maior que o plano near da lente.
+import math
+
+import numpy as np
+from panda3d.core import Geom, GeomNode, GeomTriangles, GeomVertexData, GeomVertexFormat
+
+from src.instancias import escrever_array
+
+# Galáctico -> equatorial J2000 (transposta da matriz de Hipparcos) e equatorial -> eclíptica
+GALACTICO_EQUATORIAL = np.array([
+    [-0.0548755604, 0.4941094279, -0.8676661490],
+    [-0.8734370902, -0.4448296300, -0.1980763734],
+    [-0.4838350155, 0.7469822445, 0.4559837762],
+])
+OBLIQUIDADE = math.radians(23.4392911)
+# Raio do céu em múltiplos do plano near: longe do near a razão far/near de 1e14
+# da lente degrada a interpolação das coordenadas de textura (estrelas riscadas)
+RAIO_SOBRE_NEAR = 100.0
+EQUATORIAL_ECLIPTICA = np.array([
+    [1.0, 0.0, 0.0],
+    [0.0, math.cos(OBLIQUIDADE), math.sin(OBLIQUIDADE)],
+    [0.0, -math.sin(OBLIQUIDADE), math.cos(OBLIQUIDADE)],
+])
+
+
+def vertices_ceu(meridianos=64, paralelos=32):
+    """Posições (na esfera unitária, eclíptica) e coordenadas de textura da esfera do céu.
+
+    No panorama, a longitude galáctica cresce para a esquerda a partir do centro
+    da imagem, e a latitude galáctica negativa fica na metade de cima (é onde
+    aparecem as Nuvens de Magalhães). A costura u = 0/1 tem vértices duplicados.
+    """
+    u = np.linspace(0.0, 1.0, meridianos + 1)
+    v = np.linspace(0.0, 1.0, paralelos + 1)
+    uu, vv = np.meshgrid(u, v)
+    longitude = (0.5 - uu) * 2 * math.pi
+    latitude = (0.5 - vv) * math.pi
+    galactico = np.stack([np.cos(latitude) * np.cos(longitude),
+                          np.cos(latitude) * np.sin(longitude),
+                          np.sin(latitude)], axis=-1).reshape(-1, 3)
+    posicoes = galactico @ (EQUATORIAL_ECLIPTICA @ GALACTICO_EQUATORIAL).T
+    return posicoes, np.stack([uu, vv], axis=-1).reshape(-1, 2)
+
+
+def triangulos_ceu(meridianos=64, paralelos=32):
+    # Dois triângulos por célula da grade, com as faces voltadas para o centro
+    colunas = meridianos + 1
+    i, j = np.meshgrid(np.arange(paralelos), np.arange(meridianos), indexing='ij')
+    a = (i * colunas + j).ravel()
+    b, c, d = a + 1, a + colunas, a + colunas + 1
+    return np.stack([a, c, b, b, c, d], axis=-1).reshape(-1, 3)
+
+
+class Ceu:
+    """Esfera do céu sob a câmera; a textura é trocada quando uma versão melhor fica pronta"""
+
+    def __init__(self, camera, meridianos=64, paralelos=32):
+        posicoes, uv = vertices_ceu(meridianos, paralelos)
+        dados = GeomVertexData('ceu', GeomVertexFormat.getV3t2(), Geom.UH_static)
+        dados.uncleanSetNumRows(len(posicoes))
+        escrever_array(dados, 0, np.hstack([posicoes, uv]).astype(np.float32))
+        indices = triangulos_ceu(meridianos, paralelos)
+        triangulos = GeomTriangles(Geom.UH_static)
+        triangulos.setIndexType(Geom.NT_uint32)
+        vertices = triangulos.modifyVertices()
+        vertices.uncleanSetNumRows(indices.size)
+        destino = memoryview(vertices).cast('B').cast('I')
+        np.frombuffer(destino, dtype=np.uint32)[:] = indices.ravel()
+        destino.release()
+        geom = Geom(dados)
+        geom.addPrimitive(triangulos)
+        no = GeomNode('ceu')
+        no.addGeom(geom)
+
+        self.np = camera.attachNewNode(no)
+        self.np.setCompass()  # Segue a posição da câmera, com a orientação da cena
+        self.np.setBin('background', 0)
+        self.np.setDepthWrite(False)
+        self.np.setDepthTest(False)
+        self.np.setLightOff(1)
+        self.np.hide()  # Até a primeira textura chegar
+        self._near = None
+        self.largura_textura = 0
+
+    def definir_textura(self, textura):
+        # A miniatura e a textura completa podem chegar em qualquer ordem: fica a maior
+        if textura.getXSize() < self.largura_textura:
+            return
+        self.largura_textura = textura.getXSize()
+        self.np.setTexture(textura, 1)
+        self.np.show()
+
+    def ajustar(self, lente):
+        """Mantém o raio logo além do plano near da lente (que muda com o zoom)"""
+        near = lente.getNear()
+        if near != self._near:
+            self._near = near
+            self.np.setScale(min(near * RAIO_SOBRE_NEAR, lente.getFar() / 2))
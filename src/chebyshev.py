@@ -0,0 +1,266 @@
+# Tabelas de efemérides em polinômios de Chebyshev, no estilo dos arquivos SPK
+# do JPL: cada corpo tem segmentos de duração fixa com coeficientes ajustados ao
+# modelo orbital. O arquivo é mapeado em memória, de modo que vários processos
+# compartilham a mesma tabela sem copiá-la, e avaliar uma posição custa a busca
+# do segmento e um polinômio curto, independentemente da época.
+#
+# Geração: python -m src.chebyshev --inicio 1900-01-01 --fim 2100-01-01 --saida efemerides.cheb
+import argparse, json, struct
+
+import numpy as np
+
+from src.catalogo import carregar_catalogo, CAMINHO_PADRAO
+from src.efemerides import Efemerides, niveis_hierarquia, somar_pais
+
+MAGICO = b'CHEBEF01'
+ALINHAMENTO = 64               # Os coeficientes começam em um deslocamento múltiplo de 64 bytes
+GRAU_PADRAO = 12
+TOLERANCIA_PADRAO = 1e-9       # Erro máximo de ajuste em unidades astronômicas (~150 m)
+SEGMENTOS_POR_ORBITA_MIN = 1
+SEGMENTOS_POR_ORBITA_MAX = 1024
+BLOCO_SEGMENTOS = 16384        # Segmentos ajustados por vez na geração
+BLOCO_TEMPOS = 1024            # Instantes avaliados por vez na leitura
+
+
+def nos_chebyshev(grau):
+    """Nós de Chebyshev (raízes de T_{grau+1}) no intervalo [-1, 1]"""
+    return np.cos(np.pi * (np.arange(grau + 1) + 0.5) / (grau + 1))
+
+
+def ajustar(valores, grau):
+    """Coeficientes que interpolam `valores` (… × grau+1 nós) nos nós de Chebyshev"""
+    n = grau + 1
+    j = np.arange(n)
+    # Transformada discreta do cosseno: c_j = (2/n) Σ f(x_k) T_j(x_k)
+    base = np.cos(np.pi * np.outer(j, np.arange(n) + 0.5) / n) * (2.0 / n)
+    base[0] /= 2
+    return valores @ base.T
+
+
+def avaliar(coeficientes, x):
+    """Avalia séries de Chebyshev (… × grau+1) em x (broadcast com …) pelo método de Clenshaw"""
+    b1 = np.zeros(np.broadcast_shapes(coeficientes.shape[:-1], np.shape(x)))
+    b2 = np.zeros_like(b1)
+    dois_x = 2 * x
+    for j in range(coeficientes.shape[-1] - 1, 0, -1):
+        b1, b2 = coeficientes[..., j] + dois_x * b1 - b2, b1
+    return coeficientes[..., 0] + x * b1 - b2
+
+
+def base_chebyshev(x, grau):
+    """T_0(x) … T_grau(x), com forma (… × grau+1)"""
+    # A recorrência roda sobre linhas contíguas (grau+1 × …); só o resultado é transposto
+    x = np.asarray(x, dtype=np.float64)
+    base = np.empty((grau + 1,) + x.shape)
+    base[0] = 1
+    if grau:
+        base[1] = x
+    dois_x = 2 * x
+    for j in range(2, grau + 1):
+        np.multiply(dois_x, base[j - 1], out=base[j])
+        base[j] -= base[j - 2]
+    return np.moveaxis(base, 0, -1)
+
+
+def _ajustar_segmentos(efemerides, inicio, intervalo, primeiro, ultimo, grau):
+    # Amostra o corpo (motor com um único corpo) nos nós de cada segmento e ajusta x, y e z
+    x = nos_chebyshev(grau)
+    t = inicio + intervalo * (np.arange(primeiro, ultimo)[:, None] + (x + 1) / 2)
+    valores = efemerides.posicoes_locais_em(t.ravel())[:, 0].reshape(t.shape + (3,))
+    return ajustar(np.moveaxis(valores, -1, -2), grau)  # (segmentos × 3 × grau+1)
+
+
+def _erro_ajuste(efemerides, coeficientes, inicio, intervalo, primeiro):
+    # Compara com o modelo a meio caminho entre os nós, onde o erro de interpolação é maior
+    grau = coeficientes.shape[-1] - 1
+    x = np.cos(np.pi * np.arange(1, grau + 1) / (grau + 1))
+    segmentos = np.arange(primeiro, primeiro + len(coeficientes))
+    t = inicio + intervalo * (segmentos[:, None] + (x + 1) / 2)
+    esperado = efemerides.posicoes_locais_em(t.ravel())[:, 0].reshape(t.shape + (3,))
+    obtido = avaliar(coeficientes[:, None], x[None, :, None])
+    return float(np.abs(obtido - esperado).max(initial=0.0))
+
+
+def _escolher_intervalo(efemerides, inicio, fim, grau, tolerancia):
+    # Dobra o número de segmentos por órbita até o ajuste atingir a tolerância,
+    # testando uma janela de duas órbitas (o erro se repete a cada período)
+    periodo = float(efemerides.periodo_dias[0])
+    segmentos_por_orbita = SEGMENTOS_POR_ORBITA_MIN
+    while True:
+        intervalo = periodo / segmentos_por_orbita
+        amostra = max(1, min(int(np.ceil((fim - inicio) / intervalo)), 2 * segmentos_por_orbita))
+        coeficientes = _ajustar_segmentos(efemerides, inicio, intervalo, 0, amostra, grau)
+        erro = _erro_ajuste(efemerides, coeficientes, inicio, intervalo, 0)
+        if erro <= tolerancia or segmentos_por_orbita >= SEGMENTOS_POR_ORBITA_MAX:
+            return intervalo
+        segmentos_por_orbita *= 2
+
+
+def gerar_tabela(efemerides, inicio, fim, caminho, grau=GRAU_PADRAO, tolerancia=TOLERANCIA_PADRAO):
+    """Ajusta e grava a tabela de `efemerides` cobrindo [inicio, fim] (dias desde J2000).
+
+    Os coeficientes guardam posições locais (relativas ao pai) na escala do
+    motor; a hierarquia é gravada junto para que a tabela devolva também as
+    posições absolutas. Retorna um dicionário com o erro máximo de cada corpo.
+    """
+    if fim <= inicio:
+        raise ValueError("O fim do intervalo deve ser posterior ao início")
+
+    # Primeira passada: escolhe intervalo e grau de cada corpo e calcula o layout do arquivo.
+    # O bloco de cada corpo começa em um múltiplo do tamanho do seu segmento, para
+    # que os segmentos sejam linhas de uma matriz na leitura.
+    corpos, deslocamento = [], 0
+    for k, nome in enumerate(efemerides.nomes):
+        if efemerides.a[k] <= 0:
+            # Sem órbita: um único segmento constante na origem
+            intervalo, grau_corpo = fim - inicio, 0
+        else:
+            intervalo = _escolher_intervalo(efemerides.selecionar([k]), inicio, fim, grau, tolerancia)
+            grau_corpo = grau
+        segmentos = int(np.ceil((fim - inicio) / intervalo))
+        tamanho = 3 * (grau_corpo + 1)
+        deslocamento += -deslocamento % tamanho
+        corpos.append({'nome': nome, 'inicio': inicio, 'intervalo': intervalo, 'grau': grau_corpo,
+                       'segmentos': segmentos, 'deslocamento': deslocamento})
+        deslocamento += segmentos * tamanho
+
+    cabecalho = json.dumps({
+        'inicio': inicio,
+        'fim': fim,
+        'escala': efemerides.escala,
+        'pais': efemerides.pais.tolist(),
+        'corpos': corpos,
+    }).encode('utf8')
+    inicio_dados = -(-(len(MAGICO) + 8 + len(cabecalho)) // ALINHAMENTO) * ALINHAMENTO
+
+    # Segunda passada: ajusta os segmentos em blocos e os grava diretamente no arquivo
+    erros = {}
+    with open(caminho, 'wb') as f:
+        f.write((MAGICO + struct.pack('<Q', inicio_dados) + cabecalho).ljust(inicio_dados, b'\0'))
+        escritos = 0
+        for k, corpo in enumerate(corpos):
+            f.write(b'\0' * 8 * (corpo['deslocamento'] - escritos))
+            escritos = corpo['deslocamento']
+            erros[corpo['nome']] = 0.0
+            if corpo['grau'] == 0:
+                f.write(np.zeros(3, dtype='<f8').tobytes())
+                escritos += 3
+                continue
+            motor = efemerides.selecionar([k])
+            for primeiro in range(0, corpo['segmentos'], BLOCO_SEGMENTOS):
+                ultimo = min(primeiro + BLOCO_SEGMENTOS, corpo['segmentos'])
+                coeficientes = _ajustar_segmentos(motor, inicio, corpo['intervalo'], primeiro, ultimo, grau)
+                erros[corpo['nome']] = max(erros[corpo['nome']], _erro_ajuste(
+                    motor, coeficientes, inicio, corpo['intervalo'], primeiro))
+                f.write(np.ascontiguousarray(coeficientes, dtype='<f8').tobytes())
+                escritos += coeficientes.size
+    return erros
+
+
+class TabelaChebyshev:
+    """Efemérides lidas de uma tabela de Chebyshev mapeada em memória.
+
+    Oferece a mesma interface de consulta de Efemerides (posicoes_locais_em,
+    posicoes_em, posicoes). Ao ser enviada a outro processo, só o caminho é
+    transmitido e o arquivo é mapeado de novo, sem copiar os coeficientes.
+    """
+
+    def __init__(self, caminho, escala=None):
+        self.caminho = caminho
+        with open(caminho, 'rb') as f:
+            if f.read(len(MAGICO)) != MAGICO:
+                raise ValueError("%s não é uma tabela de Chebyshev" % caminho)
+            inicio_dados, = struct.unpack('<Q', f.read(8))
+            cabecalho = json.loads(f.read(inicio_dados - len(MAGICO) - 8).rstrip(b'\0'))
+        self.inicio = cabecalho['inicio']
+        self.fim = cabecalho['fim']
+        corpos = cabecalho['corpos']
+        self.nomes = [corpo['nome'] for corpo in corpos]
+        self.indice = {nome: k for k, nome in enumerate(self.nomes)}
+        self.pais = np.array(cabecalho['pais'], dtype=np.int64)
+        self.niveis, self.raizes = niveis_hierarquia(self.pais)
+        # Fator entre a escala gravada e a pedida (ex.: tabela em UA, cena em metros × fator)
+        self.escala = cabecalho['escala'] if escala is None else float(escala)
+        self._fator = self.escala / cabecalho['escala']
+        self.dados = np.memmap(caminho, dtype='<f8', mode='r', offset=inicio_dados)
+
+        self.inicios = np.array([corpo['inicio'] for corpo in corpos])
+        self.intervalos = np.array([corpo['intervalo'] for corpo in corpos])
+        self.graus = np.array([corpo['grau'] for corpo in corpos])
+        self.segmentos = np.array([corpo['segmentos'] for corpo in corpos])
+        self.deslocamentos = np.array([corpo['deslocamento'] for corpo in corpos])
+        # Corpos com o mesmo grau são avaliados juntos em uma única passada de Clenshaw;
+        # para cada grau, o arquivo é visto como uma matriz com um segmento por linha
+        self.grupos = []
+        for grau in np.unique(self.graus):
+            tamanho = 3 * (int(grau) + 1)
+            linhas = self.dados[:len(self.dados) // tamanho * tamanho].reshape(-1, tamanho)
+            membros = np.flatnonzero(self.graus == grau)
+            self.grupos.append((int(grau), membros, linhas, self.deslocamentos[membros] // tamanho))
+
+    def __reduce__(self):
+        return (TabelaChebyshev, (self.caminho, self.escala))
+
+    def cobre(self, tempo):
+        """Indica se a tabela cobre o instante (dias desde J2000)"""
+        return self.inicio <= tempo <= self.fim
+
+    def posicoes_locais_em(self, tempos):
+        """Posições relativas ao corpo pai, com forma (tempos × corpos × 3)"""
+        t = np.asarray(tempos, dtype=np.float64).reshape(-1, 1)
+        if t.size and (t.min() < self.inicio or t.max() > self.fim):
+            raise ValueError("Instante fora do intervalo da tabela [%g, %g]" % (self.inicio, self.fim))
+        pos = np.empty((len(t), len(self.nomes), 3))
+        # Em blocos de instantes, para que os coeficientes reunidos caibam no cache
+        for i in range(0, len(t), BLOCO_TEMPOS):
+            bloco = t[i:i + BLOCO_TEMPOS]
+            for grau, corpos, linhas, primeira_linha in self.grupos:
+                relativo = (bloco - self.inicios[corpos]) / self.intervalos[corpos]
+                segmento = np.minimum(relativo.astype(np.int64), self.segmentos[corpos] - 1)
+                x = 2 * (relativo - segmento) - 1
+                coeficientes = linhas[primeira_linha + segmento].reshape(segmento.shape + (3, grau + 1))
+                # Produto de cada segmento pela base em lote: o método de Clenshaw aqui
+                # percorreria os coeficientes com passo grau+1 a cada termo, bem mais lento
+                pos[i:i + BLOCO_TEMPOS, corpos] = (coeficientes @ base_chebyshev(x, grau)[..., None])[..., 0]
+        if self._fator != 1:
+            pos *= self._fator
+        return pos
+
+    def absolutas(self, locais):
+        """Soma as posições dos pais a um bloco (… × corpos × 3) de posições locais"""
+        return somar_pais(locais, self.pais, self.niveis)
+
+    def posicoes_em(self, tempos):
+        """Posições absolutas de todos os corpos, com forma (tempos × corpos × 3)"""
+        return self.absolutas(self.posicoes_locais_em(tempos))
+
+    def posicoes(self, tempo):
+        """Posições absolutas de todos os corpos em um único instante (corpos × 3)"""
+        return self.posicoes_em((tempo,))[0]
+
+
+def main(argv=None):
+    from src.exportar import ler_data
+
+    parser = argparse.ArgumentParser(description="Gera uma tabela de efemérides em polinômios de Chebyshev")
+    parser.add_argument('--inicio', required=True, help="Data ISO ou dias desde J2000")
+    parser.add_argument('--fim', required=True, help="Data ISO ou dias desde J2000")
+    parser.add_argument('--saida', required=True, help="Arquivo da tabela")
+    parser.add_argument('--grau', type=int, default=GRAU_PADRAO, help="Grau dos polinômios")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="Erro máximo de ajuste em unidades astronômicas")
+    parser.add_argument('--corpos-yaml', default=CAMINHO_PADRAO, help="Catálogo de corpos")
+    args = parser.parse_args(argv)
+
+    efemerides = Efemerides.de_catalogo(carregar_catalogo(args.corpos_yaml))  # Em unidades astronômicas
+    try:
+        erros = gerar_tabela(efemerides, ler_data(args.inicio), ler_data(args.fim), args.saida,
+                             grau=args.grau, tolerancia=args.tolerancia)
+    except ValueError as erro:
+        parser.error(str(erro))
+    for nome, erro in erros.items():
+        print("%-10s erro máximo %.3g UA" % (nome, erro))
+
+
+if __name__ == '__main__':
+    main()
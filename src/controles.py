@@ -1,17 +1,23 @@
 # Remover a importação do pygame e criar função para registrar controles em Panda3D
 
+from src.estado import Estado, Campo
+
 # Atualize o estado inicial para que o foco seja a Terra
-simulation_state = {
-    'target': 'terra',        # Inicialmente com foco na Terra
-    'speed': 1.0,
-    'zoom': 1.0,
-    'current_planet_index': 2,  # Terra é o 3º na ordem
-    'current_moon_index': 0,
-    'camera_inclination': 0.2,  # Inclinação padrão da câmera
-    'target_inclination': 0.2,  # Valor alvo inicial também com inclinação padrão
-    'horizontal_rotation': 0.0,  # Ângulo de rotação horizontal (0 = visão frontal)
-    'target_rotation': 0.0,     # Valor alvo para transição suave da rotação
+CAMPOS_SIMULACAO = {
+    'target': Campo(str, 'terra', "Corpo em foco"),
+    'speed': Campo(float, 1.0, "Velocidade da simulação (× tempo real)"),
+    'zoom': Campo(float, 1.0),
+    'current_planet_index': Campo(int, 2, "Terra é o 3º na ordem"),
+    'current_moon_index': Campo(int, 0),
+    'camera_inclination': Campo(float, 0.2, "Inclinação padrão da câmera"),
+    'target_inclination': Campo(float, 0.2, "Valor alvo inicial também com inclinação padrão"),
+    'horizontal_rotation': Campo(float, 0.0, "Ângulo de rotação horizontal (0 = visão frontal)"),
+    'target_rotation': Campo(float, 0.0, "Valor alvo para transição suave da rotação"),
+    'dinamica': Campo(str, 'kepler', "'kepler' (analítica) ou 'ncorpos' (gravitação integrada)"),
+    'perfil_visivel': Campo(bool, False, "Tabela de tempos por etapa na tela"),
+    'rastros': Campo(bool, False, "Rastros do movimento recente dos corpos"),
 }
+simulation_state = Estado(CAMPOS_SIMULACAO)
 
 planets_order = ['mercurio', 'venus', 'terra', 'marte', 'jupiter', 'saturno', 'urano', 'netuno']
 moon_mapping = {
@@ -71,6 +77,19 @@ def centralizar_no_planeta():
     simulation_state['target'] = planet
     print("Centralizado no planeta:", planet)
 
+def focar(alvo):
+    # Foco em um corpo escolhido pelo nome (clique do mouse); os índices de planeta e
+    # lua acompanham o alvo, para que as teclas continuem a partir dele
+    for i, planeta in enumerate(planets_order):
+        if alvo == planeta:
+            simulation_state['current_planet_index'] = i
+            simulation_state['current_moon_index'] = 0
+        elif alvo in moon_mapping.get(planeta, ()):
+            simulation_state['current_planet_index'] = i
+            simulation_state['current_moon_index'] = moon_mapping[planeta].index(alvo)
+    simulation_state['target'] = alvo
+    print("Foco:", alvo)
+
 def velocidade_real():
     simulation_state['speed'] = 1.0
     print("Velocidade de simulação real:", simulation_state['speed'])
@@ -141,32 +160,54 @@ def orbitar_direita_preciso():
     simulation_state['target_rotation'] += 0.1
     print(f"Orbitando precisamente para a direita: {simulation_state['target_rotation']:.2f}")
 
+def alternar_dinamica():
+    simulation_state['dinamica'] = 'ncorpos' if simulation_state['dinamica'] == 'kepler' else 'kepler'
+    print("Dinâmica:", simulation_state['dinamica'])
+
+def alternar_perfil():
+    simulation_state['perfil_visivel'] = not simulation_state['perfil_visivel']
+
+def alternar_rastros():
+    simulation_state['rastros'] = not simulation_state['rastros']
+    print("Rastros:", "ligados" if simulation_state['rastros'] else "desligados")
+
+# Teclas de cada ação; as ações são gravadas e reproduzidas pelo nome da função
+TECLAS = {
+    's': centralizar_no_sol,
+    'd': proximo_planeta,
+    'a': planeta_anterior,
+    'e': proxima_lua,
+    'q': lua_anterior,
+    'w': centralizar_no_planeta,
+    '0': velocidade_real,
+    '=': aumentar_velocidade,
+    '-': diminuir_velocidade,
+    'wheel_up': aumentar_zoom,
+    'wheel_down': diminuir_zoom,
+    'shift-wheel_up': aumentar_zoom_curto,
+    'shift-wheel_down': diminuir_zoom_curto,
+    'f': aumentar_inclinacao,
+    'r': diminuir_inclinacao,
+    'v': resetar_inclinacao,
+    'z': orbitar_esquerda,
+    'c': orbitar_direita,
+    'n': alternar_dinamica,
+    'p': alternar_perfil,
+    't': alternar_rastros,
+
+    # Comandos precisos com Shift
+    'shift-r': aumentar_inclinacao_preciso,
+    'shift-f': diminuir_inclinacao_preciso,
+    'shift-z': orbitar_esquerda_preciso,
+    'shift-c': orbitar_direita_preciso,
+}
+ACOES = {funcao.__name__: funcao for funcao in list(TECLAS.values()) + [focar]}
+
 # Nova função para registrar controles em Panda3D
-def register_controls(base):
-    base.accept('s', centralizar_no_sol)
-    base.accept('d', proximo_planeta)
-    base.accept('a', planeta_anterior)
-    base.accept('e', proxima_lua)
-    base.accept('q', lua_anterior)
-    base.accept('w', centralizar_no_planeta)
-    base.accept('0', velocidade_real)
-    base.accept('=', aumentar_velocidade)
-    base.accept('-', diminuir_velocidade)
-    base.accept('wheel_up', aumentar_zoom)
-    base.accept('wheel_down', diminuir_zoom)
-    base.accept('shift-wheel_up', aumentar_zoom_curto)
-    base.accept('shift-wheel_down', diminuir_zoom_curto)
-    base.accept('f', aumentar_inclinacao)
-    base.accept('r', diminuir_inclinacao)
-    base.accept('v', resetar_inclinacao)
-    base.accept('z', orbitar_esquerda)
-    base.accept('c', orbitar_direita)
-    
-    # Registrar comandos precisos com Shift
-    base.accept('shift-r', aumentar_inclinacao_preciso)
-    base.accept('shift-f', diminuir_inclinacao_preciso)
-    base.accept('shift-z', orbitar_esquerda_preciso)
-    base.accept('shift-c', orbitar_direita_preciso)
+def register_controls(base, gravador=None):
+    # Com um gravador (src.gravacao.Gravador), cada ação é registrada antes de ser executada
+    for tecla, funcao in TECLAS.items():
+        base.accept(tecla, gravador.envolver(funcao) if gravador is not None else funcao)
 
 if __name__ == '__main__':
     # Exemplo de teste: a função handle_key_event pode ser chamada no loop de eventos de solar.py.
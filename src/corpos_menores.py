@@ -0,0 +1,169 @@
+# Leitura em fluxo de catálogos de corpos menores (asteroides e cometas).
+# Os arquivos são lidos em blocos que viram arrays NumPy diretamente, sem
+# passar por dicionários Python por corpo.
+import csv, itertools, os
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.efemerides import Efemerides
+
+J2000_JD = 2451545.0
+TAMANHO_BLOCO = 65536
+
+# Nomes aceitos para cada coluna em arquivos CSV (o primeiro é o usado pelo
+# SBDB do JPL; os demais seguem a notação de corpos.yaml)
+COLUNAS_CSV = {
+    'nome': ('full_name', 'name', 'nome'),
+    'a': ('a',),
+    'e': ('e',),
+    'i': ('i',),
+    'Ω': ('om', 'Ω', 'node'),
+    'ω': ('w', 'ω', 'peri'),
+    'M': ('ma', 'M'),
+    'epoca': ('epoch', 'epoca'),
+}
+
+
+@dataclass(frozen=True)
+class BlocoElementos:
+    """Bloco de elementos orbitais heliocêntricos (ângulos em graus, época J2000)"""
+    nomes: np.ndarray
+    a: np.ndarray
+    e: np.ndarray
+    i: np.ndarray
+    Ω: np.ndarray
+    ω: np.ndarray
+    M: np.ndarray
+
+    def __len__(self):
+        return len(self.a)
+
+    def selecionar(self, selecao):
+        """Novo bloco apenas com as linhas indicadas (máscara ou fatia)"""
+        return BlocoElementos(*(getattr(self, campo)[selecao] for campo in CAMPOS))
+
+    @staticmethod
+    def concatenar(blocos):
+        return BlocoElementos(*(np.concatenate([getattr(b, campo) for b in blocos]) for campo in CAMPOS))
+
+
+CAMPOS = ('nomes', 'a', 'e', 'i', 'Ω', 'ω', 'M')
+
+
+def _para_j2000(a, M, epoca_jd):
+    # Propaga a anomalia média da época do arquivo até J2000 (período pela 3ª lei de Kepler)
+    n = 360.0 / (365.25 * a ** 1.5)
+    return np.mod(M - n * (epoca_jd - J2000_JD), 360.0)
+
+
+def _indices_colunas(cabecalho):
+    cabecalho = [coluna.strip() for coluna in cabecalho]
+    indices = {}
+    for campo, nomes in COLUNAS_CSV.items():
+        for nome in nomes:
+            if nome in cabecalho:
+                indices[campo] = cabecalho.index(nome)
+                break
+    faltando = {'a', 'e', 'i', 'Ω', 'ω', 'M'} - set(indices)
+    if faltando:
+        raise ValueError("Colunas ausentes no catálogo: %s" % ', '.join(sorted(faltando)))
+    return indices
+
+
+def ler_csv(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    """Gera BlocoElementos a partir de um CSV com cabeçalho (ex.: exportação do SBDB)"""
+    with open(caminho, newline='', encoding='utf8') as f:
+        leitor = csv.reader(f)
+        indices = _indices_colunas(next(leitor))
+        numericas = [indices[c] for c in ('a', 'e', 'i', 'Ω', 'ω', 'M')]
+        while True:
+            linhas = list(itertools.islice(leitor, tamanho_bloco))
+            if not linhas:
+                return
+            valores = np.array([[linha[c] or 'nan' for c in numericas] for linha in linhas], dtype=np.float64)
+            a, e, i, Ω, ω, M = valores.T
+            if 'epoca' in indices:
+                M = _para_j2000(a, M, np.array([linha[indices['epoca']] for linha in linhas], dtype=np.float64))
+            if 'nome' in indices:
+                nomes = np.array([linha[indices['nome']].strip() for linha in linhas])
+            else:
+                nomes = np.array([''] * len(linhas))
+            yield _filtrar(BlocoElementos(nomes, a, e, i, Ω, ω, M))
+
+
+def _data_compactada_jd(texto):
+    # Converte a época compactada do MPC (ex.: 'K24AH') em data juliana
+    seculos = {'I': 1800, 'J': 1900, 'K': 2000}
+    digitos = '123456789ABCDEFGHIJKLMNOPQRSTUV'
+    ano = seculos[texto[0]] + int(texto[1:3])
+    mes = digitos.index(texto[3]) + 1
+    dia = digitos.index(texto[4]) + 1
+    # Algoritmo de Fliegel & Van Flandern para o calendário gregoriano (meio-dia TT → 0h)
+    a = (14 - mes) // 12
+    y = ano + 4800 - a
+    m = mes + 12 * a - 3
+    return dia + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045 - 0.5
+
+
+def ler_mpcorb(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    """Gera BlocoElementos a partir de um arquivo de largura fixa no formato MPCORB.DAT"""
+    with open(caminho, encoding='ascii', errors='replace') as f:
+        # O cabeçalho do MPCORB.DAT termina em uma linha de traços
+        for linha in f:
+            if linha.startswith('-----'):
+                break
+        else:
+            f.seek(0)
+        linhas_validas = (linha for linha in f if len(linha) >= 103 and linha[0] != '#')
+        while True:
+            linhas = list(itertools.islice(linhas_validas, tamanho_bloco))
+            if not linhas:
+                return
+            valores = np.array([(linha[92:103], linha[70:79], linha[59:68], linha[48:57],
+                                 linha[37:46], linha[26:35]) for linha in linhas], dtype=np.float64)
+            a, e, i, Ω, ω, M = valores.T
+            epocas = np.array([_data_compactada_jd(linha[20:25]) for linha in linhas])
+            nomes = np.array([linha[166:194].strip() for linha in linhas])
+            yield _filtrar(BlocoElementos(nomes, a, e, i, Ω, ω, _para_j2000(a, M, epocas)))
+
+
+def _filtrar(bloco):
+    # Descarta órbitas abertas ou incompletas (e >= 1, a <= 0, valores ausentes)
+    valido = (np.isfinite(np.stack((bloco.a, bloco.e, bloco.i, bloco.Ω, bloco.ω, bloco.M))).all(axis=0)
+              & (bloco.a > 0) & (bloco.e >= 0) & (bloco.e < 1))
+    return bloco if valido.all() else bloco.selecionar(valido)
+
+
+def ler_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    """Escolhe o leitor pela extensão: .csv para CSV, qualquer outra para MPCORB"""
+    if os.path.splitext(caminho)[1].lower() == '.csv':
+        return ler_csv(caminho, tamanho_bloco)
+    return ler_mpcorb(caminho, tamanho_bloco)
+
+
+def carregar_corpos_menores(caminho, limite=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê o catálogo inteiro (ou os primeiros `limite` corpos) em um único BlocoElementos"""
+    blocos, total = [], 0
+    for bloco in ler_blocos(caminho, tamanho_bloco):
+        if limite is not None and total + len(bloco) > limite:
+            bloco = bloco.selecionar(slice(0, limite - total))
+        blocos.append(bloco)
+        total += len(bloco)
+        if limite is not None and total >= limite:
+            break
+    if not blocos:
+        vazio = np.zeros(0)
+        return BlocoElementos(np.array([], dtype=str), vazio, vazio, vazio, vazio, vazio, vazio)
+    return BlocoElementos.concatenar(blocos)
+
+
+def efemerides_corpos_menores(elementos, escala=1.0, dtype=np.float32):
+    """Monta um motor de efemérides heliocêntrico para os elementos lidos.
+
+    Por padrão calcula em float32, precisão suficiente para exibição e muito
+    mais rápida em catálogos grandes.
+    """
+    return Efemerides(elementos.nomes, elementos.a, 365.25 * elementos.a ** 1.5, elementos.e,
+                      np.radians(elementos.i), np.radians(elementos.Ω), np.radians(elementos.ω),
+                      np.radians(elementos.M), np.full(len(elementos), -1), escala=escala, dtype=dtype)
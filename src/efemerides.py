@@ -0,0 +1,175 @@
+# Motor de efemérides vetorizado: mantém os elementos orbitais de todos os
+# corpos em arrays contíguos e calcula as posições em uma única passada NumPy.
+import datetime
+
+import numpy as np
+
+from src.kepler import resolver_kepler, anomalia_verdadeira, normalizar_angulo
+
+EPOCA_J2000 = datetime.datetime(2000, 1, 1, 12, 0, 0)  # Época dos elementos de corpos.yaml
+
+
+def dias_desde_j2000(data):
+    """Converte um datetime em dias (fracionários) desde a época J2000"""
+    return (data - EPOCA_J2000).total_seconds() / 86400
+
+
+def niveis_hierarquia(pais):
+    """Agrupa os corpos por profundidade na hierarquia (luas, luas de luas...).
+
+    Retorna (niveis, raizes): a lista de índices de cada nível a partir do
+    primeiro nível de satélites, na ordem em que as posições dos pais devem ser
+    somadas, e o ancestral de nível mais alto de cada corpo.
+    """
+    pais = np.asarray(pais)
+    profundidade = np.zeros(len(pais), dtype=np.int64)
+    raizes = np.arange(len(pais))
+    for k in np.flatnonzero(pais >= 0):
+        pai = pais[k]
+        while pai >= 0:
+            profundidade[k] += 1
+            raizes[k] = pai
+            pai = pais[pai]
+    niveis = [np.flatnonzero(profundidade == nivel)
+              for nivel in range(1, int(profundidade.max(initial=0)) + 1)]
+    return niveis, raizes
+
+
+def somar_pais(locais, pais, niveis):
+    """Soma as posições dos pais, nível a nível, a um bloco (… × corpos × 3) de posições locais"""
+    pos = np.array(locais, dtype=np.float64)
+    for filhos in niveis:
+        pos[..., filhos, :] += pos[..., pais[filhos], :]
+    return pos
+
+
+class Efemerides:
+    """Calcula posições de todos os corpos a partir de arrays de elementos orbitais"""
+
+    def __init__(self, nomes, a, T, e, i, Ω, ω, M, pais, escala=1.0, dtype=np.float64):
+        """dtype define a precisão do cálculo das posições; float32 é bem mais rápido
+        para grandes catálogos, em que a precisão de exibição basta"""
+        self.nomes = list(nomes)
+        self.indice = {nome: k for k, nome in enumerate(self.nomes)}
+        self.escala = float(escala)
+
+        # Um array contíguo por elemento orbital (ângulos em radianos)
+        self.a = np.ascontiguousarray(a, dtype=np.float64)
+        self.periodo_dias = np.ascontiguousarray(T, dtype=np.float64)
+        self.e = np.ascontiguousarray(e, dtype=np.float64)
+        self.i = np.ascontiguousarray(i, dtype=np.float64)
+        self.Ω = np.ascontiguousarray(Ω, dtype=np.float64)
+        self.ω = np.ascontiguousarray(ω, dtype=np.float64)
+        self.M0 = np.ascontiguousarray(M, dtype=np.float64)  # Anomalia média na época J2000
+        self.pais = np.ascontiguousarray(pais, dtype=np.int64)
+
+        # Constantes derivadas usadas em toda chamada
+        self.a_escalado = self.a * self.escala
+        self.b_escalado = self.a_escalado * np.sqrt(1 - self.e ** 2)
+        self.n = 2 * np.pi / self.periodo_dias  # Movimento médio (rad/dia)
+        self.P, self.Q = self._base_perifocal()
+        self.W = np.cross(self.P, self.Q)  # Normal ao plano orbital
+        self.dtype = np.dtype(dtype)
+        self._a_calc, self._b_calc, self._e_calc, self._P_calc, self._Q_calc = (
+            x.astype(self.dtype) for x in (self.a_escalado, self.b_escalado, self.e, self.P, self.Q))
+        self.niveis, self.raizes = niveis_hierarquia(self.pais)
+        self.relatorio_kepler = None  # Relatório da última solução da equação de Kepler
+        self.ultimas_anomalias = np.zeros_like(self.a)  # Anomalias excêntricas do último instante
+
+    @classmethod
+    def de_catalogo(cls, catalogo, escala=1.0):
+        """Constrói o motor a partir de um Catalogo compilado"""
+        return cls(catalogo.chaves, catalogo.a, catalogo.periodo_dias, catalogo.e,
+                   catalogo.i, catalogo.Ω, catalogo.ω, catalogo.M, catalogo.pais,
+                   escala=escala)
+
+    def selecionar(self, indices):
+        """Novo motor só com os corpos indicados; pais fora da seleção viram a origem"""
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+        novo_indice = np.full(len(self.nomes), -1)
+        novo_indice[indices] = np.arange(len(indices))
+        pais = np.where(self.pais[indices] >= 0, novo_indice[self.pais[indices]], -1)
+        return Efemerides([self.nomes[k] for k in indices], self.a[indices], self.periodo_dias[indices],
+                          self.e[indices], self.i[indices], self.Ω[indices], self.ω[indices],
+                          self.M0[indices], pais, escala=self.escala, dtype=self.dtype)
+
+    def anomalias_excentricas(self, tempos, E_inicial=None):
+        """Anomalia excêntrica de cada corpo, com forma (tempos × corpos)"""
+        t = np.asarray(tempos, dtype=np.float64).reshape(-1, 1)
+        # A anomalia média é reduzida em float64 antes de seguir na precisão do motor
+        M = normalizar_angulo(self.M0 + self.n * t).astype(self.dtype, copy=False)
+        E, self.relatorio_kepler = resolver_kepler(M, self._e_calc, E_inicial=E_inicial)
+        self.ultimas_anomalias = E[-1]
+        return E
+
+    def _base_perifocal(self):
+        # Vetores unitários P (rumo ao periélio) e Q (90° adiante no plano orbital)
+        # expressos no referencial da eclíptica
+        cos_Ω, sin_Ω = np.cos(self.Ω), np.sin(self.Ω)
+        cos_i, sin_i = np.cos(self.i), np.sin(self.i)
+        cos_ω, sin_ω = np.cos(self.ω), np.sin(self.ω)
+        P = np.stack((cos_ω * cos_Ω - sin_ω * sin_Ω * cos_i,
+                      cos_ω * sin_Ω + sin_ω * cos_Ω * cos_i,
+                      sin_ω * sin_i), axis=-1)
+        Q = np.stack((-sin_ω * cos_Ω - cos_ω * sin_Ω * cos_i,
+                      -sin_ω * sin_Ω + cos_ω * cos_Ω * cos_i,
+                      cos_ω * sin_i), axis=-1)
+        return P, Q
+
+    def anomalias_verdadeiras(self, tempos):
+        """Anomalia verdadeira de cada corpo, com forma (tempos × corpos)"""
+        return anomalia_verdadeira(self.anomalias_excentricas(tempos), self.e)
+
+    def posicoes_locais_em(self, tempos, E_inicial=None):
+        """Posições relativas ao corpo pai, com forma (tempos × corpos × 3)"""
+        E = self.anomalias_excentricas(tempos, E_inicial)
+        x_orb = self._a_calc * (np.cos(E) - self._e_calc)
+        y_orb = self._b_calc * np.sin(E)
+        return x_orb[..., None] * self._P_calc + y_orb[..., None] * self._Q_calc
+
+    def velocidades_locais_em(self, tempos):
+        """Velocidades relativas ao corpo pai (unidades de escala por dia), forma (tempos × corpos × 3)"""
+        E = self.anomalias_excentricas(tempos).astype(np.float64)
+        E_ponto = self.n / (1 - self.e * np.cos(E))  # dE/dt pela derivada da equação de Kepler
+        vx_orb = -self.a_escalado * np.sin(E) * E_ponto
+        vy_orb = self.b_escalado * np.cos(E) * E_ponto
+        return vx_orb[..., None] * self.P + vy_orb[..., None] * self.Q
+
+    def locais_de_anomalias(self, E):
+        """Posições locais (corpos × 3) correspondentes às anomalias excêntricas E"""
+        x_orb = self.a_escalado * (np.cos(E) - self.e)
+        y_orb = self.b_escalado * np.sin(E)
+        return x_orb[:, None] * self.P + y_orb[:, None] * self.Q
+
+    def anomalias_de_locais(self, locais):
+        """Recupera a anomalia excêntrica de cada corpo a partir das posições locais (corpos × 3)"""
+        locais = np.asarray(locais, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cos_E = np.einsum('ij,ij->i', locais, self.P) / self.a_escalado + self.e
+            sin_E = np.einsum('ij,ij->i', locais, self.Q) / self.b_escalado
+        return np.where(self.a > 0, np.arctan2(sin_E, cos_E), 0.0)
+
+    def pontos_orbita(self, indices, E_inicial, num_segmentos):
+        """Pontos da elipse de cada corpo (locais ao pai), partindo da anomalia atual.
+
+        Retorna um array (corpos × num_segmentos+1 × 3) amostrado uniformemente
+        na anomalia excêntrica a partir de E_inicial.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        passos = 2 * np.pi * np.arange(num_segmentos + 1) / num_segmentos
+        E = np.asarray(E_inicial, dtype=np.float64).reshape(-1, 1) + passos
+        x_orb = self.a_escalado[indices, None] * (np.cos(E) - self.e[indices, None])
+        y_orb = self.b_escalado[indices, None] * np.sin(E)
+        return x_orb[..., None] * self.P[indices, None] + y_orb[..., None] * self.Q[indices, None]
+
+    def absolutas(self, locais):
+        """Soma as posições dos pais, nível a nível, a um bloco (… × corpos × 3) de posições locais"""
+        return somar_pais(locais, self.pais, self.niveis)
+
+    def posicoes_em(self, tempos):
+        """Posições absolutas de todos os corpos, com forma (tempos × corpos × 3)"""
+        return self.absolutas(self.posicoes_locais_em(tempos))
+
+    def posicoes(self, tempo):
+        """Posições absolutas de todos os corpos em um único instante (corpos × 3)"""
+        return self.posicoes_em((tempo,))[0]
@@ -0,0 +1,109 @@
+# Estado da simulação com campos tipados, rastreamento de alterações e
+# assinantes: o trabalho derivado (visibilidade, textos, lente) só é refeito
+# quando um campo do qual depende muda.
+from dataclasses import dataclass
+
+MAX_RODADAS = 8  # Rodadas de notificação por quadro (assinantes podem alterar outros campos)
+
+
+@dataclass(frozen=True)
+class Campo:
+    """Declaração de um campo do estado"""
+    tipo: type
+    padrao: object
+    descricao: str = ''
+
+
+class Estado:
+    """Estado com campos declarados, compatível com o acesso por chave de um dicionário.
+
+    Atribuições convertem o valor para o tipo do campo e só contam como
+    alteração quando o valor muda. As alterações se acumulam até processar(),
+    chamado uma vez por quadro, que avisa cada assinante uma única vez com o
+    conjunto de campos alterados que lhe interessam.
+    """
+
+    def __init__(self, campos, **valores):
+        object.__setattr__(self, '_campos', dict(campos))
+        object.__setattr__(self, '_valores', {nome: campo.padrao for nome, campo in campos.items()})
+        object.__setattr__(self, '_versoes', dict.fromkeys(campos, 0))
+        object.__setattr__(self, '_sujos', set(campos))  # Na primeira rodada todos os assinantes são avisados
+        object.__setattr__(self, '_assinantes', [])
+        for nome, valor in valores.items():
+            self[nome] = valor
+
+    # Acesso por chave, como no antigo dicionário simulation_state
+    def __getitem__(self, nome):
+        return self._valores[nome]
+
+    def __setitem__(self, nome, valor):
+        campo = self._campos.get(nome)
+        if campo is None:
+            raise KeyError("Campo de estado desconhecido: %s" % nome)
+        if not isinstance(valor, campo.tipo):
+            try:
+                valor = campo.tipo(valor)
+            except (TypeError, ValueError):
+                raise TypeError("O campo %s espera %s, recebeu %r" % (nome, campo.tipo.__name__, valor)) from None
+        if valor != self._valores[nome]:
+            self._valores[nome] = valor
+            self._versoes[nome] += 1
+            self._sujos.add(nome)
+
+    def __contains__(self, nome):
+        return nome in self._campos
+
+    def __iter__(self):
+        return iter(self._campos)
+
+    def __len__(self):
+        return len(self._campos)
+
+    def get(self, nome, padrao=None):
+        return self._valores.get(nome, padrao)
+
+    def keys(self):
+        return self._campos.keys()
+
+    def items(self):
+        return self._valores.items()
+
+    # Acesso por atributo (estado.zoom)
+    def __getattr__(self, nome):
+        try:
+            return self._valores[nome]
+        except KeyError:
+            raise AttributeError(nome) from None
+
+    def __setattr__(self, nome, valor):
+        self[nome] = valor
+
+    def __repr__(self):
+        return 'Estado(%s)' % ', '.join('%s=%r' % item for item in self._valores.items())
+
+    def versao(self, nome):
+        """Contador de alterações do campo, útil para caches derivados"""
+        return self._versoes[nome]
+
+    def assinar(self, callback, *campos):
+        """Registra callback(estado, alterados) para quando algum dos campos mudar.
+
+        Sem campos, o assinante é avisado de qualquer alteração.
+        """
+        self._assinantes.append((callback, frozenset(campos) or None))
+
+    def processar(self):
+        """Avisa os assinantes das alterações acumuladas desde a última chamada.
+
+        Alterações feitas pelos próprios assinantes (ex.: limitar o zoom ao
+        trocar de alvo) são entregues em novas rodadas, até o estado se estabilizar.
+        """
+        for _ in range(MAX_RODADAS):
+            if not self._sujos:
+                return
+            sujos = frozenset(self._sujos)
+            self._sujos.clear()
+            for callback, campos in self._assinantes:
+                alterados = sujos if campos is None else sujos & campos
+                if alterados:
+                    callback(self, alterados)
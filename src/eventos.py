@@ -0,0 +1,311 @@
+# Busca de eventos astronômicos ao longo de anos ou séculos: menor distância
+# entre dois corpos, conjunção (mesma longitude eclíptica vista da Terra) e
+# oposição (corpo do lado oposto ao Sol visto da Terra). Uma varredura grossa
+# e vetorizada localiza os intervalos de cada evento, que são refinados todos
+# juntos; consultas de pares diferentes rodam em processos separados.
+#
+# Uso: python -m src.eventos conjuncao jupiter saturno --inicio 2000-01-01 --fim 2100-01-01
+#      python -m src.eventos aproximacao terra marte venus --fim 2100-01-01 --limite 0.5
+#      python -m src.eventos oposicao marte jupiter --fim 2050-01-01 --tabela efemerides.cheb
+import argparse, datetime, itertools, json, math, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.catalogo import carregar_catalogo, CAMINHO_PADRAO
+from src.efemerides import Efemerides, EPOCA_J2000
+from src.kepler import normalizar_angulo
+
+TIPOS = ('aproximacao', 'conjuncao', 'oposicao')
+OBSERVADOR = 'terra'
+PONTOS_POR_PERIODO = 20     # Amostras da varredura grossa por período orbital mais curto envolvido
+PASSO_MIN = 1 / 24          # Limites do passo automático da varredura (dias)
+PASSO_MAX = 1.0
+TOLERANCIA_TEMPO = 1e-5     # Precisão do refinamento (dias, ~1 s)
+AMOSTRAS_POR_BLOCO = 100000  # Limita a memória da varredura em intervalos longos
+_RAZAO_AUREA = (math.sqrt(5) - 1) / 2
+
+# Fonte de posições de cada processo, montada uma única vez pelo inicializador
+_fonte = None
+
+
+@dataclass(frozen=True)
+class Evento:
+    tipo: str
+    corpos: tuple   # (A, B) para aproximação e conjunção; (A,) para oposição
+    tempo: float    # Dias desde J2000
+    valor: float    # Distância em UA (aproximação) ou separação angular em graus
+
+    @property
+    def data(self):
+        return EPOCA_J2000 + datetime.timedelta(days=self.tempo)
+
+    def descricao(self):
+        unidade = 'UA' if self.tipo == 'aproximacao' else '°'
+        return '%s  %-11s %-20s %12.6g %s' % (
+            self.data.isoformat(sep=' ', timespec='seconds'), self.tipo, ' - '.join(self.corpos), self.valor, unidade)
+
+
+def _iniciar_processo(caminho_yaml, caminho_tabela):
+    global _fonte
+    _fonte = _abrir_fonte(caminho_yaml, caminho_tabela)
+
+
+def _abrir_fonte(caminho_yaml, caminho_tabela):
+    # Posições em unidades astronômicas: o modelo kepleriano ou uma tabela de Chebyshev
+    if caminho_tabela:
+        from src.chebyshev import TabelaChebyshev
+        return TabelaChebyshev(caminho_tabela, escala=1.0)
+    return Efemerides.de_catalogo(carregar_catalogo(caminho_yaml))
+
+
+def _motor_reduzido(fonte, indices):
+    """Motor só com os corpos pedidos e seus ancestrais, e a coluna de cada corpo pedido nele"""
+    necessarios = set()
+    for k in indices:
+        while k >= 0 and k not in necessarios:
+            necessarios.add(k)
+            k = int(fonte.pais[k])
+    if not hasattr(fonte, 'selecionar'):
+        return fonte, list(indices)  # Tabelas avaliam todos os corpos de uma vez
+    ordem = sorted(necessarios)
+    return fonte.selecionar(ordem), [ordem.index(k) for k in indices]
+
+
+def _longitudes(vetores):
+    return np.arctan2(vetores[..., 1], vetores[..., 0])
+
+
+def _angulo(u, v):
+    """Ângulo em graus entre os vetores (… × 3)"""
+    cruzado = np.linalg.norm(np.cross(u, v), axis=-1)
+    return np.degrees(np.arctan2(cruzado, np.einsum('...k,...k->...', u, v)))
+
+
+def funcoes_evento(tipo, fonte, corpos, observador=OBSERVADOR):
+    """(f, valor, minimo): f(tempos) é minimizada (minimo=True) ou tem raízes nos eventos;
+    valor(tempos) é a grandeza informada em cada evento."""
+    nomes = list(fonte.nomes)
+    papeis = list(corpos)
+    if tipo == 'aproximacao':
+        if len(corpos) != 2:
+            raise ValueError("A aproximação é entre dois corpos")
+    elif tipo == 'conjuncao':
+        if len(corpos) != 2 or observador in corpos:
+            raise ValueError("A conjunção é entre dois corpos diferentes do observador (%s)" % observador)
+        papeis.append(observador)
+    elif tipo == 'oposicao':
+        if len(corpos) != 1 or corpos[0] in ('sol', observador):
+            raise ValueError("A oposição é de um único corpo, diferente do Sol e do observador")
+        papeis += ['sol', observador]
+    else:
+        raise ValueError("Tipo de evento desconhecido: %s" % tipo)
+    desconhecidos = [nome for nome in papeis if nome not in nomes]
+    if desconhecidos:
+        raise ValueError("Corpos desconhecidos: %s" % ', '.join(desconhecidos))
+    motor, colunas = _motor_reduzido(fonte, [nomes.index(nome) for nome in papeis])
+
+    def posicoes(tempos):
+        return motor.posicoes_em(tempos)[:, colunas]
+
+    if tipo == 'aproximacao':
+        def distancia(tempos):
+            r = posicoes(tempos)
+            return np.linalg.norm(r[:, 0] - r[:, 1], axis=-1)
+        return distancia, distancia, True
+
+    def vistos_do_observador(tempos):
+        r = posicoes(tempos)
+        return r[:, :-1] - r[:, -1:]
+
+    if tipo == 'conjuncao':
+        def diferenca_longitude(tempos):
+            u = vistos_do_observador(tempos)
+            return normalizar_angulo(_longitudes(u[:, 0]) - _longitudes(u[:, 1]))
+
+        def separacao(tempos):
+            u = vistos_do_observador(tempos)
+            return _angulo(u[:, 0], u[:, 1])
+        return diferenca_longitude, separacao, False
+
+    def diferenca_oposicao(tempos):
+        u = vistos_do_observador(tempos)
+        return normalizar_angulo(_longitudes(u[:, 0]) - _longitudes(u[:, 1]) - np.pi)
+
+    def elongacao(tempos):
+        u = vistos_do_observador(tempos)
+        return _angulo(u[:, 0], u[:, 1])
+    return diferenca_oposicao, elongacao, False
+
+
+def intervalos_candidatos(f, inicio, fim, passo, minimo):
+    """Varredura grossa: intervalos [a, b] que contêm um mínimo local (ou uma raiz) de f"""
+    total = int(math.floor((fim - inicio) / passo)) + 1
+    esquerdas, direitas = [], []
+    anteriores_t = anteriores_f = np.empty(0)
+    for primeiro in range(0, total, AMOSTRAS_POR_BLOCO):
+        # Cada bloco repete as duas últimas amostras do anterior para não perder eventos na emenda
+        t = np.concatenate((anteriores_t, inicio + passo * np.arange(primeiro, min(primeiro + AMOSTRAS_POR_BLOCO, total))))
+        valores = np.concatenate((anteriores_f, f(t[len(anteriores_t):])))
+        if minimo:
+            k = np.flatnonzero((valores[1:-1] < valores[:-2]) & (valores[1:-1] <= valores[2:])) + 1
+            esquerdas.append(t[k - 1])
+            direitas.append(t[k + 1])
+        else:
+            # Troca de sinal longe de ±π (onde a diferença angular só dá a volta)
+            troca = (np.sign(valores[:-1]) != np.sign(valores[1:])) & \
+                    (np.abs(valores[:-1]) < np.pi / 2) & (np.abs(valores[1:]) < np.pi / 2)
+            k = np.flatnonzero(troca)
+            esquerdas.append(t[k])
+            direitas.append(t[k + 1])
+        anteriores_t, anteriores_f = t[-2:], valores[-2:]
+    if not esquerdas:
+        return np.empty(0), np.empty(0)
+    a, b = np.concatenate(esquerdas), np.concatenate(direitas)
+    # Raízes na emenda de blocos podem aparecer duas vezes
+    _, unicos = np.unique(a, return_index=True)
+    return a[unicos], b[unicos]
+
+
+def refinar_minimos(f, a, b, tolerancia=TOLERANCIA_TEMPO):
+    """Seção áurea em todos os intervalos ao mesmo tempo (uma avaliação de f por iteração)"""
+    a, b = a.copy(), b.copy()
+    c = b - _RAZAO_AUREA * (b - a)
+    d = a + _RAZAO_AUREA * (b - a)
+    fc, fd = f(c), f(d)
+    while len(a) and np.max(b - a) > tolerancia:
+        esquerda = fc < fd  # O mínimo está em [a, d]; senão, em [c, b]
+        a, b = np.where(esquerda, a, c), np.where(esquerda, d, b)
+        # Um dos pontos internos é reaproveitado; só o outro é avaliado
+        novo = np.where(esquerda, b - _RAZAO_AUREA * (b - a), a + _RAZAO_AUREA * (b - a))
+        f_novo = f(novo)
+        c, fc, d, fd = (np.where(esquerda, novo, d), np.where(esquerda, f_novo, fd),
+                        np.where(esquerda, c, novo), np.where(esquerda, fc, f_novo))
+    return (a + b) / 2
+
+
+def refinar_raizes(f, a, b, tolerancia=TOLERANCIA_TEMPO):
+    """Bisseção em todos os intervalos ao mesmo tempo"""
+    a, b = a.copy(), b.copy()
+    fa = f(a)
+    while len(a) and np.max(b - a) > tolerancia:
+        m = (a + b) / 2
+        fm = f(m)
+        mesmo_lado = np.sign(fm) == np.sign(fa)
+        a = np.where(mesmo_lado, m, a)
+        fa = np.where(mesmo_lado, fm, fa)
+        b = np.where(mesmo_lado, b, m)
+    return (a + b) / 2
+
+
+def buscar(tipo, corpos, inicio, fim, passo, fonte=None, limite=None, observador=OBSERVADOR,
+           tolerancia=TOLERANCIA_TEMPO):
+    """Eventos de um tipo para um par (ou corpo) entre inicio e fim (dias desde J2000).
+
+    limite descarta os eventos cujo valor o excede (ex.: conjunções a mais de 1°).
+    """
+    fonte = fonte if fonte is not None else _fonte
+    f, valor, minimo = funcoes_evento(tipo, fonte, corpos, observador)
+    a, b = intervalos_candidatos(f, inicio, fim, passo, minimo)
+    tempos = refinar_minimos(f, a, b, tolerancia) if minimo else refinar_raizes(f, a, b, tolerancia)
+    valores = valor(tempos) if len(tempos) else np.empty(0)
+    return [Evento(tipo, tuple(corpos), float(t), float(v)) for t, v in zip(tempos, valores)
+            if limite is None or v <= limite]
+
+
+def _buscar_consulta(argumentos):
+    return buscar(*argumentos)
+
+
+def passo_automatico(catalogo, corpos, observador=OBSERVADOR):
+    """Passo da varredura: uma fração do menor período entre os corpos envolvidos e seus ancestrais"""
+    periodos = []
+    for nome in set(corpos) | {observador}:
+        k = catalogo.indice[nome]
+        while k >= 0:
+            if catalogo.tem_orbita[k]:
+                periodos.append(catalogo.periodo_dias[k])
+            k = catalogo.pais[k]
+    passo = min(periodos) / PONTOS_POR_PERIODO if periodos else PASSO_MAX
+    return min(max(passo, PASSO_MIN), PASSO_MAX)
+
+
+def consultas_para(tipo, corpos):
+    """Um par para cada combinação de corpos (aproximação e conjunção) ou um corpo por consulta (oposição)"""
+    if tipo == 'oposicao':
+        return [(corpo,) for corpo in corpos]
+    return list(itertools.combinations(corpos, 2))
+
+
+def buscar_eventos(tipo, corpos, inicio, fim, passo=None, limite=None, processos=None,
+                   caminho_yaml=CAMINHO_PADRAO, caminho_tabela=None):
+    """Busca os eventos de todas as consultas, em paralelo entre processos, ordenados pelo tempo"""
+    if tipo not in TIPOS:
+        raise ValueError("Tipo de evento desconhecido: %s" % tipo)
+    if fim <= inicio:
+        raise ValueError("O fim do intervalo deve ser posterior ao início")
+    catalogo = carregar_catalogo(caminho_yaml)
+    corpos = [corpo.lower() for corpo in corpos]
+    desconhecidos = [corpo for corpo in corpos if corpo not in catalogo.indice]
+    if desconhecidos:
+        raise ValueError("Corpos desconhecidos: %s" % ', '.join(desconhecidos))
+    consultas = consultas_para(tipo, corpos)
+    if not consultas:
+        raise ValueError("Informe ao menos %s" % ('um corpo' if tipo == 'oposicao' else 'dois corpos'))
+    if caminho_tabela:
+        from src.chebyshev import TabelaChebyshev
+        tabela = TabelaChebyshev(caminho_tabela)
+        if not (tabela.cobre(inicio) and tabela.cobre(fim)):
+            raise ValueError("A tabela cobre apenas [%g, %g] dias desde J2000" % (tabela.inicio, tabela.fim))
+    argumentos = [(tipo, consulta, inicio, fim, passo or passo_automatico(catalogo, consulta), None, limite)
+                  for consulta in consultas]
+
+    processos = min(processos or os.cpu_count() or 1, len(consultas))
+    if processos == 1:
+        _iniciar_processo(caminho_yaml, caminho_tabela)
+        resultados = [_buscar_consulta(argumento) for argumento in argumentos]
+    else:
+        with ProcessPoolExecutor(processos, initializer=_iniciar_processo,
+                                 initargs=(caminho_yaml, caminho_tabela)) as executor:
+            resultados = list(executor.map(_buscar_consulta, argumentos))
+    return sorted((evento for eventos in resultados for evento in eventos), key=lambda evento: evento.tempo)
+
+
+def main(argv=None):
+    from src.exportar import ler_data, ler_passo
+
+    parser = argparse.ArgumentParser(description="Busca conjunções, oposições e aproximações entre corpos")
+    parser.add_argument('tipo', choices=TIPOS)
+    parser.add_argument('corpos', nargs='+', help="Chaves dos corpos; todos os pares são consultados")
+    parser.add_argument('--inicio', default='2000-01-01T12:00', help="Data ISO ou dias desde J2000")
+    parser.add_argument('--fim', required=True, help="Data ISO ou dias desde J2000")
+    parser.add_argument('--passo', help="Passo da varredura grossa: 1h, 6h, 1d... (padrão: automático)")
+    parser.add_argument('--limite', type=float,
+                        help="Descarta eventos acima deste valor (UA para aproximações, graus para conjunções)")
+    parser.add_argument('--processos', type=int, default=None, help="Padrão: número de CPUs")
+    parser.add_argument('--tabela', help="Tabela de Chebyshev (python -m src.chebyshev) no lugar do modelo analítico")
+    parser.add_argument('--saida', help="Grava os eventos também em JSON")
+    parser.add_argument('--corpos-yaml', default=CAMINHO_PADRAO, help="Catálogo de corpos")
+    args = parser.parse_args(argv)
+
+    inicio_busca = time.perf_counter()
+    try:
+        eventos = buscar_eventos(args.tipo, args.corpos, ler_data(args.inicio), ler_data(args.fim),
+                                 passo=ler_passo(args.passo) if args.passo else None, limite=args.limite,
+                                 processos=args.processos, caminho_yaml=args.corpos_yaml,
+                                 caminho_tabela=args.tabela)
+    except ValueError as erro:
+        parser.error(str(erro))
+    for evento in eventos:
+        print(evento.descricao())
+    print("%d eventos em %.2f s" % (len(eventos), time.perf_counter() - inicio_busca), file=sys.stderr)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf8') as f:
+            json.dump([{'tipo': evento.tipo, 'corpos': evento.corpos, 'dias_j2000': evento.tempo,
+                        'data': evento.data.isoformat(), 'valor': evento.valor} for evento in eventos],
+                      f, indent=1, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
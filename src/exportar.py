@@ -0,0 +1,190 @@
+# Exportação de efemérides sem janela: calcula as posições dos corpos escolhidos
+# em um intervalo de tempo e grava o resultado em blocos (CSV, NPY ou binário),
+# dividindo intervalos longos entre vários processos.
+#
+# Uso: python -m src.exportar terra marte --inicio 2000-01-01 --fim 2030-01-01 \
+#          --passo 1min --formato npy --saida terra_marte.npy
+import argparse, datetime, json, os, re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.catalogo import carregar_catalogo, CAMINHO_PADRAO, AU
+from src.efemerides import Efemerides, EPOCA_J2000, dias_desde_j2000
+
+FORMATOS = ('csv', 'npy', 'bin')
+TAMANHO_BLOCO = 50000  # Instantes por bloco (~20 MB por bloco para o catálogo padrão)
+UNIDADES_PASSO = {'s': 1 / 86400, 'min': 1 / 1440, 'h': 1 / 24, 'd': 1.0}
+
+# Motor de efemérides de cada processo, montado uma única vez pelo inicializador
+_efemerides = None
+
+
+def ler_passo(texto):
+    """Converte passos como '1min', '6h', '30s' ou '1d' em dias"""
+    correspondencia = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*(s|min|h|d)\s*', texto)
+    if correspondencia is None:
+        raise ValueError("Passo inválido: %r (use, por exemplo, 30s, 1min, 6h ou 1d)" % texto)
+    valor, unidade = correspondencia.groups()
+    passo = float(valor) * UNIDADES_PASSO[unidade]
+    if passo <= 0:
+        raise ValueError("O passo deve ser positivo")
+    return passo
+
+
+def ler_data(texto):
+    """Aceita datas ISO (2000-01-01 ou 2000-01-01T12:00) ou dias desde J2000 (ex.: 3652.5).
+
+    Datas com fuso (2000-01-01T12:00-03:00) são convertidas para UTC; as sem fuso
+    já são lidas como UTC.
+    """
+    try:
+        return float(texto)
+    except ValueError:
+        data = datetime.datetime.fromisoformat(texto)
+        if data.tzinfo is not None:
+            data = data.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return dias_desde_j2000(data)
+
+
+def _iniciar_processo(caminho_yaml, escala):
+    global _efemerides
+    _efemerides = Efemerides.de_catalogo(carregar_catalogo(caminho_yaml), escala=escala)
+
+
+def calcular_bloco(argumentos):
+    """Posições (instantes × corpos × 3) dos corpos selecionados em um bloco de instantes.
+
+    Os instantes são obtidos pelo índice (inicio + k·passo), e não somando o
+    passo, para que o erro de arredondamento não cresça ao longo do intervalo.
+    """
+    inicio, passo, primeiro, ultimo, indices = argumentos
+    tempos = inicio + passo * np.arange(primeiro, ultimo, dtype=np.float64)
+    return tempos, _efemerides.posicoes_em(tempos)[:, indices]
+
+
+class Gravador:
+    """Grava blocos sucessivos em um arquivo sem manter a tabela inteira na memória"""
+
+    def __init__(self, caminho, formato, nomes, total):
+        self.formato = formato
+        if formato == 'npy':
+            self.destino = np.lib.format.open_memmap(caminho, mode='w+', dtype='<f8',
+                                                     shape=(total, len(nomes), 3))
+            self.linha = 0
+        elif formato == 'csv':
+            self.destino = open(caminho, 'w', encoding='utf8')
+            colunas = ['dias_j2000'] + ['%s_%s' % (nome, eixo) for nome in nomes for eixo in 'xyz']
+            self.destino.write(','.join(colunas) + '\n')
+        else:
+            self.destino = open(caminho, 'wb')
+
+    def escrever(self, tempos, posicoes):
+        if self.formato == 'npy':
+            self.destino[self.linha:self.linha + len(tempos)] = posicoes
+            self.linha += len(tempos)
+        elif self.formato == 'csv':
+            tabela = np.column_stack((tempos, posicoes.reshape(len(tempos), -1)))
+            np.savetxt(self.destino, tabela, fmt='%.12g', delimiter=',')
+        else:
+            self.destino.write(np.ascontiguousarray(posicoes, dtype='<f8').tobytes())
+
+    def fechar(self):
+        if self.formato == 'npy':
+            self.destino.flush()
+            del self.destino
+        else:
+            self.destino.close()
+
+
+def exportar(corpos, inicio, fim, passo, caminho, formato='npy', processos=None,
+             tamanho_bloco=TAMANHO_BLOCO, em_ua=True, caminho_yaml=CAMINHO_PADRAO):
+    """Calcula e grava as posições de `corpos` entre `inicio` e `fim` (dias desde J2000).
+
+    O intervalo é fechado: o último instante é o maior inicio + k·passo <= fim.
+    Retorna o número de instantes gravados. Além do arquivo de dados, grava um
+    `<caminho>.json` com os metadados necessários para reconstruir os tempos.
+    """
+    if formato not in FORMATOS:
+        raise ValueError("Formato desconhecido: %s" % formato)
+    if fim < inicio:
+        raise ValueError("O fim do intervalo é anterior ao início")
+    catalogo = carregar_catalogo(caminho_yaml)
+    corpos = [corpo.lower() for corpo in corpos] or list(catalogo.chaves)
+    desconhecidos = [corpo for corpo in corpos if corpo not in catalogo.indice]
+    if desconhecidos:
+        raise ValueError("Corpos desconhecidos: %s" % ', '.join(desconhecidos))
+    indices = np.array([catalogo.indice[corpo] for corpo in corpos])
+    escala = 1.0 if em_ua else AU  # O catálogo guarda a em unidades astronômicas
+    total = int(np.floor((fim - inicio) / passo + 1e-9)) + 1
+    blocos = [(inicio, passo, primeiro, min(primeiro + tamanho_bloco, total), indices)
+              for primeiro in range(0, total, tamanho_bloco)]
+
+    gravador = Gravador(caminho, formato, corpos, total)
+    try:
+        processos = processos or os.cpu_count() or 1
+        if processos == 1 or len(blocos) == 1:
+            _iniciar_processo(caminho_yaml, escala)
+            for bloco in blocos:
+                gravador.escrever(*calcular_bloco(bloco))
+        else:
+            with ProcessPoolExecutor(processos, initializer=_iniciar_processo,
+                                     initargs=(caminho_yaml, escala)) as executor:
+                # Mantém no máximo dois blocos por processo em andamento, gravando na ordem:
+                # a memória fica limitada mesmo quando o disco é mais lento que o cálculo
+                pendentes = deque()
+                for bloco in blocos:
+                    if len(pendentes) >= 2 * processos:
+                        gravador.escrever(*pendentes.popleft().result())
+                    pendentes.append(executor.submit(calcular_bloco, bloco))
+                while pendentes:
+                    gravador.escrever(*pendentes.popleft().result())
+    finally:
+        gravador.fechar()
+
+    metadados = {
+        'corpos': corpos,
+        'inicio_dias_j2000': inicio,
+        'passo_dias': passo,
+        'instantes': total,
+        'epoca': EPOCA_J2000.isoformat(),
+        'unidade': 'ua' if em_ua else 'm',
+        'formato': formato,
+        'forma': [total, len(corpos), 3],
+        'tipo': 'float64 little-endian',
+    }
+    with open(caminho + '.json', 'w', encoding='utf8') as f:
+        json.dump(metadados, f, indent=2, ensure_ascii=False)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta posições heliocêntricas sem abrir a janela 3D")
+    parser.add_argument('corpos', nargs='*', help="Chaves dos corpos (padrão: todos)")
+    parser.add_argument('--inicio', default='2000-01-01T12:00',
+                        help="Data ISO ou dias desde J2000 (padrão: J2000)")
+    parser.add_argument('--fim', required=True, help="Data ISO ou dias desde J2000 (inclusivo)")
+    parser.add_argument('--passo', default='1d', help="Intervalo entre amostras: 30s, 1min, 6h, 1d...")
+    parser.add_argument('--formato', choices=FORMATOS, help="Padrão: deduzido da extensão da saída")
+    parser.add_argument('--saida', required=True, help="Arquivo de saída")
+    parser.add_argument('--processos', type=int, default=None, help="Padrão: número de CPUs")
+    parser.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help="Instantes por bloco")
+    parser.add_argument('--metros', action='store_true', help="Grava em metros em vez de unidades astronômicas")
+    parser.add_argument('--corpos-yaml', default=CAMINHO_PADRAO, help="Catálogo de corpos")
+    args = parser.parse_args(argv)
+
+    formato = args.formato or os.path.splitext(args.saida)[1].lstrip('.').lower()
+    if formato not in FORMATOS:
+        parser.error("não foi possível deduzir o formato de %r; use --formato" % args.saida)
+    try:
+        total = exportar(args.corpos, ler_data(args.inicio), ler_data(args.fim), ler_passo(args.passo),
+                         args.saida, formato=formato, processos=args.processos,
+                         tamanho_bloco=args.bloco, em_ua=not args.metros, caminho_yaml=args.corpos_yaml)
+    except ValueError as erro:
+        parser.error(str(erro))
+    print("%d instantes gravados em %s" % (total, args.saida))
+
+
+if __name__ == '__main__':
+    main()
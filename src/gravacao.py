@@ -0,0 +1,130 @@
+# Gravação e reprodução das ações de controle: a sessão gravada guarda a época
+# inicial, o estado inicial e cada ação com o instante em que ocorreu; a
+# reprodução aplica as mesmas ações com passo de tempo fixo, de modo que duas
+# execuções façam exatamente o mesmo trabalho e seus tempos de quadro sejam
+# comparáveis entre versões e máquinas.
+import datetime, hashlib, json, platform, time
+
+import numpy as np
+
+VERSAO_GRAVACAO = 1
+DT_PADRAO = 1 / 60  # Passo fixo da reprodução (s)
+PERCENTIS = (50, 95, 99)
+
+
+class Gravador:
+    """Registra as ações de controle com o instante, relativo ao início, em que ocorreram.
+
+    relogio() deve devolver o tempo do quadro (globalClock.getFrameTime), para que
+    o instante de cada ação corresponda ao quadro em que foi tratada.
+    """
+
+    def __init__(self, caminho, epoca, estado, relogio):
+        self.caminho = caminho
+        self.epoca = float(epoca)
+        self.estado_inicial = dict(estado.items())
+        self.relogio = relogio
+        self.inicio = relogio()
+        self.acoes = []
+
+    def registrar(self, acao, argumentos=()):
+        registro = {'t': self.relogio() - self.inicio, 'acao': acao}
+        if argumentos:
+            registro['argumentos'] = list(argumentos)
+        self.acoes.append(registro)
+
+    def envolver(self, funcao):
+        """Versão de funcao que registra a ação (pelo nome e argumentos) antes de executá-la"""
+        def gravar_e_executar(*argumentos):
+            self.registrar(funcao.__name__, argumentos)
+            funcao(*argumentos)
+        return gravar_e_executar
+
+    def salvar(self):
+        gravacao = {
+            'versao': VERSAO_GRAVACAO,
+            'epoca': self.epoca,
+            'gravado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+            'duracao': self.relogio() - self.inicio,
+            'estado_inicial': self.estado_inicial,
+            'acoes': self.acoes,
+        }
+        with open(self.caminho, 'w', encoding='utf8') as f:
+            json.dump(gravacao, f, indent=1, ensure_ascii=False)
+        print("Gravação salva em %s (%d ações)" % (self.caminho, len(self.acoes)))
+        return self.caminho
+
+
+def ler_gravacao(caminho):
+    """Lê e valida um arquivo gravado por Gravador.salvar"""
+    with open(caminho, encoding='utf8') as f:
+        gravacao = json.load(f)
+    if gravacao.get('versao') != VERSAO_GRAVACAO:
+        raise ValueError("Versão de gravação não suportada em %s: %r" % (caminho, gravacao.get('versao')))
+    gravacao['acoes'] = sorted(gravacao['acoes'], key=lambda acao: acao['t'])
+    return gravacao
+
+
+class Reprodutor:
+    """Reaplica as ações de uma gravação e cronometra cada quadro da reprodução.
+
+    acoes mapeia o nome de cada ação à função de controle correspondente.
+    """
+
+    def __init__(self, gravacao, acoes, dt=DT_PADRAO):
+        desconhecidas = {acao['acao'] for acao in gravacao['acoes']} - set(acoes)
+        if desconhecidas:
+            raise ValueError("Ações desconhecidas na gravação: %s" % ', '.join(sorted(desconhecidas)))
+        self.gravacao = gravacao
+        self.funcoes = acoes
+        self.dt = dt
+        self.proxima = 0          # Índice da próxima ação a aplicar
+        self.quadros = 0
+        self._ultimo = None
+        self.tempos_quadro = []   # Duração de cada quadro em tempo real (s)
+
+    def restaurar_estado(self, estado):
+        for nome, valor in self.gravacao['estado_inicial'].items():
+            if nome in estado:
+                estado[nome] = valor
+
+    def aplicar(self, tempo):
+        """Executa as ações gravadas até o instante `tempo` (s desde o início)"""
+        acoes = self.gravacao['acoes']
+        while self.proxima < len(acoes) and acoes[self.proxima]['t'] <= tempo:
+            acao = acoes[self.proxima]
+            self.funcoes[acao['acao']](*acao.get('argumentos', ()))
+            self.proxima += 1
+
+    def marcar_quadro(self):
+        """Chamado no início de cada quadro: mede o tempo real desde o quadro anterior"""
+        agora = time.perf_counter()
+        if self._ultimo is not None:
+            self.tempos_quadro.append(agora - self._ultimo)
+        self._ultimo = agora
+        self.quadros += 1
+
+    def terminou(self, tempo):
+        return self.proxima >= len(self.gravacao['acoes']) and tempo >= self.gravacao['duracao']
+
+    def relatorio(self, posicoes=None, **extras):
+        """Tempos de quadro (ms) e uma assinatura do estado final para conferir que as execuções coincidem"""
+        tempos = np.array(self.tempos_quadro) * 1000
+        resumo = None
+        if len(tempos):
+            resumo = {'p%d' % p: float(v) for p, v in zip(PERCENTIS, np.percentile(tempos, PERCENTIS))}
+            resumo.update(media=float(tempos.mean()), max=float(tempos.max()))
+        relatorio = {
+            'gerado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+            'ambiente': {'plataforma': platform.platform(), 'python': platform.python_version()},
+            'dt': self.dt,
+            'quadros': self.quadros,
+            'acoes': self.proxima,
+            'quadro_ms': resumo,
+            'tempos_quadro_ms': [round(float(t), 4) for t in tempos],
+        }
+        if posicoes is not None:
+            relatorio['assinatura'] = hashlib.sha256(np.ascontiguousarray(posicoes).tobytes()).hexdigest()[:16]
+        relatorio['ambiente'].update(extras.pop('ambiente', {}))
+        relatorio.update(extras)
+        return relatorio
@@ -0,0 +1,396 @@
+# Índice espacial para escolher corpos com o mouse e consultar vizinhos em
+# catálogos grandes: uma grade uniforme 3D sobre as posições dos corpos menores na
+# cena, com os índices dos pontos ordenados por célula. A grade é montada em O(n)
+# com NumPy pelo trabalhador da física, fora do quadro; cada consulta visita apenas
+# as células próximas do ponto, ou as atravessadas pelo raio do cursor, e só esses
+# candidatos são projetados na tela.
+import math
+
+import numpy as np
+
+POR_CELULA = 4           # Pontos por célula, em média
+MAX_CELULAS = 1 << 18
+CERCA = 1.5              # A caixa da grade vai dos quartis de cada eixo até CERCA intervalos interquartis além
+AMOSTRA_LIMITES = 4096   # Pontos usados para estimar os limites da caixa
+MIN_GRADE_EXTERNA = 256  # Com mais pontos fora da caixa que isto, eles ganham uma grade própria
+MAX_CONE_DIRETO = 4096   # Em grades com até tantos pontos, no_cone testa cada ponto em vez de percorrer as células
+TOLERANCIA_PX = 6.0      # Distância máxima (pixels) entre o cursor e a borda de um corpo escolhido
+
+
+class Grade:
+    """Grade uniforme sobre pontos em 2 ou 3 dimensões (pontos não finitos ficam de fora).
+
+    A caixa da grade vem dos quartis de cada eixo (cercas de Tukey), e não dos
+    extremos: corpos muito mais distantes que o grosso do catálogo (objetos
+    transnetunianos, cometas a milhares de UA) não espalham as células por um volume
+    quase vazio. Os pontos de fora são verificados em toda consulta, um a um se forem
+    poucos ou numa grade própria, montada da mesma forma.
+    """
+
+    def __init__(self, pontos, por_celula=POR_CELULA, max_celulas=MAX_CELULAS, subconjunto=None):
+        # As contas são feitas coluna a coluna: as reduções ao longo do eixo 0 de um
+        # array (n, 3) são bem mais lentas que as de arrays contíguos.
+        # subconjunto restringe a grade a alguns índices (de pontos finitos)
+        self.pontos = pontos = np.asarray(pontos, dtype=float)
+        colunas = [pontos[:, i] for i in range(pontos.shape[1])]
+        indices = subconjunto
+        if indices is None and not np.isfinite(pontos).all():
+            indices = np.flatnonzero(np.logical_and.reduce([np.isfinite(c) for c in colunas]))
+        if indices is not None:
+            colunas = [c[indices] for c in colunas]
+        self.externos = np.zeros(0, dtype=np.int64)  # Pontos fora da caixa, verificados um a um
+        self.externa = None                          # ... ou a grade deles, quando são muitos
+        quantidade = len(colunas[0])
+        if quantidade > MIN_GRADE_EXTERNA:
+            passo = max(1, quantidade // AMOSTRA_LIMITES)
+            quartis = [np.percentile(c[::passo], (25, 75)) for c in colunas]
+            limites = [(q1 - CERCA * (q3 - q1), q3 + CERCA * (q3 - q1)) for q1, q3 in quartis]
+            dentro = np.logical_and.reduce([(c >= inferior) & (c <= superior)
+                                            for c, (inferior, superior) in zip(colunas, limites)])
+            fora = np.flatnonzero(~dentro)
+            if 0 < len(fora) < quantidade // 2:
+                externos = fora if indices is None else indices[fora]
+                dentro = np.flatnonzero(dentro)
+                indices = dentro if indices is None else indices[dentro]
+                colunas = [c[dentro] for c in colunas]
+                quantidade = len(dentro)
+                if len(externos) > MIN_GRADE_EXTERNA:
+                    self.externa = Grade(pontos, por_celula, max_celulas, subconjunto=externos)
+                else:
+                    self.externos = externos
+        if quantidade:
+            self.minimo = np.array([c.min() for c in colunas])
+            extensao = np.array([c.max() for c in colunas]) - self.minimo
+        else:
+            self.minimo = extensao = np.zeros(len(colunas))
+        # Células quase cúbicas, cerca de por_celula pontos em cada, sem que um eixo
+        # muito alongado passe do limite de células
+        alvo = min(max(quantidade / por_celula, 1.0), max_celulas)
+        positivas = extensao[extensao > 0]
+        if len(positivas):
+            self.tamanho = max(np.exp((np.log(positivas).sum() - np.log(alvo)) / len(positivas)),
+                               positivas.max() / alvo)
+        else:
+            self.tamanho = 1.0
+        self.dims = np.maximum(np.ceil(extensao / self.tamanho).astype(np.int64), 1)
+
+        chaves = np.zeros(quantidade, dtype=np.int64)
+        passos = np.append(np.cumprod(self.dims[:0:-1])[::-1], 1)  # Ordem C, como ravel_multi_index
+        for coluna, minimo, dim, passo in zip(colunas, self.minimo, self.dims, passos):
+            chaves += ((coluna - minimo) * (1 / self.tamanho)).astype(np.int64).clip(0, dim - 1) * passo
+        celulas = int(np.prod(self.dims))
+        # Com até 2^16 células, chaves de 16 bits levam o NumPy à ordenação radix (linear)
+        ordem = np.argsort(chaves.astype(np.uint16), kind='stable') if celulas <= 1 << 16 else np.argsort(chaves)
+        self.indices = ordem if indices is None else indices[ordem]
+        self.inicio = np.zeros(celulas + 1, dtype=np.int64)
+        np.cumsum(np.bincount(chaves, minlength=len(self.inicio) - 1), out=self.inicio[1:])
+        # Cópia contígua dos pontos, para o teste direto de no_cone nas grades pequenas
+        self._pontos_diretos = pontos[self.indices] if len(self.indices) <= MAX_CONE_DIRETO else None
+
+    def __len__(self):
+        return len(self.indices) + len(self.externos) + (len(self.externa) if self.externa is not None else 0)
+
+    def _celulas(self, pontos):
+        return np.floor((pontos - self.minimo) / self.tamanho).astype(np.int64)
+
+    def _reunir(self, chaves):
+        # Índices dos pontos de um conjunto de células (fatias contíguas de self.indices)
+        primeiros, contagens = self.inicio[chaves], self.inicio[chaves + 1] - self.inicio[chaves]
+        total = int(contagens.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64)
+        deslocamentos = np.repeat(primeiros - np.cumsum(contagens) + contagens, contagens)
+        return self.indices[deslocamentos + np.arange(total)]
+
+    def _caixa(self, inferior, superior):
+        # Chaves das células entre as coordenadas inferior e superior (inclusive), dentro da grade
+        inferior, superior = np.maximum(inferior, 0), np.minimum(superior, self.dims - 1)
+        if (superior < inferior).any():
+            return np.zeros(0, dtype=np.int64)
+        eixos = np.meshgrid(*[np.arange(a, b + 1) for a, b in zip(inferior, superior)], indexing='ij')
+        return np.ravel_multi_index(tuple(e.ravel() for e in eixos), self.dims)
+
+    def _distancias(self, indices, ponto):
+        return np.linalg.norm(self.pontos[indices] - ponto, axis=1)
+
+    def no_raio(self, ponto, raio):
+        """(índices, distâncias) dos pontos a até `raio` do ponto"""
+        ponto = np.asarray(ponto, dtype=float)
+        candidatos = self._reunir(self._caixa(self._celulas(ponto - raio), self._celulas(ponto + raio)))
+        candidatos = np.concatenate([candidatos, self.externos])
+        distancias = self._distancias(candidatos, ponto)
+        dentro = distancias <= raio
+        candidatos, distancias = candidatos[dentro], distancias[dentro]
+        if self.externa is not None:
+            externos, distancias_externas = self.externa.no_raio(ponto, raio)
+            candidatos = np.concatenate([candidatos, externos])
+            distancias = np.concatenate([distancias, distancias_externas])
+        return candidatos, distancias
+
+    def proximos(self, ponto, n, excluir=()):
+        """(índices, distâncias) dos n (>= 1) pontos mais próximos, do mais próximo ao mais distante"""
+        ponto = np.asarray(ponto, dtype=float)
+        candidatos, distancias = self._proximos_caixa(ponto, n, excluir)
+        if len(self.externos):
+            externos = self.externos[~np.isin(self.externos, excluir)]
+            candidatos = np.concatenate([candidatos, externos])
+            distancias = np.concatenate([distancias, self._distancias(externos, ponto)])
+        if self.externa is not None:
+            # Com n candidatos, só interessam os pontos externos mais próximos que o n-ésimo
+            if len(distancias) >= n:
+                externos, distancias_externas = self.externa.no_raio(
+                    ponto, np.partition(distancias, n - 1)[n - 1])
+                manter = ~np.isin(externos, excluir)
+                externos, distancias_externas = externos[manter], distancias_externas[manter]
+            else:
+                externos, distancias_externas = self.externa.proximos(ponto, n, excluir)
+            candidatos = np.concatenate([candidatos, externos])
+            distancias = np.concatenate([distancias, distancias_externas])
+        if len(distancias) > n:
+            selecao = np.argpartition(distancias, n - 1)[:n]
+            candidatos, distancias = candidatos[selecao], distancias[selecao]
+        ordem = np.argsort(distancias)
+        return candidatos[ordem], distancias[ordem]
+
+    def no_cone(self, origem, direcao, tangente, folga=0.0):
+        """Índices de pontos que incluem todos os que estão no cone em torno de um raio.
+
+        O cone tem vértice na origem e eixo na direção (unitária): contém os pontos
+        a até tangente·t do raio, sendo t >= 0 a distância ao longo dele. Entram
+        também os pontos que cairiam no cone se deslocados de até `folga`. Vêm
+        alguns pontos a mais, e o teste exato fica com quem chama.
+
+        As células são percorridas ao longo do raio em trechos, do tamanho de uma
+        célula enquanto o cone é mais estreito que ela e proporcionais a t depois;
+        de cada trecho só ficam as células cujo centro pode estar no cone.
+        """
+        origem, direcao = np.asarray(origem, dtype=float), np.asarray(direcao, dtype=float)
+        partes = [self.externos]
+        if self.externa is not None:
+            partes.append(self.externa.no_cone(origem, direcao, tangente, folga))
+        if len(self.indices) <= MAX_CONE_DIRETO:
+            # Com poucos pontos, o teste de cada um custa menos que percorrer as células
+            relativos = self._pontos_diretos - origem
+            t = relativos @ direcao
+            perpendicular2 = np.einsum('ij,ij->i', relativos, relativos) - t * t
+            partes.append(self.indices[(t >= -folga) & (perpendicular2 <= (tangente * (t + folga) + folga) ** 2)])
+            return np.concatenate(partes)
+        lado = self.tamanho
+        r = np.sqrt(len(self.dims)) * lado / 2 + folga  # Meia diagonal de uma célula, mais a folga
+        # Trecho do raio que passa perto da caixa da grade (método das placas)
+        minimo, maximo = self.minimo, self.minimo + self.dims * lado
+        t_max = np.linalg.norm(origem - (minimo + maximo) / 2) + np.linalg.norm(maximo - minimo) / 2
+        margem = tangente * (t_max + r) + r
+        paralelo = direcao == 0
+        if (paralelo & ((origem < minimo - margem) | (origem > maximo + margem))).any():
+            return np.concatenate(partes)
+        divisor = np.where(paralelo, 1.0, direcao)
+        t_a, t_b = (minimo - margem - origem) / divisor, (maximo + margem - origem) / divisor
+        entrada = max(np.where(paralelo, -np.inf, np.minimum(t_a, t_b)).max(), -r)
+        saida = min(np.where(paralelo, np.inf, np.maximum(t_a, t_b)).min(), t_max + margem)
+        if entrada >= saida:
+            return np.concatenate(partes)
+
+        limites = _trechos(entrada, saida, lado, tangente)
+        pontos = origem + limites[:, None] * direcao
+        raio = (tangente * (np.maximum(limites[:-1], limites[1:]) + r) + r)[:, None]
+        inferiores = np.floor((np.minimum(pontos[:-1], pontos[1:]) - raio - minimo) / lado).astype(np.int64)
+        superiores = np.floor((np.maximum(pontos[:-1], pontos[1:]) + raio - minimo) / lado).astype(np.int64)
+        na_grade = (inferiores <= self.dims - 1).all(axis=1) & (superiores >= 0).all(axis=1)
+        inferiores = np.maximum(inferiores[na_grade], 0)
+        superiores = np.minimum(superiores[na_grade], self.dims - 1)
+        if not len(inferiores):
+            return np.concatenate(partes)
+        # Células das caixas dos trechos, de uma vez: cada caixa recebe o mesmo bloco de
+        # deslocamentos (o da maior caixa), e ficam só as células dentro dela
+        extensoes = (superiores - inferiores).max(axis=0) + 1
+        deslocamentos = np.indices(extensoes).reshape(len(extensoes), -1).T
+        celulas = inferiores[:, None, :] + deslocamentos
+        celulas = celulas[(celulas <= superiores[:, None, :]).all(axis=2)]
+
+        # Fica a célula cujo centro, a até r de algum ponto dela deslocado, pode estar no cone
+        relativos = minimo + (celulas + 0.5) * lado - origem
+        t = relativos @ direcao
+        perpendicular2 = np.einsum('ij,ij->i', relativos, relativos) - t * t
+        celulas = celulas[(t >= -r) & (perpendicular2 <= (tangente * (t + r) + r) ** 2)]
+        passos = np.append(np.cumprod(self.dims[:0:-1])[::-1], 1)
+        partes.append(self._reunir(np.unique(celulas @ passos)))
+        return np.concatenate(partes)
+
+    def _proximos_caixa(self, ponto, n, excluir):
+        # Candidatos da caixa da grade que incluem os seus n pontos mais próximos (ou
+        # todos, se forem menos). A caixa de células em torno do ponto dobra de tamanho
+        # até ter n candidatos; a n-ésima distância entre eles limita a caixa final,
+        # que contém a esfera com esse raio
+        centro = self._celulas(ponto)
+        fracao = (ponto - self.minimo) / self.tamanho - centro  # Posição dentro da célula central
+        margem = min(fracao.min(), (1 - fracao).min())
+        # Fora da grade, a primeira caixa já a alcança
+        r = int(max(0, (centro - (self.dims - 1)).max(), (-centro).max()))
+        alcance_max = int(np.abs(np.concatenate([centro, self.dims - 1 - centro])).max())
+        final = False
+        while True:
+            candidatos = self._reunir(self._caixa(centro - r, centro + r))
+            candidatos = candidatos[~np.isin(candidatos, excluir)]
+            distancias = self._distancias(candidatos, ponto)
+            if final or r >= alcance_max:
+                return candidatos, distancias
+            if len(candidatos) >= n:
+                # Todo ponto mais próximo que a borda da caixa já está entre os candidatos
+                necessario = int(np.ceil(np.partition(distancias, n - 1)[n - 1] / self.tamanho - margem))
+                if necessario <= r:
+                    return candidatos, distancias
+                r, final = min(necessario, alcance_max), True
+            else:
+                r = min(max(2 * r, 1), alcance_max)
+
+
+def _trechos(inicio, fim, lado, tangente):
+    # Limites dos trechos de um raio entre inicio e fim: de `lado` em `lado` até que
+    # o cone (tangente·t) fique mais largo que uma célula, e depois em progressão geométrica
+    virada = lado / tangente if tangente > 0 else np.inf
+    limites = []
+    if inicio < virada:
+        limites.append(inicio + lado * np.arange(int(np.ceil((min(fim, virada) - inicio) / lado)) + 1))
+    if fim > virada:
+        primeiro = max(virada, inicio)
+        n = int(np.ceil(np.log(fim / primeiro) / np.log1p(tangente)))
+        limites.append(primeiro * (1 + tangente) ** np.arange(n + 1))
+    return np.concatenate(limites)
+
+
+def projetar(posicoes, camera_mundo, matriz, regiao_px):
+    """Posições da cena em pixels da janela, a profundidade de cada uma e se cai na região.
+
+    matriz é a visão (só rotação) seguida da projeção da lente, no formato de
+    linha do Panda3D; a translação da câmera é subtraída antes, em precisão dupla.
+    regiao_px é (esquerda, direita, baixo, cima) da região em pixels. Pontos
+    atrás da câmera recebem NaN.
+    """
+    # Só as colunas x, y e w do recorte, cada uma um produto matriz-vetor contíguo
+    relativas = np.asarray(posicoes, dtype=float) - camera_mundo
+    x, y, w = (relativas @ matriz[:3, j] + matriz[3, j] for j in (0, 1, 3))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x /= w
+        y /= w
+    na_regiao = (w > 0) & (np.abs(x) <= 1) & (np.abs(y) <= 1)
+    esquerda, direita, baixo, cima = regiao_px
+    pixels = np.empty((len(relativas), 2))
+    pixels[:, 0] = esquerda + (x + 1) * ((direita - esquerda) / 2)
+    pixels[:, 1] = baixo + (y + 1) * ((cima - baixo) / 2)
+    pixels[w <= 0] = np.nan
+    return pixels, w, na_regiao
+
+
+def raio_do_cursor(matriz, regiao_px, cursor, tolerancia):
+    """Direção (unitária, na cena) do raio da câmera que passa pelo cursor e a tangente do cone
+    que contém todo ponto a até `tolerancia` pixels do cursor.
+
+    matriz e regiao_px são os de projetar; a lente é perspectiva, com a câmera na
+    origem. O raio é a interseção dos planos em que x/w e y/w valem os do cursor.
+    """
+    esquerda, direita, baixo, cima = regiao_px
+    x = 2 * (cursor[0] - esquerda) / (direita - esquerda) - 1
+    y = 2 * (cursor[1] - baixo) / (cima - baixo) - 1
+    # Produto vetorial e normas escritos à mão: para vetores de 3 elementos, as funções
+    # do NumPy custam mais que a própria conta
+    (a1, a2, a3), (b1, b2, b3) = matriz[:3, 0] - x * matriz[:3, 3], matriz[:3, 1] - y * matriz[:3, 3]
+    direcao = np.array([a2 * b3 - a3 * b2, a3 * b1 - a1 * b3, a1 * b2 - a2 * b1])
+    if direcao @ matriz[:3, 3] < 0:
+        direcao = -direcao
+    direcao /= math.sqrt(direcao @ direcao)
+    # Um deslocamento lateral d a uma profundidade D ocupa d·fator/D pixels; como D não
+    # passa da distância ao longo do raio, a tolerância cabe num cone de tangente k/(1 - k)
+    colunas = matriz[:3, (0, 1, 3)]
+    normas = np.sqrt(np.einsum('ij,ij->j', colunas, colunas))
+    fator = min(normas[0] * (direita - esquerda), normas[1] * (cima - baixo)) / (2 * normas[2])
+    k = tolerancia / fator
+    return direcao, k / (1 - k)
+
+
+class IndiceEspacial:
+    """Consultas sobre as posições de um quadro (corpos do catálogo seguidos dos corpos menores).
+
+    Os corpos do catálogo, poucos, são testados todos. Os corpos menores são
+    buscados numa grade 3D, em geral montada pelo trabalhador da física
+    (Simulacao) sobre as posições de um instantâneo; a folga é o quanto as
+    posições do quadro podem ter se afastado das da grade, e as consultas se
+    alargam nessa medida para continuarem exatas.
+    """
+
+    def __init__(self, nomes, raios):
+        self.nomes = list(nomes)
+        self.raios = np.asarray(raios, dtype=float)   # Raio de cada corpo na cena (0 para pontos)
+        self.catalogo = np.zeros((0, 3))
+        self.menores = None
+        self.folga = 0.0
+        self._grade = None
+
+    def atualizar(self, catalogo, menores=None, grade=None, folga=0.0):
+        """Posições do quadro e, se houver, a grade dos corpos menores e a sua folga.
+
+        Sem grade (física síncrona), ela é montada na primeira consulta do quadro.
+        """
+        self.catalogo = np.asarray(catalogo, dtype=float)
+        self.menores = menores
+        self._grade = grade
+        self.folga = folga if grade is not None else 0.0
+
+    def _grade_menores(self):
+        if self._grade is None:
+            self._grade = Grade(self.menores)
+        return self._grade
+
+    def posicao(self, k):
+        n = len(self.catalogo)
+        return self.catalogo[k] if k < n else np.asarray(self.menores[k - n], dtype=float)
+
+    def vizinhos(self, k, n):
+        """(índices, distâncias na cena) dos n corpos mais próximos do corpo k"""
+        ponto = self.posicao(k)
+        quantidade = len(self.catalogo)
+        indices = np.delete(np.arange(quantidade), k) if k < quantidade else np.arange(quantidade)
+        distancias = np.linalg.norm(self.catalogo[indices] - ponto, axis=1)
+        if self.menores is not None and len(self.menores):
+            grade = self._grade_menores()
+            excluir = (k - quantidade,) if k >= quantidade else ()
+            perto, distancias_grade = grade.proximos(ponto, n, excluir)
+            if len(perto) == n and self.folga > 0:
+                # Os n da grade estão a até d + folga do ponto; qualquer corpo mais
+                # próximo que isso estava, na grade, a até d + 2·folga
+                perto, _ = grade.no_raio(ponto, distancias_grade[-1] + 2 * self.folga)
+                perto = perto[~np.isin(perto, excluir)]
+            indices = np.concatenate([indices, perto + quantidade])
+            distancias = np.concatenate([distancias, np.linalg.norm(self.menores[perto] - ponto, axis=1)])
+        if len(distancias) > n:
+            selecao = np.argpartition(distancias, n - 1)[:n]
+            indices, distancias = indices[selecao], distancias[selecao]
+        ordem = np.argsort(distancias)
+        return indices[ordem], distancias[ordem]
+
+    def escolher(self, camera_mundo, matriz, regiao_px, fator_projecao, cursor, tolerancia=TOLERANCIA_PX):
+        """Corpo sob o cursor (pixels da janela) numa vista, ou None.
+
+        Vale o corpo com a borda mais próxima do cursor; entre os que o cobrem,
+        o mais próximo da câmera. Dos corpos menores, só os que a grade encontra
+        em volta do raio do cursor são projetados.
+        """
+        candidatos, posicoes = np.arange(len(self.catalogo)), self.catalogo
+        if self.menores is not None and len(self.menores):
+            direcao, tangente = raio_do_cursor(matriz, regiao_px, cursor, tolerancia)
+            perto = self._grade_menores().no_cone(camera_mundo, direcao, tangente, self.folga)
+            candidatos = np.concatenate([candidatos, perto + len(self.catalogo)])
+            posicoes = np.concatenate([posicoes, self.menores[perto]])
+        pixels, profundidade, na_regiao = projetar(posicoes, camera_mundo, matriz, regiao_px)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            raios_px = np.where(profundidade > 0, self.raios[candidatos] * fator_projecao / profundidade, 0.0)
+        distancias = np.linalg.norm(pixels - cursor, axis=1)
+        # Pontos na região a até a tolerância do cursor; discos maiores que a tolerância
+        # pela borda (o centro projetado pode estar longe do cursor, ou mesmo fora da região)
+        grandes = raios_px > tolerancia
+        sob = np.flatnonzero((na_regiao & ~grandes & (distancias <= tolerancia))
+                             | (grandes & (distancias - raios_px <= tolerancia)))
+        if not len(sob):
+            return None
+        folga = np.maximum(distancias[sob] - raios_px[sob], 0.0)
+        return int(candidatos[sob[np.lexsort((profundidade[sob], folga))[0]]])
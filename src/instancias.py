@@ -0,0 +1,145 @@
+# Camada de corpos menores desenhada em uma única chamada com instanciamento
+# por hardware: a posição e a cor de cada instância vêm de arrays empacotados
+# atualizados diretamente a partir do NumPy.
+import numpy as np
+from panda3d.core import (GeomVertexFormat, GeomVertexArrayFormat, GeomVertexData, GeomVertexWriter,
+                          Geom, GeomTriangles, GeomPoints, GeomNode, InternalName, OmniBoundingVolume,
+                          Shader)
+
+INSTANCIA_VERT = """
+#version 120
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat4 p3d_ModelViewMatrix;
+uniform float tamanho_pixels;
+uniform float fator_projecao;
+attribute vec4 p3d_Vertex;
+attribute vec3 deslocamento;
+attribute vec4 cor_instancia;
+varying vec4 v_cor;
+void main() {
+    // Escala a malha com a distância para manter um tamanho constante na tela
+    float distancia = length((p3d_ModelViewMatrix * vec4(deslocamento, 1.0)).xyz);
+    float escala = tamanho_pixels * distancia / fator_projecao;
+    gl_Position = p3d_ModelViewProjectionMatrix * vec4(p3d_Vertex.xyz * escala + deslocamento, 1.0);
+    v_cor = cor_instancia;
+}
+"""
+
+INSTANCIA_FRAG = """
+#version 120
+varying vec4 v_cor;
+void main() {
+    gl_FragColor = v_cor;
+}
+"""
+
+# Octaedro unitário: a malha mínima que parece um ponto de qualquer ângulo
+OCTAEDRO_VERTICES = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+OCTAEDRO_FACES = ((0, 2, 4), (2, 1, 4), (1, 3, 4), (3, 0, 4),
+                  (2, 0, 5), (1, 2, 5), (3, 1, 5), (0, 3, 5))
+
+
+def formato_instanciado():
+    # Array 0: malha base (por vértice); arrays 1 e 2: posição e cor (por instância)
+    malha = GeomVertexArrayFormat()
+    malha.addColumn(InternalName.getVertex(), 3, Geom.NT_float32, Geom.C_point)
+    posicoes = GeomVertexArrayFormat()
+    posicoes.addColumn(InternalName.make('deslocamento'), 3, Geom.NT_float32, Geom.C_other)
+    posicoes.setDivisor(1)
+    cores = GeomVertexArrayFormat()
+    cores.addColumn(InternalName.make('cor_instancia'), 4, Geom.NT_float32, Geom.C_other)
+    cores.setDivisor(1)
+    formato = GeomVertexFormat()
+    for array in (malha, posicoes, cores):
+        formato.addArray(array)
+    return GeomVertexFormat.registerFormat(formato)
+
+
+def formato_pontos():
+    # Alternativa sem shaders: um ponto por corpo, com posição e cor no mesmo formato empacotado
+    posicoes = GeomVertexArrayFormat()
+    posicoes.addColumn(InternalName.getVertex(), 3, Geom.NT_float32, Geom.C_point)
+    cores = GeomVertexArrayFormat()
+    cores.addColumn(InternalName.getColor(), 4, Geom.NT_float32, Geom.C_color)
+    formato = GeomVertexFormat()
+    formato.addArray(posicoes)
+    formato.addArray(cores)
+    return GeomVertexFormat.registerFormat(formato)
+
+
+def escrever_array(vdata, indice, valores):
+    """Copia um array NumPy float32 para o array de vértices `indice`, sem objetos intermediários"""
+    destino = memoryview(vdata.modifyArray(indice)).cast('B').cast('f')
+    np.frombuffer(destino, dtype=np.float32)[:] = valores.ravel()
+    destino.release()
+
+
+class CamadaCorposMenores:
+    """Desenha milhares de corpos menores em uma única chamada de desenho"""
+
+    def __init__(self, parent, efemerides, cores, usar_shader=True, tamanho_pixels=1.5):
+        self.efemerides = efemerides
+        self.usar_shader = usar_shader
+        n = len(efemerides.nomes)
+        self._posicoes = np.zeros((n, 3), dtype=np.float32)  # Buffer reutilizado a cada quadro
+
+        if usar_shader:
+            self.vdata = GeomVertexData('corpos_menores', formato_instanciado(), Geom.UH_static)
+            self.vdata.uncleanSetNumRows(len(OCTAEDRO_VERTICES))
+            vertice = GeomVertexWriter(self.vdata, 'vertex')
+            for v in OCTAEDRO_VERTICES:
+                vertice.setData3f(*v)
+            self.indice_posicoes = 1
+            self.vdata.modifyArray(1).setNumRows(n)
+            self.vdata.modifyArray(2).setNumRows(n)
+            escrever_array(self.vdata, 2, np.asarray(cores, dtype=np.float32))
+            primitiva = GeomTriangles(Geom.UH_static)
+            for face in OCTAEDRO_FACES:
+                primitiva.addVertices(*face)
+        else:
+            self.vdata = GeomVertexData('corpos_menores', formato_pontos(), Geom.UH_dynamic)
+            self.vdata.uncleanSetNumRows(n)
+            self.indice_posicoes = 0
+            escrever_array(self.vdata, 1, np.asarray(cores, dtype=np.float32))
+            primitiva = GeomPoints(Geom.UH_static)
+            primitiva.addConsecutiveVertices(0, n)
+        # As posições mudam todo quadro; o restante dos dados é estático
+        self.vdata.modifyArray(self.indice_posicoes).setUsageHint(Geom.UH_dynamic)
+
+        geom = Geom(self.vdata)
+        geom.addPrimitive(primitiva)
+        node = GeomNode('corpos_menores')
+        node.addGeom(geom)
+        # As instâncias ficam fora dos limites da malha base: desativa o recorte por volume
+        node.setBounds(OmniBoundingVolume())
+        node.setFinal(True)
+        self.no = parent.attachNewNode(node)
+        self.no.setLightOff()
+        if usar_shader:
+            self.no.setShader(Shader.make(Shader.SL_GLSL, INSTANCIA_VERT, INSTANCIA_FRAG))
+            self.no.setShaderInput('tamanho_pixels', float(tamanho_pixels))
+            self.no.setShaderInput('fator_projecao', 1.0)
+            self.no.setInstanceCount(n)
+        else:
+            self.no.setRenderModeThickness(tamanho_pixels)
+
+    def calcular(self, tempo):
+        """Posições (float32) de todos os corpos no instante; não toca na GPU e pode rodar em outra thread"""
+        ef = self.efemerides
+        locais = ef.posicoes_locais_em((tempo,), E_inicial=ef.ultimas_anomalias)
+        if not ef.relatorio_kepler.convergiu:
+            # Salto grande no tempo: o chute do passo anterior não serve, recomeça do zero
+            locais = ef.posicoes_locais_em((tempo,))
+        return np.asarray(locais[0], dtype=np.float32)
+
+    def escrever(self, posicoes, fator_projecao=None):
+        """Grava as posições no buffer de instâncias"""
+        self._posicoes[:] = posicoes
+        escrever_array(self.vdata, self.indice_posicoes, self._posicoes)
+        if self.usar_shader and fator_projecao is not None:
+            self.no.setShaderInput('fator_projecao', float(fator_projecao))
+
+    def atualizar(self, tempo, fator_projecao=None):
+        """Recalcula as posições de todos os corpos e as grava no buffer de instâncias"""
+        self.escrever(self.calcular(tempo), fator_projecao)
+        return self._posicoes
@@ -0,0 +1,73 @@
+# Resolve a equação de Kepler (M = E - e·sen E) para todos os corpos de uma vez.
+from dataclasses import dataclass
+
+import numpy as np
+
+TOLERANCIA = 1e-12   # Resíduo máximo aceito em radianos
+MAX_ITERACOES = 12   # Newton converge em poucas iterações com o chute inicial abaixo
+
+
+@dataclass(frozen=True)
+class RelatorioKepler:
+    """Relatório de convergência de uma chamada ao resolvedor"""
+    iteracoes: int
+    residuo_max: float
+    nao_convergidos: int
+    total: int
+
+    @property
+    def convergiu(self):
+        return self.nao_convergidos == 0
+
+
+def normalizar_angulo(angulo):
+    """Reduz ângulos para o intervalo [-π, π)"""
+    # floor em vez de np.mod: mesmo resultado e bem mais rápido em arrays grandes
+    return angulo - 2 * np.pi * np.floor((angulo + np.pi) / (2 * np.pi))
+
+
+def resolver_kepler(M, e, tol=TOLERANCIA, max_iter=MAX_ITERACOES, E_inicial=None):
+    """Retorna a anomalia excêntrica E para arrays de anomalia média M e excentricidade e.
+
+    Usa Newton-Raphson vetorizado; o número de iterações é limitado por max_iter,
+    de modo que o custo não depende de quantos corpos são muito excêntricos.
+    E_inicial permite partir da solução de um instante próximo (ex.: o quadro
+    anterior), o que reduz a convergência a uma ou duas iterações.
+    A precisão segue o tipo de M (float64 ou float32); em float32 a tolerância
+    é limitada pelo épsilon do tipo.
+    Retorna a tupla (E, RelatorioKepler).
+    """
+    M = np.asarray(M)
+    if M.dtype not in (np.float32, np.float64):
+        M = M.astype(np.float64)
+    tipo = M.dtype.type
+    tol = max(tol, 8 * float(np.finfo(tipo).eps))
+    M = normalizar_angulo(M).astype(tipo, copy=False)
+    e = np.broadcast_to(np.asarray(e, dtype=tipo), M.shape)
+    # Chute inicial: série de primeira ordem para órbitas quase circulares,
+    # π para as muito excêntricas (onde a série diverge)
+    if E_inicial is None:
+        E = np.where(e < 0.8, M + e * np.sin(M), tipo(np.pi) * np.sign(M + (M == 0)))
+    else:
+        # Leva o chute para o mesmo ramo de M, já que M foi reduzido a [-π, π)
+        E = np.array(np.broadcast_to(E_inicial, M.shape), dtype=tipo)
+        E = M + normalizar_angulo(E - M)
+    iteracoes = 0
+    for iteracoes in range(1, max_iter + 1):
+        delta = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E -= delta
+        if np.all(np.abs(delta) <= tol):
+            break
+    residuo = np.abs(E - e * np.sin(E) - M)
+    relatorio = RelatorioKepler(
+        iteracoes=iteracoes,
+        residuo_max=float(residuo.max(initial=0.0)),
+        nao_convergidos=int(np.count_nonzero(residuo > tol)),
+        total=int(residuo.size),
+    )
+    return E, relatorio
+
+
+def anomalia_verdadeira(E, e):
+    """Converte a anomalia excêntrica E na anomalia verdadeira ν"""
+    return 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2), np.sqrt(1 - e) * np.cos(E / 2))
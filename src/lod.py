@@ -0,0 +1,38 @@
+# Nível de detalhe em espaço de tela: escolhe quantos segmentos cada órbita
+# precisa e descarta corpos e órbitas menores que um pixel.
+import numpy as np
+
+SEGMENTOS_MIN = 32
+SEGMENTOS_MAX = 4096
+ERRO_MAX_PIXELS = 0.25   # Distância máxima entre a corda e a elipse, em pixels
+RAIO_MIN_ORBITA_PX = 1.0  # Órbitas com raio projetado menor que isso não são desenhadas
+RAIO_MIN_CORPO_PX = 0.5   # Corpos com diâmetro projetado abaixo de um pixel são ocultados
+
+
+def distancias_orbitas(camera, centros, normais, raios):
+    """Distância aproximada da câmera ao ponto mais próximo de cada órbita.
+
+    Trata a órbita como um círculo de raio `raios` em torno de `centros`, no
+    plano perpendicular a `normais`.
+    """
+    d = camera - centros
+    altura = np.einsum('ij,ij->i', d, normais)
+    no_plano = np.sqrt(np.maximum(np.einsum('ij,ij->i', d, d) - altura ** 2, 0.0))
+    return np.hypot(no_plano - raios, altura)
+
+
+def tamanhos_projetados(tamanhos, distancias, fator_projecao):
+    """Converte tamanhos da cena em pixels dada a distância até a câmera"""
+    return fator_projecao * tamanhos / np.maximum(distancias, 1e-9)
+
+
+def segmentos_orbitas(raios, distancias, fator_projecao, erro=ERRO_MAX_PIXELS):
+    """Número de segmentos (potência de dois) para que o erro de corda fique abaixo de `erro` pixels.
+
+    Para n segmentos, a flecha de um arco de raio R é R·(1 - cos(π/n)) ≈ R·π²/(2n²);
+    o tamanho do pixel é tomado no ponto da órbita mais próximo da câmera.
+    """
+    raio_px = tamanhos_projetados(raios, distancias, fator_projecao)
+    n = np.pi * np.sqrt(raio_px / (2 * erro))
+    n = np.clip(n, SEGMENTOS_MIN, SEGMENTOS_MAX)
+    return (2 ** np.ceil(np.log2(n))).astype(np.int64)
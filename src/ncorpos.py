@@ -0,0 +1,195 @@
+# Dinâmica alternativa de N corpos: integra a gravitação mútua de todos os
+# corpos de corpos.yaml com um integrador simplético de 4ª ordem (Yoshida),
+# vetorizado em NumPy, em unidades astronômicas e dias.
+import math, time
+
+import numpy as np
+
+from src.efemerides import somar_pais
+
+G_SI = 6.674e-11                       # m³/(kg·s²)
+AU_M = 1.496e11
+G = G_SI * 86400 ** 2 / AU_M ** 3      # UA³/(kg·dia²)
+
+PASSOS_POR_ORBITA = 64        # Subpassos por período orbital mais curto
+MAX_SUBPASSOS_QUADRO = 256    # Limite por quadro: acima dele o passo cresce em vez de travar a tela
+MASSA_MIN_PERTURBADOR = 1e26  # Partículas de teste só sentem corpos acima desta massa (kg)
+
+# Coeficientes do integrador de Yoshida (composição de três leapfrogs)
+_W1 = 1 / (2 - 2 ** (1 / 3))
+_W0 = -2 ** (1 / 3) / (2 - 2 ** (1 / 3))
+COEF_DERIVA = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+COEF_IMPULSO = (_W1, _W0, _W1)
+
+
+def aceleracoes(posicoes, massas):
+    """Aceleração gravitacional mútua de cada corpo (soma direta, O(N²))"""
+    d = posicoes[None, :, :] - posicoes[:, None, :]
+    dist2 = np.einsum('ijk,ijk->ij', d, d)
+    np.fill_diagonal(dist2, np.inf)
+    return G * np.einsum('ij,ijk->ik', massas / (dist2 * np.sqrt(dist2)), d)
+
+
+def aceleracoes_particulas(particulas, perturbadores, massas):
+    """Aceleração de partículas sem massa causada pelos perturbadores (O(partículas × perturbadores))"""
+    acel = np.zeros_like(particulas)
+    for p, m in zip(perturbadores, massas):
+        d = p - particulas
+        dist2 = np.einsum('ij,ij->i', d, d)
+        acel += (G * m / (dist2 * np.sqrt(dist2)))[:, None] * d
+    return acel
+
+
+class IntegradorNCorpos:
+    """Estado (posições e velocidades heliocêntricas) integrado pela gravitação mútua.
+
+    Corpos menores podem ser incluídos como partículas de teste: sentem a
+    gravidade dos corpos massivos, mas não a exercem, e o custo cresce
+    linearamente com o seu número. As partículas têm passo próprio, ditado pelos
+    seus períodos e não pelo da lua mais rápida, e são integradas por leapfrog
+    (deriva-impulso-deriva), com os perturbadores no meio de cada passo.
+    """
+
+    def __init__(self, posicoes, velocidades, massas, tempo, periodo_min,
+                 particulas=None, velocidades_particulas=None, periodo_min_particulas=None):
+        self.r = np.array(posicoes, dtype=np.float64)
+        self.v = np.array(velocidades, dtype=np.float64)
+        self.massas = np.asarray(massas, dtype=np.float64)
+        self.tempo = float(tempo)
+        self.passo_max = periodo_min / PASSOS_POR_ORBITA
+        # Referencial do baricentro: sem isso o sistema inteiro deriva lentamente
+        v_baricentro = self.massas @ self.v / self.massas.sum()
+        self.v -= v_baricentro
+
+        self.particulas = self.v_particulas = None
+        self.passo_max_particulas = math.inf
+        if particulas is not None:
+            self.particulas = np.array(particulas, dtype=np.float64)
+            self.v_particulas = np.array(velocidades_particulas, dtype=np.float64) - v_baricentro
+            if periodo_min_particulas is not None:
+                self.passo_max_particulas = periodo_min_particulas / PASSOS_POR_ORBITA
+        self.perturbadores = np.flatnonzero(self.massas >= MASSA_MIN_PERTURBADOR)
+
+        # Métricas do desempenho do integrador
+        self.subpassos_quadro = 0
+        self.passos_particulas = 0
+        self.passo_atual = self.passo_max
+        self.passos_por_segundo = 0.0
+        self.precisao_reduzida = False
+        self.energia_inicial = self.energia()
+
+    @classmethod
+    def de_efemerides(cls, efemerides, massas, tempo, particulas=None):
+        """Parte das posições e velocidades keplerianas no instante `tempo` (motor em UA, sol no índice 0).
+
+        particulas, quando informado, é um motor de efemérides heliocêntrico
+        (ex.: corpos menores, em qualquer escala) cujos corpos são integrados
+        como partículas de teste.
+        """
+        massas = np.asarray(massas, dtype=np.float64)
+        r = efemerides.absolutas(efemerides.posicoes_locais_em((tempo,))[0])
+        # A forma da órbita vem dos elementos e a velocidade, da gravidade: o movimento médio
+        # é recalculado pelas massas, pois o período do catálogo nem sempre é consistente com elas
+        centrais = np.where(efemerides.pais >= 0, massas[efemerides.pais], massas[0])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n_dinamico = np.sqrt(G * (centrais + massas) / efemerides.a ** 3)
+        fator = np.where(efemerides.a > 0, n_dinamico / efemerides.n, 0.0)
+        v_locais = efemerides.velocidades_locais_em((tempo,))[0] * fator[:, None]
+        v = somar_pais(v_locais, efemerides.pais, efemerides.niveis)
+        periodos = efemerides.periodo_dias[efemerides.a > 0]
+        if particulas is not None:
+            periodos_particulas = particulas.periodo_dias[particulas.a > 0]
+            return cls(r, v, massas, tempo, periodos.min(),
+                       particulas.posicoes_em((tempo,))[0] / particulas.escala,
+                       particulas.velocidades_locais_em((tempo,))[0] / particulas.escala,
+                       periodos_particulas.min() if len(periodos_particulas) else None)
+        return cls(r, v, massas, tempo, periodos.min())
+
+    def _passo(self, h):
+        # Um passo de Yoshida: três impulsos entre quatro derivas
+        for k in range(3):
+            self.r += COEF_DERIVA[k] * h * self.v
+            self.v += COEF_IMPULSO[k] * h * aceleracoes(self.r, self.massas)
+        self.r += COEF_DERIVA[3] * h * self.v
+
+    def _passo_particulas(self, h, subpassos, h_corpos):
+        # Leapfrog das partículas; os corpos massivos avançam metade dos subpassos em
+        # cada meia deriva (o subpasso do meio, se houver, é dividido em dois), e o
+        # impulso usa as posições deles no meio do passo
+        meio, impar = divmod(subpassos, 2)
+        self.particulas += 0.5 * h * self.v_particulas
+        for _ in range(meio):
+            self._passo(h_corpos)
+        if impar:
+            self._passo(0.5 * h_corpos)
+        self.v_particulas += h * aceleracoes_particulas(
+            self.particulas, self.r[self.perturbadores], self.massas[self.perturbadores])
+        if impar:
+            self._passo(0.5 * h_corpos)
+        for _ in range(meio):
+            self._passo(h_corpos)
+        self.particulas += 0.5 * h * self.v_particulas
+
+    def avancar(self, dias):
+        """Integra `dias` à frente com o menor número de subpassos que respeita passo_max.
+
+        O número de subpassos por chamada é limitado; quando a velocidade da
+        simulação exige mais, o passo cresce (precisao_reduzida) para manter a
+        taxa de quadros.
+        """
+        if dias <= 0:
+            self.subpassos_quadro = 0
+            return
+        inicio = time.perf_counter()
+        subpassos = math.ceil(dias / self.passo_max)
+        self.precisao_reduzida = subpassos > MAX_SUBPASSOS_QUADRO
+        subpassos = min(subpassos, MAX_SUBPASSOS_QUADRO)
+        if self.particulas is None:
+            h = dias / subpassos
+            for _ in range(subpassos):
+                self._passo(h)
+        else:
+            # Cada passo das partículas cobre um número inteiro de subpassos dos corpos massivos
+            passos = math.ceil(dias / self.passo_max_particulas)
+            self.precisao_reduzida |= passos > subpassos
+            passos = min(passos, subpassos)
+            por_passo = math.ceil(subpassos / passos)
+            subpassos = passos * por_passo
+            h = dias / subpassos
+            for _ in range(passos):
+                self._passo_particulas(dias / passos, por_passo, h)
+            self.passos_particulas = passos
+        self.tempo += dias
+        self.subpassos_quadro = subpassos
+        self.passo_atual = h
+        duracao = time.perf_counter() - inicio
+        if duracao > 0:
+            # Média móvel exponencial para uma leitura estável
+            self.passos_por_segundo += 0.1 * (subpassos / duracao - self.passos_por_segundo)
+
+    def avancar_ate(self, tempo):
+        self.avancar(tempo - self.tempo)
+
+    def posicoes_locais(self, pais):
+        """Posições relativas ao corpo pai, no formato usado pelo grafo de cena"""
+        return np.where(pais[:, None] >= 0, self.r - self.r[pais], self.r)
+
+    def energia(self):
+        """Energia total dos corpos massivos (cinética + potencial), para medir a deriva"""
+        cinetica = 0.5 * np.sum(self.massas * np.einsum('ij,ij->i', self.v, self.v))
+        d = self.r[None, :, :] - self.r[:, None, :]
+        dist = np.sqrt(np.einsum('ijk,ijk->ij', d, d))
+        i, j = np.triu_indices(len(self.massas), 1)
+        potencial = -G * np.sum(self.massas[i] * self.massas[j] / dist[i, j])
+        return cinetica + potencial
+
+    def metricas(self):
+        """Métricas de desempenho e qualidade da integração"""
+        return {
+            'passos_por_segundo': self.passos_por_segundo,
+            'subpassos_quadro': self.subpassos_quadro,
+            'passos_particulas': self.passos_particulas,
+            'passo_dias': self.passo_atual,
+            'precisao_reduzida': self.precisao_reduzida,
+            'deriva_energia': abs(self.energia() / self.energia_inicial - 1),
+        }
@@ -0,0 +1,139 @@
+# Geometria persistente das órbitas: cada órbita é construída uma única vez no
+# seu plano orbital e posicionada por transformações; o gradiente de brilho que
+# acompanha o corpo é calculado na GPU a partir da anomalia atual.
+import math
+
+from panda3d.core import (GeomVertexFormat, GeomVertexArrayFormat, GeomVertexData, GeomVertexWriter,
+                          Geom, GeomLinestrips, GeomNode, InternalName, LMatrix4f, Shader)
+
+ORBITA_VERT = """
+#version 120
+uniform mat4 p3d_ModelViewProjectionMatrix;
+attribute vec4 p3d_Vertex;
+attribute float anomalia;
+varying float v_anomalia;
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    v_anomalia = anomalia;
+}
+"""
+
+ORBITA_FRAG = """
+#version 120
+const float DOIS_PI = 6.283185307179586;
+uniform float anomalia_atual;
+varying float v_anomalia;
+void main() {
+    // Mantém o tom mais escuro em 0.05 junto ao corpo e clareia até 0.30 atrás dele
+    float intensidade = 0.05 + 0.25 * (mod(v_anomalia - anomalia_atual, DOIS_PI) / DOIS_PI);
+    gl_FragColor = vec4(intensidade, intensidade, intensidade, 1.0);
+}
+"""
+
+
+def formato_orbita():
+    # Posição, anomalia excêntrica do vértice e cor (usada quando não há shaders)
+    array = GeomVertexArrayFormat()
+    array.addColumn(InternalName.getVertex(), 3, Geom.NT_float32, Geom.C_point)
+    array.addColumn(InternalName.make('anomalia'), 1, Geom.NT_float32, Geom.C_other)
+    array.addColumn(InternalName.getColor(), 4, Geom.NT_float32, Geom.C_color)
+    return GeomVertexFormat.registerFormat(array)
+
+
+def criar_circulo(num_segmentos):
+    """Círculo unitário no plano XY, amostrado uniformemente na anomalia excêntrica"""
+    vdata = GeomVertexData('orbita', formato_orbita(), Geom.UH_static)
+    vdata.uncleanSetNumRows(num_segmentos + 1)
+    vertice = GeomVertexWriter(vdata, 'vertex')
+    anomalia = GeomVertexWriter(vdata, 'anomalia')
+    cor = GeomVertexWriter(vdata, 'color')
+    for j in range(num_segmentos + 1):
+        E = 2 * math.pi * j / num_segmentos
+        vertice.setData3f(math.cos(E), math.sin(E), 0)
+        anomalia.setData1f(E)
+        intensidade = 0.05 + 0.25 * ((j % num_segmentos) / num_segmentos)
+        cor.setData4f(intensidade, intensidade, intensidade, 1)
+    linha = GeomLinestrips(Geom.UH_static)
+    linha.addConsecutiveVertices(0, num_segmentos + 1)
+    linha.closePrimitive()
+    geom = Geom(vdata)
+    geom.addPrimitive(linha)
+    return geom
+
+
+def matriz_orbita(a, b, e, P, Q):
+    """Matriz que leva o círculo unitário à elipse da órbita, com o foco na origem.
+
+    Segue a convenção de vetores-linha do Panda3D: as linhas são as imagens
+    dos eixos X, Y e Z do círculo e a translação.
+    """
+    N = (P[1] * Q[2] - P[2] * Q[1], P[2] * Q[0] - P[0] * Q[2], P[0] * Q[1] - P[1] * Q[0])
+    return LMatrix4f(a * P[0], a * P[1], a * P[2], 0,
+                     b * Q[0], b * Q[1], b * Q[2], 0,
+                     N[0], N[1], N[2], 0,
+                     -a * e * P[0], -a * e * P[1], -a * e * P[2], 1)
+
+
+class Orbitas:
+    """Mantém um nó de órbita persistente por corpo e atualiza só visibilidade e uniformes"""
+
+    def __init__(self, centros, efemerides, usar_shader=True, num_segmentos=200, espessura=1.5):
+        """centros mapeia o índice de cada corpo ao nó do seu centro de atração no grafo de cena"""
+        self.efemerides = efemerides
+        self.usar_shader = usar_shader
+        shader = Shader.make(Shader.SL_GLSL, ORBITA_VERT, ORBITA_FRAG) if usar_shader else None
+
+        self.num_segmentos = num_segmentos
+        self._circulos_por_nivel = {}  # Geometria compartilhada por número de segmentos
+        circulo = self.circulo(num_segmentos)
+        self.pivos = {}    # Nó da órbita, filho do centro de atração do corpo
+        self.circulos = {}  # Nó com a geometria compartilhada do círculo
+        for k, centro in centros.items():
+            if efemerides.a[k] <= 0:
+                continue
+            pivo = centro.attachNewNode('orbita_%s' % efemerides.nomes[k])
+            pivo.setRenderModeThickness(espessura)
+            pivo.setLightOff()
+            if shader is not None:
+                pivo.setShader(shader)
+                pivo.setShaderInput('anomalia_atual', 0.0)
+            pivo.setMat(matriz_orbita(efemerides.a_escalado[k], efemerides.b_escalado[k],
+                                      efemerides.e[k], efemerides.P[k], efemerides.Q[k]))
+            node = GeomNode('circulo_%s' % efemerides.nomes[k])
+            node.addGeom(circulo)
+            self.circulos[k] = pivo.attachNewNode(node)
+            pivo.hide()
+            self.pivos[k] = pivo
+        self.segmentos = dict.fromkeys(self.pivos, num_segmentos)
+        self.visiveis = set()
+
+    def circulo(self, num_segmentos):
+        """Retorna (criando uma única vez) o círculo com o número de segmentos pedido"""
+        num_segmentos = int(num_segmentos)
+        geom = self._circulos_por_nivel.get(num_segmentos)
+        if geom is None:
+            geom = self._circulos_por_nivel[num_segmentos] = criar_circulo(num_segmentos)
+        return geom
+
+    def atualizar(self, visiveis, anomalias, segmentos=None):
+        """Mostra apenas as órbitas visíveis e move o gradiente para a anomalia atual.
+
+        As órbitas acompanham seus centros pelo grafo de cena; segmentos, quando
+        informado, mapeia o índice ao nível de detalhe desejado. O custo é
+        O(corpos) por quadro.
+        """
+        for k in self.visiveis - visiveis:
+            self.pivos[k].hide()
+        for k in visiveis:
+            pivo = self.pivos[k]
+            if k not in self.visiveis:
+                pivo.show()
+            if segmentos is not None and segmentos[k] != self.segmentos[k]:
+                self.circulos[k].node().setGeom(0, self.circulo(segmentos[k]))
+                self.segmentos[k] = segmentos[k]
+            if self.usar_shader:
+                pivo.setShaderInput('anomalia_atual', float(anomalias[k]))
+            else:
+                # Sem shaders, gira o círculo para que o gradiente das cores dos vértices acompanhe o corpo
+                self.circulos[k].setH(math.degrees(anomalias[k]))
+        self.visiveis = set(visiveis)
@@ -0,0 +1,130 @@
+# Instrumentação por etapa do quadro: cada etapa é cronometrada com um coletor
+# do PStats (visível no pstats quando conectado) e guarda as últimas durações
+# em um buffer circular para calcular percentis sem ferramentas externas.
+import datetime, json, time
+
+import numpy as np
+from panda3d.core import PStatCollector
+
+TAMANHO_JANELA = 600                      # Amostras mantidas por etapa (~10 s a 60 quadros/s)
+PREFIXO_PSTATS = 'App:Show code:update_simulation'
+PERCENTIS = (50, 95, 99)
+
+
+class Etapa:
+    """Cronômetro de uma etapa; usado como gerenciador de contexto (with perfil['etapa']:)"""
+
+    __slots__ = ('nome', 'coletor', 'amostras', 'indice', 'total', '_inicio')
+
+    def __init__(self, nome, tamanho=TAMANHO_JANELA, prefixo=PREFIXO_PSTATS):
+        """prefixo é o coletor pai no PStats; None deixa a etapa no nível mais alto"""
+        self.nome = nome
+        self.coletor = PStatCollector('%s:%s' % (prefixo, nome) if prefixo else nome)
+        self.amostras = np.zeros(tamanho)  # Durações em segundos
+        self.indice = 0
+        self.total = 0
+        self._inicio = 0.0
+
+    def __enter__(self):
+        self.coletor.start()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        self.registrar(time.perf_counter() - self._inicio)
+        self.coletor.stop()
+
+    def registrar(self, duracao):
+        self.amostras[self.indice] = duracao
+        self.indice = (self.indice + 1) % len(self.amostras)
+        self.total += 1
+
+    def estatisticas(self):
+        """Percentis, média e máximo (em ms) das amostras da janela"""
+        amostras = self.amostras[:min(self.total, len(self.amostras))] * 1000
+        if not len(amostras):
+            return None
+        resultado = {'p%d' % p: v for p, v in zip(PERCENTIS, np.percentile(amostras, PERCENTIS))}
+        resultado.update(media=float(amostras.mean()), max=float(amostras.max()), amostras=int(self.total))
+        return resultado
+
+
+class Perfil:
+    """Conjunto de etapas cronometradas do quadro, criadas sob demanda pelo nome.
+
+    As etapas são criadas na thread principal; uma etapa usada por outra thread
+    deve ser criada antes com criar(), para que o dicionário não mude enquanto
+    a thread principal o percorre.
+    """
+
+    def __init__(self, tamanho=TAMANHO_JANELA):
+        self.tamanho = tamanho
+        self.etapas = {}
+
+    def __getitem__(self, nome):
+        etapa = self.etapas.get(nome)
+        if etapa is None:
+            etapa = self.etapas[nome] = Etapa(nome, self.tamanho)
+        return etapa
+
+    def criar(self, nome, prefixo=PREFIXO_PSTATS):
+        """Cria a etapa com o coletor do PStats sob `prefixo` (None: no nível mais alto)"""
+        etapa = self.etapas[nome] = Etapa(nome, self.tamanho, prefixo)
+        return etapa
+
+    def relatorio(self):
+        """Estatísticas de todas as etapas, em um dicionário serializável em JSON"""
+        return {
+            'gerado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+            'janela': self.tamanho,
+            'unidade': 'ms',
+            'etapas': {nome: etapa.estatisticas() for nome, etapa in self.etapas.items()},
+        }
+
+    def salvar(self, caminho):
+        with open(caminho, 'w', encoding='utf8') as f:
+            json.dump(self.relatorio(), f, indent=2, ensure_ascii=False)
+        return caminho
+
+    def texto(self):
+        """Resumo de uma linha por etapa para a sobreposição na tela"""
+        linhas = ['etapa            p50    p95    p99 ms']
+        for nome, etapa in self.etapas.items():
+            estatisticas = etapa.estatisticas()
+            if estatisticas is not None:
+                linhas.append('%-14s %6.2f %6.2f %6.2f' % (
+                    nome, estatisticas['p50'], estatisticas['p95'], estatisticas['p99']))
+        return '\n'.join(linhas)
+
+
+class TemposPartida:
+    """Duração de cada etapa da inicialização, na ordem em que ocorreram.
+
+    inicio é o instante (time.perf_counter) a partir do qual a partida é
+    contada; cada marcar(nome) atribui a `nome` o tempo desde a marca anterior.
+    """
+
+    def __init__(self, inicio=None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.etapas = {}
+        self._ultimo = self.inicio
+
+    def marcar(self, nome):
+        """Atribui a `nome` o tempo decorrido desde a etapa anterior"""
+        agora = time.perf_counter()
+        self.etapas[nome] = self.etapas.get(nome, 0.0) + agora - self._ultimo
+        self._ultimo = agora
+
+    def relatorio(self):
+        return {
+            'gerado_em': datetime.datetime.now().isoformat(timespec='seconds'),
+            'unidade': 'ms',
+            'total': (self._ultimo - self.inicio) * 1000,
+            'etapas': {nome: duracao * 1000 for nome, duracao in self.etapas.items()},
+        }
+
+    def texto(self):
+        total = self._ultimo - self.inicio
+        linhas = ['%-16s %9.1f ms %5.1f%%' % (nome, duracao * 1000, 100 * duracao / total if total else 0)
+                  for nome, duracao in self.etapas.items()]
+        return '\n'.join(linhas + ['%-16s %9.1f ms' % ('total', total * 1000)])
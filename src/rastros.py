@@ -0,0 +1,187 @@
+# Rastros do movimento: cada corpo guarda as últimas posições (relativas ao pai)
+# em um buffer circular NumPy de tamanho fixo, e cada nova amostra é escrita
+# diretamente nos vértices pré-alocados de uma GeomVertexData, sem recriar
+# geometria. A amostra vai para duas linhas, c e c + N: assim as N amostras, da
+# mais antiga à mais recente, são sempre vértices consecutivos, e a linha
+# desenhada é só uma janela (primeiro vértice, número de vértices) que avança
+# uma linha por amostra. Memória limitada e custo constante por corpo e amostra;
+# o esmaecimento ao longo do rastro é calculado na GPU. Quando um quadro avança
+# mais que o intervalo entre amostras, as amostras que faltam são interpoladas
+# ao longo do arco em torno do pai, e o rastro mantém a duração de meia órbita.
+import numpy as np
+from panda3d.core import (GeomVertexFormat, GeomVertexArrayFormat, GeomVertexData, Geom, GeomLinestrips,
+                          GeomNode, InternalName, PTA_int, Shader, TransparencyAttrib)
+
+from src.instancias import escrever_array
+
+AMOSTRAS_PADRAO = 512   # Amostras por corpo
+FRACAO_PERIODO = 0.5    # Cada rastro cobre meia órbita do corpo
+ALFA_SEM_SHADER = 0.5   # Opacidade fixa quando não há shaders (sem esmaecimento)
+LIMITE_ARCO = 0.25      # Fração do período acima da qual um quadro não é mais interpolado
+
+RASTRO_VERT = """
+#version 120
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform float linha_recente;
+uniform float amostras;
+attribute vec4 p3d_Vertex;
+attribute float linha;
+varying float v_idade;
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    v_idade = (linha_recente - linha) / amostras;
+}
+"""
+
+RASTRO_FRAG = """
+#version 120
+uniform vec4 cor;
+varying float v_idade;
+void main() {
+    // Opaco na amostra mais recente, transparente na mais antiga
+    gl_FragColor = vec4(cor.rgb, cor.a * (1.0 - v_idade));
+}
+"""
+
+
+def formato_rastro():
+    # Posição e índice da linha no buffer (estático: a idade sai da diferença para a linha mais recente)
+    array = GeomVertexArrayFormat()
+    array.addColumn(InternalName.getVertex(), 3, Geom.NT_float32, Geom.C_point)
+    array.addColumn(InternalName.make('linha'), 1, Geom.NT_float32, Geom.C_other)
+    return GeomVertexFormat.registerFormat(array)
+
+
+def arco(inicio, fim, fracoes):
+    """Pontos entre duas posições relativas ao pai: a direção gira no plano das duas
+    e a distância varia linearmente (fracoes em (0, 1], fim incluído)"""
+    r0, r1 = np.linalg.norm(inicio), np.linalg.norm(fim)
+    fracoes = np.asarray(fracoes, dtype=float)[:, None]
+    if r0 == 0 or r1 == 0:
+        return inicio + (fim - inicio) * fracoes
+    u0, u1 = inicio / r0, fim / r1
+    angulo = np.arctan2(np.linalg.norm(np.cross(u0, u1)), np.dot(u0, u1))
+    if angulo < 1e-9:
+        return inicio + (fim - inicio) * fracoes
+    direcao = (np.sin((1 - fracoes) * angulo) * u0 + np.sin(fracoes * angulo) * u1) / np.sin(angulo)
+    return direcao * (r0 + (r1 - r0) * fracoes)
+
+
+class Rastros:
+    """Rastro de cada corpo com órbita, desenhado sob o nó do seu centro de atração"""
+
+    def __init__(self, centros, cores, periodos, amostras=AMOSTRAS_PADRAO, usar_shader=True, espessura=1.5):
+        """centros mapeia o índice de cada corpo ao nó do seu centro; periodos em dias"""
+        self.amostras = amostras
+        self.usar_shader = usar_shader
+        self.corpos = np.array(sorted(centros), dtype=int)
+        m = len(self.corpos)
+        self.intervalos = FRACAO_PERIODO * np.asarray(periodos, dtype=float)[self.corpos] / amostras  # Dias
+        self.historico = np.zeros((m, amostras, 3))  # Buffers circulares das posições
+        self.tempos = np.zeros((m, amostras))       # Instante de cada amostra (dias desde J2000)
+        self.cursor = np.full(m, -1)               # Posição da amostra mais recente no buffer
+        self.contagem = np.zeros(m, dtype=int)
+        self.ultimo = np.full(m, -np.inf)          # Instante da última amostra
+
+        formato = formato_rastro()
+        shader = Shader.make(Shader.SL_GLSL, RASTRO_VERT, RASTRO_FRAG) if usar_shader else None
+        linhas = np.zeros((2 * amostras, 4), dtype=np.float32)
+        linhas[:, 3] = np.arange(2 * amostras)
+        self.vdatas, self.geoms, self.nos = [], [], []
+        for j, k in enumerate(self.corpos):
+            vdata = GeomVertexData('rastro', formato, Geom.UH_dynamic)
+            vdata.uncleanSetNumRows(2 * amostras)
+            escrever_array(vdata, 0, linhas)
+            geom = Geom(vdata)
+            geom.addPrimitive(GeomLinestrips(Geom.UH_dynamic))
+            node = GeomNode('rastro_%d' % k)
+            node.addGeom(geom)
+            no = centros[k].attachNewNode(node)
+            no.setRenderModeThickness(espessura)
+            no.setLightOff()
+            no.setTransparency(TransparencyAttrib.MAlpha)
+            no.setDepthWrite(False)
+            cor = tuple(cores[k][:3])
+            if shader is not None:
+                no.setShader(shader)
+                no.setShaderInput('cor', cor + (1.0,))
+                no.setShaderInput('amostras', float(amostras))
+                no.setShaderInput('linha_recente', 0.0)
+            else:
+                no.setColor(*cor, ALFA_SEM_SHADER)
+            no.hide()
+            self.vdatas.append(vdata)
+            self.geoms.append(geom)
+            self.nos.append(no)
+
+    def limpar(self):
+        """Descarta o histórico (os rastros recomeçam da próxima amostra)"""
+        self.cursor[:] = -1
+        self.contagem[:] = 0
+        self.ultimo[:] = -np.inf
+        for no in self.nos:
+            no.hide()
+
+    def atualizar(self, tempo, locais):
+        """Amostra os corpos cujo intervalo desde a última amostra já passou.
+
+        locais são as posições relativas ao pai (corpos × 3). As amostras que
+        caberiam desde a anterior são interpoladas ao longo do arco até a posição
+        atual; se o quadro cobre mais que LIMITE_ARCO do período, o arco é ambíguo
+        e o corpo recebe uma única amostra (o rastro fica mais longo que meia
+        órbita). Um recuo no tempo recomeça o rastro do corpo.
+        """
+        decorrido = tempo - self.ultimo
+        for j in np.flatnonzero(decorrido < 0):
+            self.cursor[j], self.contagem[j], self.ultimo[j] = -1, 0, -np.inf
+            self.nos[j].hide()
+        decorrido = tempo - self.ultimo
+        limite = LIMITE_ARCO * self.amostras / FRACAO_PERIODO  # Em intervalos entre amostras
+        for j in np.flatnonzero(decorrido >= self.intervalos):
+            posicao = locais[self.corpos[j]]
+            passos = decorrido[j] / self.intervalos[j]
+            if self.contagem[j] == 0 or passos > limite:
+                self._amostrar(j, np.array([tempo]), posicao[None])
+                continue
+            n = min(int(passos), self.amostras)
+            fracoes = np.arange(1, n + 1) / n
+            tempos = self.ultimo[j] + (tempo - self.ultimo[j]) * fracoes
+            self._amostrar(j, tempos, arco(self.historico[j, self.cursor[j]], posicao, fracoes))
+
+    def _amostrar(self, j, tempos, posicoes):
+        n = self.amostras
+        k = len(tempos)
+        linhas = (int(self.cursor[j]) + 1 + np.arange(k)) % n
+        c = self.cursor[j] = linhas[-1]
+        self.historico[j, linhas] = posicoes
+        self.tempos[j, linhas] = tempos
+        self.ultimo[j] = tempos[-1]
+        enchendo = self.contagem[j] < n
+        contagem = self.contagem[j] = min(int(self.contagem[j]) + k, n)
+
+        # Duas cópias de cada amostra, nas linhas l e l + n, sem tocar nas demais
+        destino = memoryview(self.vdatas[j].modifyArray(0)).cast('B').cast('f')
+        vertices = np.frombuffer(destino, dtype=np.float32).reshape(-1, 4)
+        vertices[linhas, :3] = vertices[linhas + n, :3] = posicoes
+        del vertices
+        destino.release()
+
+        # A janela desenhada termina na linha c + n (a mais recente) e tem `contagem` vértices
+        linha = self.geoms[j].modifyPrimitive(0)
+        linha.setNonindexedVertices(c + n - contagem + 1, contagem)
+        if enchendo:  # Com o buffer cheio, o tamanho da janela não muda mais
+            fins = PTA_int.emptyArray(1)
+            fins[0] = contagem
+            linha.setEnds(fins)
+        if self.usar_shader:
+            self.nos[j].setShaderInput('linha_recente', float(c + n))
+        if contagem >= 2 and contagem - k < 2:
+            self.nos[j].show()
+
+    def trajetoria(self, k):
+        """(tempos, posições) das amostras do corpo k, da mais antiga à mais recente"""
+        j = int(np.searchsorted(self.corpos, k))
+        if j >= len(self.corpos) or self.corpos[j] != k:
+            raise KeyError(k)
+        ordem = (self.cursor[j] - np.arange(self.contagem[j])[::-1]) % self.amostras
+        return self.tempos[j, ordem], self.historico[j, ordem]
@@ -0,0 +1,217 @@
+# Recursos pré-convertidos: texturas e modelos são convertidos uma única vez para
+# os formatos nativos do Panda3D (.txo já com mipmaps, comprimido em DXT1 quando a
+# placa aceita; .bam para modelos) e guardados em um cache indexado pelo hash do
+# arquivo de origem. A leitura e a conversão das texturas rodam em uma thread; o
+# resultado é entregue no laço principal. Uma miniatura da textura, pequena o
+# bastante para ser lida de forma síncrona, ocupa o lugar da textura completa até
+# ela ficar pronta. Os modelos são lidos de forma síncrona: a esfera dos corpos é
+# necessária já na construção da cena, e o .bam em cache é lido rapidamente.
+#
+# Pré-conversão: python -m src.recursos [arquivos...] [--sem-compressao] [--largura-max N]
+import argparse, hashlib, os, time
+from concurrent.futures import ThreadPoolExecutor
+
+from direct.task import Task
+from panda3d.core import (Filename, Loader, LoaderOptions, NodePath, PNMImage, PNMImageHeader,
+                          SamplerState, Texture, VirtualFileSystem, getModelPath)
+
+VERSAO_CACHE = 1           # Incrementar quando a conversão mudar
+LARGURA_MINIATURA = 256    # Miniatura lida na partida, antes da textura completa
+DIR_TEXTURAS = os.path.join(os.path.dirname(__file__), 'texturas')
+DIR_CACHE = os.path.join(os.path.dirname(__file__), '.cache')
+EXTENSOES_MODELO = ('', '.bam', '.egg', '.egg.pz', '.bam.pz')
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.tga', '.bmp')
+
+
+def chave_cache(caminho, *parametros):
+    # O hash cobre o conteúdo da origem, a versão da conversão e os parâmetros da variante
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        h.update(f.read())
+    h.update(repr((VERSAO_CACHE,) + parametros).encode('ascii'))
+    return h.hexdigest()[:32]
+
+
+def _gravar(escrever, caminho):
+    # Grava em um temporário com a mesma extensão (o Panda3D escolhe o formato por ela)
+    # e o move para o lugar: uma leitura concorrente nunca vê um arquivo pela metade
+    base, extensao = os.path.splitext(caminho)
+    temporario = base + '.tmp' + extensao
+    if not escrever(Filename.fromOsSpecific(temporario)):
+        raise OSError("Falha ao gravar %s" % temporario)
+    os.replace(temporario, caminho)
+
+
+def converter_textura(origem, destino, largura, comprimir):
+    """Converte uma imagem em .txo com `largura` pixels de largura, mipmaps e, se pedido, DXT1"""
+    imagem = PNMImage()
+    if not imagem.read(Filename.fromOsSpecific(origem)):
+        raise OSError("Imagem ilegível: %s" % origem)
+    if imagem.getXSize() != largura:
+        reduzida = PNMImage(largura, max(1, round(imagem.getYSize() * largura / imagem.getXSize())),
+                            imagem.getNumChannels())
+        reduzida.gaussianFilterFrom(1.0, imagem)
+        imagem = reduzida
+    textura = Texture(os.path.basename(origem))
+    textura.load(imagem)
+    textura.setMinfilter(SamplerState.FT_linear_mipmap_linear)
+    textura.setMagfilter(SamplerState.FT_linear)
+    textura.setWrapV(SamplerState.WM_clamp)  # Sem vazamento entre os polos de um panorama
+    textura.generateRamMipmapImages()
+    if comprimir and not textura.compressRamImage(Texture.CM_dxt1):
+        raise OSError("Compressão DXT1 indisponível nesta versão do Panda3D")
+    _gravar(textura.write, destino)
+
+
+def converter_modelo(origem, destino):
+    """Converte um modelo (.egg, .egg.pz...) em .bam"""
+    opcoes = LoaderOptions(LoaderOptions.LF_no_cache | LoaderOptions.LF_report_errors)
+    no = Loader.getGlobalPtr().loadSync(Filename.fromOsSpecific(origem), opcoes)
+    if no is None:
+        raise OSError("Modelo ilegível: %s" % origem)
+    _gravar(NodePath(no).writeBamFile, destino)
+
+
+def resolver_modelo(nome):
+    """Caminho no disco de um modelo procurado no model-path do Panda3D, como faz loader.loadModel"""
+    vfs = VirtualFileSystem.getGlobalPtr()
+    for extensao in EXTENSOES_MODELO:
+        arquivo = Filename(nome + extensao)
+        # Só arquivos reais: o VFS também resolve 'x.egg' para o 'x.egg.pz' existente
+        if vfs.resolveFilename(arquivo, getModelPath().getValue()) and os.path.isfile(arquivo.toOsSpecific()):
+            return arquivo.toOsSpecific()
+    raise FileNotFoundError("Modelo não encontrado: %s" % nome)
+
+
+def largura_variante(origem, largura_max):
+    # Largura da textura convertida: a da imagem, limitada ao máximo aceito pela placa
+    cabecalho = PNMImageHeader()
+    if not cabecalho.readHeader(Filename.fromOsSpecific(origem)):
+        raise OSError("Imagem ilegível: %s" % origem)
+    largura = cabecalho.getXSize()
+    return min(largura, largura_max) if largura_max and largura_max > 0 else largura
+
+
+class Recursos:
+    """Cache de recursos convertidos e carregamento em segundo plano.
+
+    comprimir e largura_max descrevem o que a placa aceita; SistemaSolar os lê
+    do GSG (o rasterizador em software não aceita texturas comprimidas e limita
+    a largura a 4096). As funções ao_carregar são chamadas no laço principal.
+    """
+
+    def __init__(self, base, comprimir=False, largura_max=0, dir_cache=DIR_CACHE):
+        self.base = base
+        self.comprimir = comprimir
+        self.largura_max = largura_max
+        self.dir_cache = dir_cache
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='recursos')
+        self.pendentes = []  # (future, ao_carregar)
+
+    @classmethod
+    def para_gsg(cls, base, gsg, **kwargs):
+        comprimir = gsg is not None and gsg.getSupportsCompressedTexture() and \
+            gsg.getSupportsCompressedTextureFormat(Texture.CM_dxt1)
+        largura_max = gsg.getMaxTextureDimension() if gsg is not None else 0
+        return cls(base, comprimir, largura_max, **kwargs)
+
+    def caminho(self, origem, sufixo, *parametros):
+        nome = os.path.basename(origem).split('.')[0]
+        return os.path.join(self.dir_cache, '%s-%s.%s' % (nome, chave_cache(origem, *parametros), sufixo))
+
+    def _garantir(self, destino, converter):
+        # Converte só quando o cache não tem a variante; sem permissão de escrita, falha aqui
+        if not os.path.exists(destino):
+            os.makedirs(self.dir_cache, exist_ok=True)
+            converter(destino)
+        return destino
+
+    def _textura(self, origem, largura, comprimir):
+        # Executado na thread de recursos: converte (se preciso) e lê o .txo
+        destino = self._garantir(self.caminho(origem, 'txo', largura, comprimir),
+                                 lambda destino: converter_textura(origem, destino, largura, comprimir))
+        textura = Texture(os.path.basename(origem))
+        if not textura.read(Filename.fromOsSpecific(destino)):
+            raise OSError("Falha ao ler %s" % destino)
+        return textura
+
+    def modelo(self, nome):
+        """Carrega um modelo de forma síncrona, a partir do .bam em cache"""
+        origem = resolver_modelo(nome)
+        try:
+            caminho = self._garantir(self.caminho(origem, 'bam'),
+                                     lambda destino: converter_modelo(origem, destino))
+        except OSError:
+            caminho = origem  # Sem cache: lê a origem diretamente
+        return self.base.loader.loadModel(Filename.fromOsSpecific(caminho))
+
+    def carregar_textura(self, origem, ao_carregar):
+        """Entrega a miniatura (de imediato, se já convertida) e depois a textura completa.
+
+        ao_carregar(textura) é chamada uma vez para cada versão que fica pronta.
+        """
+        miniatura = self.caminho(origem, 'txo', LARGURA_MINIATURA, False)
+        if os.path.exists(miniatura):
+            textura = Texture(os.path.basename(origem))
+            if textura.read(Filename.fromOsSpecific(miniatura)):
+                ao_carregar(textura)
+        else:
+            self._enviar(lambda: self._textura(origem, LARGURA_MINIATURA, False), ao_carregar)
+        largura = largura_variante(origem, self.largura_max)
+        self._enviar(lambda: self._textura(origem, largura, self.comprimir), ao_carregar)
+
+    def _enviar(self, trabalho, ao_concluir):
+        if not self.pendentes:
+            self.base.taskMgr.add(self._entregar, 'recursos')
+        self.pendentes.append((self.executor.submit(trabalho), ao_concluir))
+
+    def _entregar(self, task=None, esperar=False):
+        # Laço principal: entrega, na ordem de envio, os trabalhos já concluídos
+        while self.pendentes and (esperar or self.pendentes[0][0].done()):
+            futuro, ao_concluir = self.pendentes.pop(0)
+            try:
+                resultado = futuro.result()
+            except OSError as erro:
+                print("Recurso indisponível:", erro)
+                continue
+            ao_concluir(resultado)
+        return Task.cont if self.pendentes else Task.done
+
+    def aguardar(self):
+        """Bloqueia até que a thread de recursos conclua e entregue todos os pedidos (renderização offline)"""
+        while self.pendentes:
+            self._entregar(esperar=True)
+        self.base.taskMgr.remove('recursos')
+
+    def fechar(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-converte texturas para o cache de recursos")
+    parser.add_argument('arquivos', nargs='*', help="Imagens (padrão: todas em src/texturas)")
+    parser.add_argument('--sem-compressao', action='store_true',
+                        help="Grava sem DXT1 (placas sem texturas comprimidas, --tinydisplay)")
+    parser.add_argument('--largura-max', type=int, default=0,
+                        help="Largura máxima aceita pela placa (--tinydisplay: 4096)")
+    args = parser.parse_args(argv)
+    arquivos = args.arquivos or sorted(
+        os.path.join(DIR_TEXTURAS, nome) for nome in os.listdir(DIR_TEXTURAS)
+        if nome.lower().endswith(EXTENSOES_IMAGEM))
+
+    recursos = Recursos(None, not args.sem_compressao, args.largura_max)
+    for origem in arquivos:
+        try:
+            for largura, comprimir in ((LARGURA_MINIATURA, False),
+                                       (largura_variante(origem, args.largura_max), recursos.comprimir)):
+                inicio = time.perf_counter()
+                destino = recursos.caminho(origem, 'txo', largura, comprimir)
+                recursos._garantir(destino, lambda destino: converter_textura(origem, destino, largura, comprimir))
+                print("%s -> %s (%.1f s)" % (origem, destino, time.perf_counter() - inicio))
+        except OSError as erro:
+            parser.error(str(erro))
+    recursos.fechar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+# Transmissão local de posições: um único motor de efemérides (o da janela, a
+# cada quadro, ou o do próprio servidor, sem janela) publica as posições, e
+# qualquer número de visualizadores as recebe por WebSocket ou por um socket
+# Unix, em quadros binários compactos. Cada assinante tem a sua taxa máxima e
+# recebe só os corpos que se moveram desde o último quadro que lhe foi enviado.
+#
+# Uso: python -m src.servidor --ws 127.0.0.1:8765 --unix /tmp/solar.sock --hz 30
+#      python solar.py --servidor ws://127.0.0.1:8765
+#
+# Protocolo (little-endian):
+# - Ao conectar, o assinante recebe uma mensagem de texto JSON com o catálogo
+#   (chaves, nomes, índice do pai de cada corpo, unidade e referencial).
+# - Cada quadro binário tem um cabeçalho de 20 bytes: 'SS', versão u8, tipo u8,
+#   sequência u32, dias desde J2000 f64, corpos no catálogo u16, corpos no quadro u16.
+#   Seguem as posições (corpos no quadro × 3 float32, em UA, relativas ao pai) e
+#   os índices u16 desses corpos no catálogo. O tipo 0 (completo) traz todos os
+#   corpos assinados; o tipo 1 (delta), só os que mudaram além da tolerância.
+# - O assinante ajusta a assinatura com mensagens de texto JSON, por exemplo
+#   {"hz": 10, "corpos": ["terra", "lua"], "tolerancia": 1e-7}; a seguinte é completa.
+# - No socket Unix, cada mensagem do servidor é precedida do tamanho (u32) e do
+#   tipo (u8: 1 texto, 2 binário), e o assinante envia um objeto JSON por linha.
+import argparse, asyncio, base64, datetime, hashlib, json, os, signal, stat, struct, threading, time
+
+import numpy as np
+
+from src.catalogo import carregar_catalogo
+from src.efemerides import Efemerides, dias_desde_j2000
+from src.exportar import ler_data
+
+VERSAO_PROTOCOLO = 1
+CABECALHO = struct.Struct('<2sBBIdHH')
+COMPLETO, DELTA = 0, 1
+TEXTO, BINARIO, FECHAR, PING, PONG = 0x1, 0x2, 0x8, 0x9, 0xA  # Opcodes WebSocket (os dois primeiros também no socket Unix)
+HZ_PADRAO = 30.0
+HZ_MAX = 120.0
+LIMITE_BUFFER = 256 * 1024        # Bytes pendentes de um assinante lento antes de pular quadros
+TAMANHO_MAX_MENSAGEM = 64 * 1024  # Mensagens do assinante maiores que isso encerram a conexão
+GUID_WEBSOCKET = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def codificar_quadro(tipo, sequencia, tempo, total, indices, posicoes):
+    """Quadro binário: cabeçalho, posições float32 (n × 3) e índices u16 (n)"""
+    cabecalho = CABECALHO.pack(b'SS', VERSAO_PROTOCOLO, tipo, sequencia & 0xffffffff, tempo, total, len(indices))
+    return (cabecalho + np.ascontiguousarray(posicoes, dtype='<f4').tobytes() +
+            np.ascontiguousarray(indices, dtype='<u2').tobytes())
+
+
+def decodificar_quadro(dados):
+    """Inverso de codificar_quadro: (tipo, sequencia, tempo, total, indices, posicoes)"""
+    magica, versao, tipo, sequencia, tempo, total, n = CABECALHO.unpack_from(dados)
+    if magica != b'SS' or versao != VERSAO_PROTOCOLO:
+        raise ValueError("Quadro inválido (versão %r)" % versao)
+    posicoes = np.frombuffer(dados, '<f4', n * 3, CABECALHO.size).reshape(n, 3)
+    indices = np.frombuffer(dados, '<u2', n, CABECALHO.size + posicoes.nbytes)
+    return tipo, sequencia, tempo, total, indices, posicoes
+
+
+def enquadrar_websocket(opcode, dados):
+    # Quadro WebSocket final e sem máscara (o servidor nunca mascara)
+    n = len(dados)
+    if n < 126:
+        cabecalho = struct.pack('>BB', 0x80 | opcode, n)
+    elif n < 1 << 16:
+        cabecalho = struct.pack('>BBH', 0x80 | opcode, 126, n)
+    else:
+        cabecalho = struct.pack('>BBQ', 0x80 | opcode, 127, n)
+    return cabecalho + dados
+
+
+def enquadrar_unix(opcode, dados):
+    return struct.pack('<IB', len(dados), opcode) + dados
+
+
+def ler_endereco(texto):
+    """'ws://host:porta' ou 'host:porta' -> ('ws', host, porta); 'unix:/caminho' -> ('unix', caminho)"""
+    if texto.startswith('unix:'):
+        return ('unix', texto[len('unix:'):])
+    host, separador, porta = texto.removeprefix('ws://').rstrip('/').rpartition(':')
+    if not separador or not porta.isdigit():
+        raise ValueError("Endereço inválido: %r (use ws://host:porta ou unix:/caminho)" % texto)
+    return ('ws', host or '127.0.0.1', int(porta))
+
+
+class Assinante:
+    """Um visualizador conectado: taxa máxima, corpos assinados e o que ele já recebeu"""
+
+    def __init__(self, escritor, enquadrar, total, hz=HZ_PADRAO):
+        self.escritor = escritor
+        self.enquadrar = enquadrar
+        self.total = total
+        self.descartados = 0  # Quadros pulados porque o assinante não dava conta
+        self.assinar(hz, np.arange(total), 0.0)
+
+    def assinar(self, hz, indices, tolerancia):
+        self.intervalo = 1 / hz
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.tolerancia = tolerancia  # UA; 0: qualquer mudança do valor em float32
+        self.conhecidas = None        # Posições que o assinante tem; None força um quadro completo
+        self.proximo = 0.0            # Instante (time.monotonic) a partir do qual pode receber outro quadro
+
+    def enviar(self, opcode, dados):
+        self.escritor.write(self.enquadrar(opcode, dados))
+
+    def quadro(self, agora, sequencia, tempo, posicoes):
+        """Bytes do próximo quadro, ou None enquanto a taxa do assinante não permite outro"""
+        if agora < self.proximo:
+            return None
+        atuais = posicoes[self.indices].astype(np.float32)
+        if self.conhecidas is None:
+            # Um quadro completo (re)começa a agenda a partir de agora
+            self.proximo = agora + self.intervalo
+            tipo, mudaram = COMPLETO, np.arange(len(self.indices))
+            self.conhecidas = atuais
+        else:
+            # Agenda pelo instante previsto, e não pelo real, para manter a taxa média
+            # apesar da variação dos quadros; quadros nunca saem a menos de meio intervalo
+            self.proximo = max(self.proximo + self.intervalo, agora + self.intervalo / 2)
+            tipo = DELTA
+            mudaram = np.flatnonzero(np.abs(atuais - self.conhecidas).max(axis=1) > self.tolerancia)
+            self.conhecidas[mudaram] = atuais[mudaram]
+        return codificar_quadro(tipo, sequencia, tempo, self.total, self.indices[mudaram], atuais[mudaram])
+
+
+async def aceitar_websocket(leitor, escritor):
+    """Lê o pedido HTTP de upgrade e responde ao handshake do WebSocket (RFC 6455)"""
+    pedido = (await leitor.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    cabecalhos = {}
+    for linha in pedido[1:]:
+        nome, _, valor = linha.partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    chave = cabecalhos.get('sec-websocket-key')
+    if not pedido[0].startswith('GET ') or cabecalhos.get('upgrade', '').lower() != 'websocket' or not chave:
+        escritor.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+        raise ConnectionError("Pedido sem upgrade para WebSocket")
+    aceite = base64.b64encode(hashlib.sha1(chave.encode('ascii') + GUID_WEBSOCKET).digest())
+    escritor.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                   b'Sec-WebSocket-Accept: ' + aceite + b'\r\n\r\n')
+
+
+async def mensagens_websocket(leitor, escritor):
+    """Mensagens de texto do assinante; responde a ping e encerra no quadro de fechamento"""
+    while True:
+        b0, b1 = await leitor.readexactly(2)
+        opcode, tamanho = b0 & 0x0f, b1 & 0x7f
+        if tamanho == 126:
+            tamanho, = struct.unpack('>H', await leitor.readexactly(2))
+        elif tamanho == 127:
+            tamanho, = struct.unpack('>Q', await leitor.readexactly(8))
+        if tamanho > TAMANHO_MAX_MENSAGEM or not b1 & 0x80:
+            raise ConnectionError("Mensagem grande demais ou sem máscara")
+        mascara = np.frombuffer(await leitor.readexactly(4), dtype=np.uint8)
+        dados = np.frombuffer(await leitor.readexactly(tamanho), dtype=np.uint8)
+        dados = (dados ^ np.resize(mascara, tamanho)).tobytes()
+        if opcode == FECHAR:
+            escritor.write(enquadrar_websocket(FECHAR, dados[:2]))
+            return
+        if opcode == PING:
+            escritor.write(enquadrar_websocket(PONG, dados))
+        elif opcode == TEXTO and b0 & 0x80:  # Mensagens fragmentadas não são usadas pelo protocolo
+            yield dados.decode('utf8')
+
+
+async def mensagens_unix(leitor):
+    async for linha in leitor:
+        if linha.strip():
+            yield linha.decode('utf8')
+
+
+class Servidor:
+    """Difunde as posições publicadas a todos os assinantes, a partir de uma thread própria.
+
+    publicar() pode ser chamada de qualquer thread e só guarda o estado mais
+    recente: se a thread do servidor ficar para trás, os estados intermediários
+    são descartados, e não enfileirados.
+    """
+
+    def __init__(self, catalogo, enderecos, escala=1.0, hz=HZ_PADRAO):
+        self.indice = catalogo.indice
+        self.total = len(catalogo)
+        self.catalogo = json.dumps({
+            'tipo': 'catalogo',
+            'versao': VERSAO_PROTOCOLO,
+            'chaves': list(catalogo.chaves),
+            'nomes': list(catalogo.nomes),
+            'pais': [int(pai) for pai in catalogo.pais],
+            'unidade': 'UA',
+            'referencial': 'eclíptica J2000, relativa ao pai (heliocêntrica quando pai = -1)',
+        }, ensure_ascii=False).encode('utf8')
+        self.enderecos = [ler_endereco(endereco) for endereco in enderecos]
+        self.escala = escala  # Unidades de cena por UA
+        self.hz = min(hz, HZ_MAX)
+        self.assinantes = set()
+        self.sequencia = 0
+        self.quadros = 0
+        self.bytes = 0
+        self._trava = threading.Lock()
+        self._pendente = None
+        self._loop = None
+        self._thread = None
+        self._sockets_criados = []  # (caminho, (dispositivo, inode)) dos sockets Unix abertos aqui
+
+    def iniciar(self):
+        """Abre os sockets em uma thread própria; erros de endereço são levantados aqui"""
+        pronto, erros = threading.Event(), []
+
+        def executar():
+            self._loop = asyncio.new_event_loop()
+            try:
+                servidores = self._loop.run_until_complete(self._abrir())
+            except OSError as erro:
+                erros.append(erro)
+                pronto.set()
+                return
+            pronto.set()
+            self._loop.run_forever()
+            for servidor in servidores:
+                servidor.close()
+            for assinante in self.assinantes:
+                assinante.escritor.close()
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=executar, name='servidor', daemon=True)
+        self._thread.start()
+        pronto.wait()
+        if erros:
+            raise erros[0]
+
+    async def _abrir(self):
+        servidores = []
+        for endereco in self.enderecos:
+            if endereco[0] == 'unix':
+                caminho = endereco[1]
+                if os.path.lexists(caminho):
+                    if not stat.S_ISSOCK(os.lstat(caminho).st_mode):
+                        raise FileExistsError("%s já existe e não é um socket" % caminho)
+                    os.unlink(caminho)  # Socket deixado por uma execução anterior
+                servidores.append(await asyncio.start_unix_server(self._atender_unix, caminho))
+                info = os.stat(caminho)
+                self._sockets_criados.append((caminho, (info.st_dev, info.st_ino)))
+            else:
+                servidores.append(await asyncio.start_server(self._atender_websocket, endereco[1], endereco[2]))
+        return servidores
+
+    def parar(self):
+        if self._loop is None or not self._thread.is_alive():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        # Só remove os sockets criados por este processo, se ainda forem os mesmos arquivos
+        for caminho, identidade in self._sockets_criados:
+            try:
+                info = os.lstat(caminho)
+            except FileNotFoundError:
+                continue
+            if stat.S_ISSOCK(info.st_mode) and (info.st_dev, info.st_ino) == identidade:
+                os.unlink(caminho)
+        self._sockets_criados.clear()
+        print(self.resumo())
+
+    def resumo(self):
+        return "Servidor: %d quadros difundidos, %d quadros enviados, %.1f kB" % (
+            self.sequencia, self.quadros, self.bytes / 1024)
+
+    def publicar(self, tempo, posicoes):
+        """Publica as posições relativas ao pai (unidades de cena) no instante `tempo` (dias desde J2000)"""
+        estado = (float(tempo), np.array(posicoes, dtype=np.float64) / self.escala)
+        with self._trava:
+            agendar = self._pendente is None
+            self._pendente = estado
+        if agendar:
+            self._loop.call_soon_threadsafe(self._difundir)
+
+    def _difundir(self):
+        with self._trava:
+            tempo, posicoes = self._pendente
+            self._pendente = None
+        self.sequencia += 1
+        agora = time.monotonic()
+        for assinante in list(self.assinantes):
+            if assinante.escritor.transport.get_write_buffer_size() > LIMITE_BUFFER:
+                assinante.descartados += 1  # O delta seguinte parte do que ele de fato recebeu
+                continue
+            quadro = assinante.quadro(agora, self.sequencia, tempo, posicoes)
+            if quadro is not None:
+                assinante.enviar(BINARIO, quadro)
+                self.quadros += 1
+                self.bytes += len(quadro)
+
+    def _assinar(self, assinante, pedido):
+        # Campos ausentes mantêm o valor atual
+        hz = float(pedido.get('hz', 1 / assinante.intervalo))
+        if not 0 < hz:
+            raise ValueError("hz deve ser positivo")
+        indices = assinante.indices
+        if 'corpos' in pedido:
+            if not isinstance(pedido['corpos'], list):
+                raise ValueError("corpos deve ser uma lista de chaves")
+            desconhecidos = [corpo for corpo in pedido['corpos'] if corpo not in self.indice]
+            if desconhecidos:
+                raise ValueError("Corpos desconhecidos: %s" % ', '.join(map(str, desconhecidos)))
+            indices = [self.indice[corpo] for corpo in pedido['corpos']]
+        tolerancia = float(pedido.get('tolerancia', assinante.tolerancia))
+        if tolerancia < 0:
+            raise ValueError("A tolerância não pode ser negativa")
+        assinante.assinar(min(hz, HZ_MAX), indices, tolerancia)
+
+    async def _atender(self, assinante, mensagens):
+        self.assinantes.add(assinante)
+        assinante.enviar(TEXTO, self.catalogo)
+        try:
+            async for texto in mensagens:
+                try:
+                    pedido = json.loads(texto)
+                    if not isinstance(pedido, dict):
+                        raise ValueError("O pedido deve ser um objeto JSON")
+                    self._assinar(assinante, pedido)
+                except (ValueError, TypeError) as erro:
+                    assinante.enviar(TEXTO, json.dumps({'tipo': 'erro', 'mensagem': str(erro)},
+                                                       ensure_ascii=False).encode('utf8'))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, UnicodeDecodeError):
+            pass  # Conexão perdida ou assinante fora do protocolo
+        finally:
+            self.assinantes.discard(assinante)
+            assinante.escritor.close()
+
+    async def _atender_websocket(self, leitor, escritor):
+        try:
+            await aceitar_websocket(leitor, escritor)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            escritor.close()
+            return
+        await self._atender(Assinante(escritor, enquadrar_websocket, self.total, self.hz),
+                            mensagens_websocket(leitor, escritor))
+
+    async def _atender_unix(self, leitor, escritor):
+        await self._atender(Assinante(escritor, enquadrar_unix, self.total, self.hz), mensagens_unix(leitor))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transmite as posições dos corpos sem abrir janela")
+    parser.add_argument('--ws', action='append', default=[], metavar='HOST:PORTA', help="Endereço WebSocket")
+    parser.add_argument('--unix', action='append', default=[], metavar='CAMINHO', help="Caminho do socket Unix")
+    parser.add_argument('--hz', type=float, default=HZ_PADRAO, help="Cálculos por segundo (e taxa padrão dos assinantes)")
+    parser.add_argument('--inicio', default=None, help="Data ISO ou dias desde J2000 (padrão: agora)")
+    parser.add_argument('--velocidade', type=float, default=1.0, help="Segundos simulados por segundo real")
+    args = parser.parse_args(argv)
+    if not args.ws and not args.unix:
+        parser.error("informe ao menos um endereço (--ws ou --unix)")
+    if not 0 < args.hz <= HZ_MAX:
+        parser.error("--hz deve estar entre 0 e %g" % HZ_MAX)
+
+    try:
+        inicio = ler_data(args.inicio) if args.inicio is not None else dias_desde_j2000(datetime.datetime.now())
+        enderecos = ['ws://' + endereco for endereco in args.ws] + ['unix:' + caminho for caminho in args.unix]
+        catalogo = carregar_catalogo()
+        servidor = Servidor(catalogo, enderecos, hz=args.hz)
+    except ValueError as erro:
+        parser.error(str(erro))
+    efemerides = Efemerides.de_catalogo(catalogo)  # Em UA
+    try:
+        servidor.iniciar()
+    except OSError as erro:
+        parser.error(str(erro))
+    print("Transmitindo %d corpos em %s a %g Hz" % (len(catalogo), ', '.join(enderecos), args.hz))
+
+    # SIGTERM (systemd, kill) encerra como Ctrl+C: o socket Unix é removido e o resumo é mostrado
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    relogio = inicio_real = time.monotonic()
+    try:
+        while True:
+            tempo = inicio + (time.monotonic() - inicio_real) * args.velocidade / 86400
+            servidor.publicar(tempo, efemerides.posicoes_locais_em((tempo,))[0])
+            relogio += 1 / args.hz
+            time.sleep(max(0.0, relogio - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# Separa a física da renderização: um trabalhador em segundo plano avança o
+# tempo simulado a uma taxa fixa e publica instantâneos imutáveis do estado em
+# um buffer duplo; a tarefa de renderização interpola entre os dois últimos.
+import threading, time
+from dataclasses import dataclass, replace
+from typing import Any, Optional
+
+import numpy as np
+
+from src.indice_espacial import Grade
+from src.kepler import normalizar_angulo
+
+FREQUENCIA_FISICA = 60.0  # Passos de física por segundo de tempo real
+FOLGA_MAX_GRADE = 0.5     # A grade dos corpos menores é refeita quando eles se afastam mais que isto (em células)
+
+
+@dataclass(frozen=True)
+class Instantaneo:
+    """Estado publicado pela física em um passo; os arrays são somente leitura"""
+    tempo: float                  # Dias desde J2000
+    relogio: float                # Instante de tempo real (time.monotonic) a que o estado corresponde
+    locais: np.ndarray            # Posições relativas ao pai (corpos × 3)
+    anomalias: np.ndarray         # Anomalia excêntrica de cada corpo
+    kepleriano: bool              # Posições sobre as elipses: interpolação pela anomalia
+    menores: Optional[np.ndarray] = None  # Posições dos corpos menores, quando houver
+    metricas: Optional[Any] = None        # Métricas da dinâmica de N corpos
+    grade_menores: Optional[Any] = None   # Grade 3D dos corpos menores, montada pelo trabalhador
+    folga_grade: float = 0.0              # Distância máxima entre as posições exibidas e as da grade
+
+    def __post_init__(self):
+        for campo in ('locais', 'anomalias', 'menores'):
+            valor = getattr(self, campo)
+            if valor is not None:
+                valor.setflags(write=False)
+
+
+def interpolar(anterior, atual, fracao, efemerides):
+    """Estado entre dois instantâneos, com fracao em [0, 1].
+
+    Em estados keplerianos a anomalia excêntrica é interpolada e a posição é
+    reconstruída sobre a elipse, o que mantém luas rápidas na órbita mesmo com
+    grandes avanços de tempo entre passos; nos demais a interpolação é linear.
+    Retorna (tempo, locais, anomalias, menores).
+    """
+    if anterior is atual or fracao >= 1:
+        return atual.tempo, atual.locais, atual.anomalias, atual.menores
+    tempo = anterior.tempo + (atual.tempo - anterior.tempo) * fracao
+    anomalias = anterior.anomalias + normalizar_angulo(atual.anomalias - anterior.anomalias) * fracao
+    if anterior.kepleriano and atual.kepleriano:
+        locais = efemerides.locais_de_anomalias(anomalias)
+    else:
+        locais = anterior.locais + (atual.locais - anterior.locais) * fracao
+    menores = atual.menores
+    if anterior.menores is not None and atual.menores is not None:
+        menores = anterior.menores + (atual.menores - anterior.menores) * np.float32(fracao)
+    return tempo, locais, anomalias, menores
+
+
+def passo_kepleriano(efemerides, tempo, tabela=None, menores=None):
+    """Instantâneo do modelo analítico, ou da tabela de Chebyshev quando ela cobre o instante"""
+    if tabela is not None and tabela.cobre(tempo):
+        locais = tabela.posicoes_locais_em((tempo,))[0]
+        anomalias = efemerides.anomalias_de_locais(locais)
+    else:
+        locais = efemerides.posicoes_locais_em((tempo,))[0]
+        anomalias = efemerides.ultimas_anomalias
+    return Instantaneo(tempo, 0.0, locais, anomalias, kepleriano=True, menores=menores)
+
+
+class Simulacao:
+    """Avança o tempo simulado e calcula o estado a uma taxa fixa, fora da renderização.
+
+    passo_fisica(tempo) devolve um Instantaneo (o relógio é preenchido aqui) e
+    velocidade() a velocidade atual da simulação. Em modo síncrono não há
+    trabalhador: quem renderiza chama avancar(dt) a cada quadro, o que torna a
+    execução determinística (útil para gravações e testes).
+    """
+
+    def __init__(self, passo_fisica, tempo_inicial, velocidade, frequencia=FREQUENCIA_FISICA, sincrona=False):
+        self.passo_fisica = passo_fisica
+        self.velocidade = velocidade
+        self.periodo = 1.0 / frequencia
+        self.sincrona = sincrona
+        self.tempo = float(tempo_inicial)
+        self.passos = 0
+        self.duracao_passo = 0.0  # Duração (s) do último passo de física
+        self._trava = threading.Lock()
+        self._ultimo = None  # Último instantâneo calculado
+        inicial = self._calcular(time.monotonic())
+        self._buffer = (inicial, inicial)  # (anterior, atual), trocados juntos sob a trava
+        self._parar = threading.Event()
+        self._trabalhador = None
+
+    def _calcular(self, relogio):
+        inicio = time.perf_counter()
+        instantaneo = self.passo_fisica(self.tempo)
+        grade, folga = self._indexar(instantaneo.menores)
+        self.duracao_passo = time.perf_counter() - inicio
+        self.passos += 1
+        self._ultimo = replace(instantaneo, relogio=relogio, grade_menores=grade, folga_grade=folga)
+        return self._ultimo
+
+    def _indexar(self, menores):
+        # Grade 3D dos corpos menores para as consultas do mouse, montada aqui e não no
+        # quadro. Ela é reaproveitada enquanto eles se afastam menos que FOLGA_MAX_GRADE
+        # células das posições em que foi montada; a folga acumulada vale também para as
+        # posições interpoladas desde o instantâneo anterior. No modo síncrono não há
+        # trabalhador, e a grade fica para a primeira consulta (IndiceEspacial)
+        if menores is None or self.sincrona:
+            return None, 0.0
+        anterior = self._ultimo
+        if anterior is None or anterior.grade_menores is None or anterior.menores.shape != menores.shape:
+            return Grade(menores), 0.0
+        deslocamento = float(np.abs(menores - anterior.menores).max()) * np.sqrt(3)
+        folga = anterior.folga_grade + deslocamento
+        if folga > FOLGA_MAX_GRADE * anterior.grade_menores.tamanho:
+            return Grade(menores), deslocamento
+        return anterior.grade_menores, folga
+
+    def _publicar(self, instantaneo):
+        with self._trava:
+            self._buffer = (self._buffer[1], instantaneo)
+
+    def iniciar(self):
+        """Inicia o trabalhador em segundo plano (sem efeito no modo síncrono)"""
+        if self.sincrona or self._trabalhador is not None:
+            return
+        self._trabalhador = threading.Thread(target=self._executar, name='simulacao', daemon=True)
+        self._trabalhador.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._trabalhador is not None:
+            self._trabalhador.join(timeout=1.0)
+            self._trabalhador = None
+
+    def _executar(self):
+        proximo = time.monotonic()
+        while not self._parar.is_set():
+            proximo += self.periodo
+            self.tempo += self.periodo * self.velocidade() / 86400
+            self._publicar(self._calcular(proximo))
+            espera = proximo - time.monotonic()
+            if espera > 0:
+                self._parar.wait(espera)
+            elif espera < -self.periodo:
+                # Passo de física mais lento que a taxa fixa: descarta o atraso em vez de acumulá-lo
+                proximo = time.monotonic()
+
+    def avancar(self, dt):
+        """Modo síncrono: avança dt segundos de tempo real e publica o novo estado"""
+        self.tempo += dt * self.velocidade() / 86400
+        instantaneo = self._calcular(time.monotonic())
+        self._buffer = (instantaneo, instantaneo)
+
+    def instantaneos(self):
+        """Os dois últimos instantâneos publicados (anterior, atual)"""
+        with self._trava:
+            return self._buffer
+
+    def amostrar(self, efemerides, relogio=None):
+        """Estado interpolado para exibição: (tempo, locais, anomalias, menores, instantâneo atual).
+
+        Cada passo é carimbado com o instante a que se destina, um período à
+        frente de quando é calculado; assim o quadro atual cai sempre entre os
+        dois últimos passos publicados.
+        """
+        anterior, atual = self.instantaneos()
+        if relogio is None:
+            relogio = time.monotonic()
+        intervalo = atual.relogio - anterior.relogio
+        fracao = 1.0 if intervalo <= 0 else min(max((relogio - anterior.relogio) / intervalo, 0.0), 1.0)
+        return interpolar(anterior, atual, fracao, efemerides) + (atual,)
+
+    def amostrar_quadro(self, efemerides, relogio=None):
+        """Como amostrar, com as posições absolutas (corpos × 3) ao final"""
+        tempo, locais, anomalias, menores, atual = self.amostrar(efemerides, relogio)
+        return tempo, locais, anomalias, menores, atual, efemerides.absolutas(locais)
+
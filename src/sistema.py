@@ -3,115 +3,232 @@ from direct.showbase.ShowBase import ShowBase
 from direct.task import Task
 from direct.gui.OnscreenText import OnscreenText
 from panda3d.core import (ClockObject, WindowProperties, AmbientLight, DirectionalLight, 
-                         Vec4, Vec3, LineSegs, PointLight, AntialiasAttrib, FrameBufferProperties)
+                         Vec4, Vec3, PointLight, AntialiasAttrib, FrameBufferProperties,
+                         GraphicsWindow, NodePath, PandaSystem)
 from panda3d.core import loadPrcFileData
-import yaml, datetime, math, os
+import datetime, json, math, os
+import numpy as np
 from datetime import timedelta
 import src.controles as controles  # Gerencia controles e estado da simulação
-from src.camera import CameraController  # Importa o controlador da câmera
+from src.efemerides import Efemerides, EPOCA_J2000, dias_desde_j2000  # Motor de efemérides vetorizado
+from src.catalogo import carregar_catalogo, AU, MODEL_SIZE_FACTOR  # Tabela compilada dos corpos
+from src.orbitas import Orbitas  # Geometria persistente das órbitas
+from src.simulacao import Simulacao, Instantaneo, passo_kepleriano  # Física em segundo plano com buffer duplo
+from src.perfil import Perfil, TemposPartida  # Tempos por etapa do quadro e da partida
+from src.gravacao import Gravador, Reprodutor, ler_gravacao, DT_PADRAO  # Gravação e reprodução de sessões
+import src.lod as lod  # Nível de detalhe em espaço de tela
+from src.recursos import Recursos, DIR_TEXTURAS  # Cache de recursos convertidos e carregamento em segundo plano
+from src.vistas import Vista, disposicao  # Câmeras e regiões da janela que compartilham a cena
+from src.indice_espacial import IndiceEspacial  # Escolha pelo mouse e corpos mais próximos
+# Recursos opcionais (corpos menores, tabelas de Chebyshev, N corpos, servidor) são importados só quando usados
 
-# Define constantes e carrega dados dos corpos celestes
+# Define constantes; o catálogo e o tempo simulado pertencem à instância e são carregados na partida
 globalClock = ClockObject.getGlobalClock()
-ref_date = datetime.datetime(2000, 1, 1, 12, 0, 0)   # Data base da simulação
-sim_days = (datetime.datetime.now() - ref_date).total_seconds() / 86400   # Dias simulados
+ref_date = EPOCA_J2000   # Data base da simulação
 REAL_SCALE_FACTOR = 1e-6
 ZOOM_THRESHOLD = 5.0
 SIZE_MULTIPLIER = 100.0
-AU = 1.496e11
-MODEL_SIZE_FACTOR = 2e-7
-
-caminho_corpos = os.path.join(os.path.dirname(__file__), 'parametros', 'corpos.yaml')
-with open(caminho_corpos, 'r', encoding='utf8') as f:
-    astros = yaml.safe_load(f)
-
-# Mapeia luas aos seus planetas pais
-parent_moons = {
-    'lua':     'terra',
-    'io':      'jupiter',
-    'europa':  'jupiter',
-    'ganimedes': 'jupiter',
-    'calisto': 'jupiter',
-    'tita':    'saturno',
-    'encelado':'saturno',
-    'titania': 'urano',
-    'oberon':  'urano',
-}
-
-def parse_number(val):
-    # Converte valores para float, avaliando expressões simples se necessário
-    if isinstance(val, (int, float)):
-        return float(val)
-    try:
-        return float(eval(val, {"__builtins__": None}, {}))
-    except Exception:
-        return float(val)
+MODELO_ESFERA = "models/misc/sphere"
+TEXTURA_CEU = os.path.join(DIR_TEXTURAS, "milky_way.jpg")
+
+COR_CORPOS_MENORES = (0.6, 0.6, 0.55, 1.0)
+ORBIT_DISPLAY_THRESHOLD = 0.05  # Limiar de zoom para exibição de órbitas de planetas não focados
+VIZINHOS = 10         # Corpos listados pela consulta dos mais próximos do alvo
+INTERVALO_DICA = 0.1  # A dica sob o cursor é refeita a cada INTERVALO_DICA s, com o mouse parado ou não
 
 class SistemaSolar(ShowBase):
-    def __init__(self):
+    def __init__(self, corpos_menores=None, limite_corpos_menores=None, tabela_efemerides=None,
+                 fisica_sincrona=False, perfil=None, gravar=None, reproduzir=None,
+                 resultado_reproducao=None, dt_reproducao=DT_PADRAO, offscreen=False, tinydisplay=False,
+                 epoca=None, tempos_partida=None, inicio_partida=None, servidor=None, vistas=()):
+        # Cronometragem da partida; inicio_partida (time.perf_counter) inclui as importações
+        # feitas antes da construção, e tempos_partida é o JSON gravado após o primeiro quadro
+        self.partida = TemposPartida(inicio_partida)
+        self.partida.marcar('importacoes')
+        self.caminho_partida = tempos_partida
+        # Dias desde J2000 simulados (padrão: agora)
+        self.sim_days = dias_desde_j2000(datetime.datetime.now()) if epoca is None else float(epoca)
         # Configurar Anti-Aliasing antes de inicializar ShowBase
         loadPrcFileData("", "framebuffer-multisample 1")
         loadPrcFileData("", "multisamples 4")
+        if offscreen:
+            loadPrcFileData("", "window-type offscreen")  # Renderiza em um buffer, sem janela
+        if tinydisplay:
+            loadPrcFileData("", "load-display p3tinydisplay")  # Rasterizador em software do Panda3D
         
         ShowBase.__init__(self)
+        self.partida.marcar('showbase')
         
-        # Configura a janela de renderização com a resolução da tela
-        props = WindowProperties()
-        import tkinter as tk
-        root = tk.Tk()
-        screen_width = root.winfo_screenwidth()
-        screen_height = root.winfo_screenheight()
-        root.destroy()
-        props.setSize(screen_width, screen_height)
-        self.win.requestProperties(props)
+        # Configura a janela de renderização com a resolução da tela, informada pelo próprio pipe
+        # (buffers fora da tela não aceitam requestProperties e mantêm o win-size)
+        largura_tela, altura_tela = self.pipe.getDisplayWidth(), self.pipe.getDisplayHeight()
+        if isinstance(self.win, GraphicsWindow) and largura_tela > 0 and altura_tela > 0:
+            props = WindowProperties()
+            props.setSize(largura_tela, altura_tela)
+            self.win.requestProperties(props)
         self.setBackgroundColor(0, 0, 0, 1)
+        self.partida.marcar('janela')
+
+        # Texturas e modelos vêm do cache de recursos, na variante que a placa aceita
+        self.recursos = Recursos.para_gsg(self, self.win.getGsg())
+        self.finalExitCallbacks.append(self.recursos.fechar)
         
         # Configura Anti-Aliasing adicional para objetos renderizados
         self.render.setAntialias(AntialiasAttrib.MAuto)
         
-        controles.register_controls(self)  # Ativa os controles da simulação
+        # Reprodução de uma sessão gravada: mesma época, mesmo estado inicial, mesmas
+        # ações e passo de tempo fixo; as teclas ficam desativadas para não interferir
+        self.reprodutor = None
+        if reproduzir:
+            gravacao = ler_gravacao(reproduzir)
+            self.reprodutor = Reprodutor(gravacao, controles.ACOES, dt_reproducao)
+            self.reprodutor.restaurar_estado(controles.simulation_state)
+            self.caminho_gravacao = reproduzir
+            self.caminho_resultado = resultado_reproducao
+            self.sim_days = gravacao['epoca']
+            fisica_sincrona = True  # A thread de física segue o relógio real, o que não se repete
+            globalClock.setMode(ClockObject.MNonRealTime)
+            globalClock.setFrameRate(1 / dt_reproducao)
+        else:
+            # Ativa os controles da simulação; com gravar, cada ação é registrada com o seu instante
+            gravador = None
+            if gravar:
+                gravador = Gravador(gravar, self.sim_days, controles.simulation_state, globalClock.getFrameTime)
+                self.finalExitCallbacks.append(gravador.salvar)
+            controles.register_controls(self, gravador)
+            # O clique escolhe o alvo por nome, gravado como uma ação com argumento
+            self.focar = gravador.envolver(controles.focar) if gravador is not None else controles.focar
         
-        # Inicializa o controlador da câmera
-        self.camera_controller = CameraController(self)
+        # Cronometragem por etapa; perfil é o arquivo JSON gravado ao sair (opcional)
+        self.perfil = Perfil()
+        self.caminho_perfil = perfil
+        self.accept('shift-p', self.salvar_perfil)
+        if perfil:
+            self.finalExitCallbacks.append(self.salvar_perfil)
 
-        # Aplica iluminação ambiente e direcional
+        # Iluminação ambiente e direcional, aplicada à cena de cada vista
         ambient = AmbientLight("ambient")
         ambient.setColor(Vec4(0.2, 0.2, 0.2, 1))
         directional = DirectionalLight("directional")
         directional.setDirection(Vec3(1, 1, -1))
-        self.render.setLight(self.render.attachNewNode(ambient))
-        self.render.setLight(self.render.attachNewNode(directional))
+        self.luzes = [self.render.attachNewNode(ambient), self.render.attachNewNode(directional)]
+
+        self.partida.marcar('controles')
+
+        # Compila corpos.yaml (ou lê o cache binário já compilado) e monta o motor de efemérides
+        catalogo = self.catalogo = carregar_catalogo()
+        self.partida.marcar('catalogo')
+        self.efemerides = Efemerides.de_catalogo(catalogo, escala=AU * MODEL_SIZE_FACTOR)
+
+        # Tabela de Chebyshev opcional: usada no lugar do modelo analítico dentro do seu intervalo
+        self.tabela = None
+        if tabela_efemerides:
+            from src.chebyshev import TabelaChebyshev
+            self.tabela = TabelaChebyshev(tabela_efemerides, escala=AU * MODEL_SIZE_FACTOR)
+            if self.tabela.nomes != self.efemerides.nomes:
+                raise ValueError("A tabela %s não corresponde a corpos.yaml" % tabela_efemerides)
+
+        # Integrador de N corpos, criado a partir do estado kepleriano quando o modo é ativado
+        self.ncorpos = None
+
+        # O heliocentro marca a posição do Sol, centro das órbitas de nível mais alto.
+        # Cada corpo tem um pivô (posição) filho do pivô do seu pai; a esfera fica
+        # sob o pivô para que a escala não se propague às luas. O heliocentro e os
+        # pivôs de nível mais alto são compartilhados: cada vista os instancia sob a
+        # sua origem flutuante, com as posições relativas ao seu alvo
+        self.heliocentro = NodePath("heliocentro")
+        self.pivos_raiz = {k: NodePath("pivo_%s" % catalogo.chaves[k])
+                           for k in range(len(catalogo)) if catalogo.pais[k] < 0}
+        self.pivos = [self.pivos_raiz.get(k) for k in range(len(catalogo))]
+        for k in [int(k) for nivel in self.efemerides.niveis for k in nivel]:
+            self.pivos[k] = self.pivos[catalogo.pais[k]].attachNewNode("pivo_%s" % catalogo.chaves[k])
+        self.luas = np.flatnonzero(catalogo.pais >= 0)
 
-        # Carrega os modelos dos corpos e define suas características visuais
+        self.partida.marcar('efemerides')
+
+        # A esfera é carregada uma única vez: cada corpo (e o halo do Sol) recebe uma
+        # instância dela sob um nó próprio, que guarda a escala e a cor do corpo
+        esfera = self.recursos.modelo(MODELO_ESFERA)
+        self.partida.marcar('modelos')
         self.nodes = {}
-        for key, astro in astros.items():
-            kl = key.lower()
-            node = self.loader.loadModel("models/misc/sphere")
-            node.reparentTo(self.render)
+        for k, kl in enumerate(catalogo.chaves):
+            node = self.pivos[k].attachNewNode("corpo_%s" % kl)
+            esfera.instanceTo(node)
+            # Escala fixa: definida uma única vez, e não a cada quadro
+            node.setScale(float(catalogo.raio_cena[k]) if catalogo.raio_cena[k] > 0 else 0.2)
             if kl == 'sol':
-                node.setScale(2.0)
                 pl = PointLight("sol_brilho")
                 pl.setColor(Vec4(2, 2, 1.5, 1))
                 pl.setAttenuation((0.1, 0.04, 0.0))
-                plnp = node.attachNewNode(pl)
-                self.render.setLight(plnp)
-                halo = self.loader.loadModel("models/misc/sphere")
-                halo.reparentTo(node)
+                node.attachNewNode(pl)  # Ligada em cada vista, pelo caminho da sua instância
+                halo = node.attachNewNode("halo")
+                esfera.instanceTo(halo)
                 halo.setScale(3.0)
                 halo.setColor(Vec4(1, 1, 0.8, 0.5))
                 halo.setTransparency(True)
-            elif 'orbital' in astro and kl not in parent_moons:
-                node.setScale(0.5)
-            elif 'orbital' in astro and kl in parent_moons:
-                node.setScale(0.2)
-            else:
-                node.setScale(0.3)
-            cor = astro.get('cor', '#ffffff')
-            r = int(cor.lstrip('#')[0:2], 16) / 255.0
-            g = int(cor.lstrip('#')[2:4], 16) / 255.0
-            b = int(cor.lstrip('#')[4:6], 16) / 255.0
-            node.setColor(r, g, b, 1)
+            node.setColor(*catalogo.cores[k])
             self.nodes[kl] = node
 
+        # Vistas: a principal usa a câmera do ShowBase e segue o estado dos controles;
+        # as demais (alvo, zoom) têm cena, câmera e região próprias, lado a lado na janela
+        regioes = disposicao(1 + len(vistas))
+        regiao = self.cam.node().getDisplayRegion(0)
+        regiao.setDimensions(*regioes[0])
+        self.vistas = [Vista(self, self.render, self.camera, self.camLens, regiao, self.heliocentro, self.pivos_raiz)]
+        for i, (alvo, zoom) in enumerate(vistas, 1):
+            if alvo not in catalogo.indice:
+                raise ValueError("Corpo desconhecido na vista %d: %s" % (i, alvo))
+            vista = Vista.extra(self, "vista_%d" % i, regioes[i], self.camLens.makeCopy(), self.heliocentro,
+                                self.pivos_raiz, alvo=catalogo.indice[alvo])
+            vista.raiz.setAntialias(AntialiasAttrib.MAuto)
+            controlador = vista.controlador
+            controlador.zoom_current = controlador.zoom_target = min(
+                zoom, controlador.get_zoom_limit_for_target(self.escala_alvo(vista.alvo)))
+            vista.candidatas_orbita = self.regras_orbitas(vista.alvo, controlador.zoom_target)
+            self.vistas.append(vista)
+        for vista in self.vistas:
+            for luz in self.luzes + [vista.encontrar("sol_brilho")]:
+                vista.raiz.setLight(luz)
+        self.camera_controller = self.vistas[0].controlador
+
+        # Céu de fundo: a miniatura já convertida aparece no primeiro quadro, e o
+        # panorama completo substitui a miniatura quando a thread de recursos o entrega
+        self.recursos.carregar_textura(TEXTURA_CEU, self.definir_textura_ceu)
+        self.partida.marcar('cena')
+
+        # Constrói uma única vez a geometria das órbitas; o gradiente usa shader quando disponível
+        gsg = self.win.getGsg()
+        centros = {k: self.pivos[pai] if pai >= 0 else self.heliocentro
+                   for k, pai in enumerate(catalogo.pais)}
+        usar_shader = gsg is not None and gsg.getSupportsBasicShaders()
+        self.orbitas = Orbitas(centros, self.efemerides, usar_shader=usar_shader)
+        self.partida.marcar('orbitas')
+
+        # Rastros do movimento, criados na primeira vez em que são ligados
+        self.rastros = None
+        self._centros = {k: centro for k, centro in centros.items() if catalogo.tem_orbita[k]}
+        self._usar_shader = usar_shader
+
+        # Camada opcional de corpos menores (asteroides/cometas) lida em fluxo de um arquivo
+        self.camada_menores = None
+        if corpos_menores:
+            from src.corpos_menores import carregar_corpos_menores, efemerides_corpos_menores
+            from src.instancias import CamadaCorposMenores
+            elementos = carregar_corpos_menores(corpos_menores, limite=limite_corpos_menores)
+            self.camada_menores = CamadaCorposMenores(
+                self.heliocentro, efemerides_corpos_menores(elementos, escala=AU * MODEL_SIZE_FACTOR),
+                np.broadcast_to(COR_CORPOS_MENORES, (len(elementos), 4)), usar_shader=usar_shader)
+            print("Corpos menores carregados:", len(elementos))
+            self.partida.marcar('corpos_menores')
+
+        # Índice espacial sobre as posições de cada quadro: corpos do catálogo e depois os corpos menores
+        nomes, raios = list(catalogo.nomes), catalogo.raio_cena
+        if self.camada_menores is not None:
+            nomes += [nome or "Corpo menor %d" % (i + 1)
+                      for i, nome in enumerate(self.camada_menores.efemerides.nomes)]
+            raios = np.concatenate([raios, np.zeros(len(self.camada_menores.efemerides.nomes))])
+        self.indice = IndiceEspacial(nomes, raios)
+
         # Configura o texto de foco e inicializa a câmera com foco na Terra
         from panda3d.core import TextNode
         try:
@@ -121,176 +238,371 @@ class SistemaSolar(ShowBase):
             # O aviso sobre a fonte ausente é esperado e não afeta o funcionamento
         self.text_focus = OnscreenText(text="", pos=(0, 0.9), scale=0.07,
                                        fg=(1,1,1,1), align=TextNode.ACenter, font=verdana_font)
+        self.text_dinamica = OnscreenText(text="", pos=(0, -0.95), scale=0.045,
+                                          fg=(0.8,0.8,0.8,1), align=TextNode.ACenter, font=verdana_font)
+        self.text_perfil = OnscreenText(text="", pos=(0.35, 0.9), scale=0.04, fg=(0.7,1,0.7,1),
+                                        align=TextNode.ALeft, mayChange=True, font=self.loader.loadFont('cmtt12'))
+        self.text_dica = OnscreenText(text="", scale=0.045, fg=(1,1,0.8,1), align=TextNode.ALeft,
+                                      mayChange=True, font=verdana_font)
+        # Cada vista mostra o seu alvo no topo da sua região
+        self.vistas[0].rotulo = self.text_focus
+        for vista in self.vistas[1:]:
+            vista.rotulo = OnscreenText(text=catalogo.nomes[vista.alvo], scale=0.05, fg=(1,1,1,1),
+                                        align=TextNode.ACenter, font=verdana_font)
+        self.ajustar_vistas()
         
+        self.partida.marcar('interface')
+
+        # A etapa da física é criada aqui, na thread principal, com o coletor fora da
+        # árvore de update_simulation no PStats: o passo roda no trabalhador
+        self.perfil.criar('fisica', prefixo=None)
+        # A física roda em uma thread própria a uma taxa fixa; no modo síncrono, a cada quadro
+        self.simulacao = Simulacao(self.passo_fisica, self.sim_days, lambda: controles.simulation_state['speed'],
+                                   sincrona=fisica_sincrona)
+        self.finalExitCallbacks.append(self.simulacao.parar)
+
+        # Transmissão opcional das posições de cada quadro a visualizadores externos
+        self.servidor = None
+        if servidor:
+            from src.servidor import Servidor
+            self.servidor = Servidor(catalogo, servidor, escala=AU * MODEL_SIZE_FACTOR)
+            self.servidor.iniciar()
+            self.finalExitCallbacks.append(self.servidor.parar)
+            print("Transmitindo posições em", ', '.join(servidor))
+
+        # Trabalho derivado do estado, refeito só quando os campos dos quais depende mudam
+        self.indice_sol = catalogo.indice['sol']
+        self.corpos_visiveis = np.ones(len(catalogo), dtype=bool)
+        estado = controles.simulation_state
+        estado.assinar(self.ao_mudar_alvo, 'target')
+        estado.assinar(self.ao_mudar_perfil_visivel, 'perfil_visivel')
+        estado.assinar(self.ao_mudar_rastros, 'rastros')
+        estado.assinar(self.ao_mudar_zoom, 'target', 'zoom')
+        estado.assinar(lambda estado, alterados: self.camera_controller.update_from_simulation_state(estado),
+                       'zoom', 'target_inclination', 'target_rotation')
+        estado.processar()
+
         # Obtém posição da Terra para inicializar a câmera
-        positions = self.calcular_posicoes()
-        terra_pos = positions.get('terra', Vec3(0,0,0))
+        self.calcular_posicoes()
+        indice_terra = self.efemerides.indice.get('terra')
+        terra_pos = Vec3(*self.posicoes_array[indice_terra]) if indice_terra is not None else Vec3(0,0,0)
         
-        # Inicialização da câmera
+        # Inicialização das câmeras
         self.camera_controller.initialize_camera(initial_position=terra_pos)
+        for vista in self.vistas[1:]:
+            vista.controlador.initialize_camera(initial_position=self.posicoes_array[vista.alvo])
         
         self.taskMgr.add(self.update_simulation, "update_simulation")
-    
+        # Mouse: clique para focar um corpo e dica com o nome do corpo sob o cursor
+        # (na reprodução, os cliques gravados chegam como ações)
+        self.accept('g', self.mostrar_vizinhos)
+        if self.mouseWatcherNode is not None and self.reprodutor is None:
+            self.accept('mouse1', self.clicar)
+            self._dica = -math.inf  # Instante da última consulta
+            self.taskMgr.add(self.atualizar_dica, "dica", sort=1)
+        self.taskMgr.add(self.concluir_partida, "partida", sort=55)  # Depois de igLoop (50): o quadro já foi desenhado
+        if self.reprodutor is not None:
+            # Roda antes de update_simulation, para que as ações valham já no quadro em que ocorrem
+            self.inicio_reproducao = globalClock.getFrameTime()
+            self.taskMgr.add(self.reproduzir_quadro, "reproducao", sort=-10)
+        self.simulacao.iniciar()
+        self.partida.marcar('simulacao')
+
+    def passo_fisica(self, tempo):
+        # Executado pelo trabalhador da simulação: calcula o estado no instante
+        # sem tocar no grafo de cena
+        with self.perfil['fisica']:
+            return self._passo_fisica(tempo)
+
+    def _passo_fisica(self, tempo):
+        ef = self.efemerides
+        menores = None
+        if controles.simulation_state['dinamica'] == 'ncorpos':
+            if self.ncorpos is None:
+                from src.ncorpos import IntegradorNCorpos
+                # Parte do estado kepleriano atual, em unidades astronômicas; os corpos
+                # menores entram como partículas de teste
+                self.ncorpos = IntegradorNCorpos.de_efemerides(
+                    Efemerides.de_catalogo(self.catalogo), self.catalogo.massa, tempo,
+                    particulas=self.camada_menores.efemerides if self.camada_menores is not None else None)
+            self.ncorpos.avancar_ate(tempo)
+            locais = self.ncorpos.posicoes_locais(ef.pais) * ef.escala
+            anomalias = ef.anomalias_de_locais(locais)
+            metricas = self.ncorpos.metricas()
+            if self.camada_menores is not None:
+                menores = (self.ncorpos.particulas * self.camada_menores.efemerides.escala).astype(np.float32)
+            return Instantaneo(tempo, 0.0, locais, anomalias, kepleriano=False, menores=menores, metricas=metricas)
+        self.ncorpos = None
+        if self.camada_menores is not None:
+            menores = self.camada_menores.calcular(tempo)
+        return passo_kepleriano(ef, tempo, self.tabela, menores)
+
     def calcular_posicoes(self):
-        # Calcula as posições dos corpos celestes com base em seus parâmetros orbitais
-        center = Vec3(0, 0, 0)
-        pos = {}
-        for key, astro in astros.items():
-            kl = key.lower()
-            if kl == 'sol':
-                pos[kl] = center
-            elif 'orbital' in astro:
-                orb = astro['orbital']
-                period_days = parse_number(orb['T']) * 365.25
-                theta_base = 2 * math.pi * ((sim_days % period_days) / period_days)
-                e = orb.get('e', 0)
-                a = orb['a']
-                ω_rad = math.radians(orb.get('ω', 0))
-                i_rad = math.radians(orb.get('i', 0))
-                Ω_rad = math.radians(orb.get('Ω', 0))
-                f = theta_base + ω_rad
-                r = a * AU * MODEL_SIZE_FACTOR * (1 - e**2) / (1 + e * math.cos(f))
-                x_orb = r * math.cos(f)
-                y_orb = r * math.sin(f)
-                x = x_orb * math.cos(Ω_rad) - y_orb * math.sin(Ω_rad) * math.cos(i_rad)
-                y = x_orb * math.sin(Ω_rad) + y_orb * math.cos(Ω_rad) * math.cos(i_rad)
-                z = y_orb * math.sin(i_rad)
-                pos[kl] = Vec3(x, y, z)
-        # Ajusta as posições das luas com base em seus planetas pais
-        for key, astro in astros.items():
-            kl = key.lower()
-            if 'orbital' in astro and kl in parent_moons:
-                parent_key = parent_moons.get(kl)
-                if parent_key and parent_key in pos:
-                    pos[kl] = pos[parent_key] + pos[kl]
-                else:
-                    pos[kl] = center
-        return pos
+        # Lê o estado publicado pela física, interpolado para o instante do quadro, com as
+        # posições absolutas e as locais (relativas ao pai) usadas pelo grafo de cena
+        (self.sim_days, self.posicoes_locais, self.anomalias, self.posicoes_menores, self.instantaneo,
+         self.posicoes_array) = self.simulacao.amostrar_quadro(self.efemerides)
+
+    def atualizar_texto_dinamica(self):
+        # Mostra as métricas do integrador de N corpos quando ele está ativo
+        metricas = self.instantaneo.metricas
+        if metricas is None:
+            if self.text_dinamica.getText():
+                self.text_dinamica.setText("")
+            return
+        self.text_dinamica.setText("N corpos: %.0f passos/s, %d subpassos, passo %.3g d%s, deriva de energia %.1e" % (
+            metricas['passos_por_segundo'], metricas['subpassos_quadro'], metricas['passo_dias'],
+            " (reduzida)" if metricas['precisao_reduzida'] else "", metricas['deriva_energia']))
+
+    def escala_alvo(self, indice):
+        # Raio na cena do corpo em foco, que limita o zoom
+        if indice is not None and self.catalogo.raio_cena[indice] > 0:
+            return float(self.catalogo.raio_cena[indice])
+        return 0.2
+
+    def regras_orbitas(self, indice, zoom):
+        """Órbitas que podem ser exibidas com o alvo `indice` e o `zoom` dados"""
+        indices = np.arange(len(self.catalogo))
+        candidatas = np.full(len(self.catalogo), zoom < ORBIT_DISPLAY_THRESHOLD)
+        if indice is not None:
+            candidatas |= indices == indice                         # O alvo atual
+            candidatas |= indices == self.catalogo.pais[indice]     # O corpo pai do alvo (quando o alvo é uma lua)
+            candidatas |= self.catalogo.pais == indice              # As luas do corpo em foco
+        return candidatas & self.catalogo.tem_orbita
+
+    def ao_mudar_alvo(self, estado, alterados):
+        # Dados derivados do alvo da vista principal: índice, limite de zoom e texto de foco
+        self.indice_alvo = self.vistas[0].alvo = self.catalogo.indice.get(estado['target'].lower())
+        self.zoom_max_alvo = self.camera_controller.get_zoom_limit_for_target(self.escala_alvo(self.indice_alvo))
+        nome_foco = self.catalogo.nomes[self.indice_alvo] if self.indice_alvo is not None else estado['target']
+        self.text_focus.setText(nome_foco)
+
+    def ao_mudar_zoom(self, estado, alterados):
+        # Aplica o limite de zoom do alvo e refaz as regras de exibição das órbitas
+        estado['zoom'] = min(estado['zoom'], self.zoom_max_alvo)
+        self.vistas[0].candidatas_orbita = self.regras_orbitas(self.indice_alvo, estado['zoom'])
 
     def update_simulation(self, task):
-        # Atualiza o estado da simulação, ajusta a câmera e desenha órbitas
-        dt = globalClock.getDt()
-        global sim_days
-        sim_days += (dt / 86400) * controles.simulation_state['speed']
-        positions = self.calcular_posicoes()
-        center = Vec3(0, 0, 0)
-        target = controles.simulation_state['target']
-        target_pos = positions.get(target, center)
-        
-        # Verifica e aplica limites de zoom para o alvo atual
-        if target.lower() in astros and 'raio' in astros[target.lower()]:
-            target_scale = float(astros[target.lower()]['raio']) * MODEL_SIZE_FACTOR
-        else:
-            target_scale = 0.2
-        max_zoom_for_target = self.camera_controller.get_zoom_limit_for_target(target_scale)
-        controles.simulation_state['zoom'] = min(controles.simulation_state['zoom'], max_zoom_for_target)
-        
-        # Atualiza a câmera
-        self.camera_controller.set_target(target_pos)
-        self.camera_controller.update_from_simulation_state(controles.simulation_state)
-        camera_state = self.camera_controller.update(dt)
-        
-        # Atualiza o estado da simulação com os valores atuais da câmera
-        controles.simulation_state['camera_inclination'] = camera_state['camera_inclination']
-        controles.simulation_state['horizontal_rotation'] = camera_state['horizontal_rotation']
-        
-        MOON_ZOOM_THRESHOLD = 0.003
-        ORBIT_DISPLAY_THRESHOLD = 0.05  # Limiar para exibição de órbitas de planetas não focados
-        zoom = controles.simulation_state['zoom']
-        
-        # Determina se o alvo atual é uma lua e qual é seu planeta pai
-        target_is_moon = target.lower() in parent_moons
-        target_parent_planet = parent_moons.get(target.lower(), None) if target_is_moon else None
-        
-        # Desenha as órbitas dos corpos como linhas
-        if hasattr(self, 'orbit_lines'):
-            self.orbit_lines.removeNode()
-        ls = LineSegs()
-        ls.setThickness(1.5)  # Aumentando a espessura para melhorar visibilidade
-        num_segments = 200  # Aumentando o número de segmentos para linhas mais suaves
-        for key, astro in astros.items():
-            kl = key.lower()
-            if kl == 'sol' or ('orbital' not in astro):
-                continue
-                
-            # Determina se o corpo atual deve ter sua órbita exibida
-            show_orbit = False
-            
-            # Caso 1: É o alvo atual
-            if kl == target.lower():
-                show_orbit = True
-                
-            # Caso 2: É o planeta pai do alvo (quando o alvo é uma lua)
-            elif target_is_moon and kl == target_parent_planet:
-                show_orbit = True
-                
-            # Caso 3: É uma lua do planeta em foco
-            elif kl in parent_moons and parent_moons[kl] == target.lower():
-                show_orbit = True
-                
-            # Caso 4: Zoom está abaixo do limiar para mostrar todas as órbitas
-            elif zoom < ORBIT_DISPLAY_THRESHOLD:
-                # Para planetas, sempre mostrar
-                if kl not in parent_moons:
-                    show_orbit = True
-                # Para luas, verificar o zoom específico para luas
-                elif zoom >= MOON_ZOOM_THRESHOLD:
-                    show_orbit = True
-            
-            # Pula se não deve mostrar a órbita
-            if not show_orbit:
-                continue
-            
-            orb = astro['orbital']
-            period_days = parse_number(orb['T']) * 365.25
-            θ_base = 2 * math.pi * ((sim_days % period_days) / period_days)
-            e = orb.get('e', 0)
-            a = orb['a']
-            ω_rad = math.radians(orb.get('ω', 0))
-            i_rad = math.radians(orb.get('i', 0))
-            Ω_rad = math.radians(orb.get('Ω', 0))
-            for j in range(num_segments + 1):
-                f = (θ_base + 2 * math.pi * (j / num_segments)) + ω_rad
-                r = a * AU * MODEL_SIZE_FACTOR * (1 - e**2) / (1 + e * math.cos(f))
-                x_orb = r * math.cos(f)
-                y_orb = r * math.sin(f)
-                x = x_orb * math.cos(Ω_rad) - y_orb * math.sin(Ω_rad) * math.cos(i_rad)
-                y = x_orb * math.sin(Ω_rad) + y_orb * math.cos(Ω_rad) * math.cos(i_rad)
-                z = y_orb * math.sin(i_rad)
-                pt = Vec3(x, y, z)
-                if key in parent_moons:
-                    parent_pos = positions[parent_moons[key]]
-                    pt = parent_pos + pt
-                pt_rel = pt - self.camera_controller.camera_current_pos
-                diff = (f - (θ_base + ω_rad)) % (2 * math.pi)
-                # Ajustado o gradiente: mantém o tom mais escuro em 0.05, mas reduz o mais claro
-                intensity = 0.05 + 0.25 * (diff / (2 * math.pi))
-                ls.setColor(intensity, intensity, intensity, 1)
-                if j == 0:
-                    ls.moveTo(pt_rel)
-                else:
-                    ls.drawTo(pt_rel)
-        self.orbit_lines = self.render.attachNewNode(ls.create())
-
-        # Atualiza posição e visibilidade dos corpos conforme o zoom
-        for key, node in self.nodes.items():
-            pos = positions.get(key, center)
-            if key in astros and 'raio' in astros[key]:
-                real_scale = float(astros[key]['raio']) * MODEL_SIZE_FACTOR
-                node.setScale(real_scale)
-            else:
-                node.setScale(0.2)
-            if key == 'sol':
-                node.setPos(center - self.camera_controller.camera_current_pos)
+        # Atualiza o estado da simulação, ajusta a câmera e desenha órbitas;
+        # cada etapa é cronometrada pelo perfil
+        perfil = self.perfil
+        with perfil['quadro']:
+            dt = globalClock.getDt()
+            if self.simulacao.sincrona:
+                self.simulacao.avancar(dt)
+            with perfil['estado']:
+                # Refaz o trabalho derivado apenas para os campos do estado que mudaram
+                controles.simulation_state.processar()
+            with perfil['posicoes']:
+                self.calcular_posicoes()
+                self.atualizar_texto_dinamica()
+                if self.servidor is not None:
+                    self.servidor.publicar(self.sim_days, self.posicoes_locais)
+                self.indice.atualizar(self.posicoes_array, self.posicoes_menores,
+                                      self.instantaneo.grade_menores, self.instantaneo.folga_grade)
+
+            with perfil['camera']:
+                for vista in self.vistas:
+                    vista.controlador.set_target(
+                        self.posicoes_array[vista.alvo] if vista.alvo is not None else (0, 0, 0))
+                    camera_state = vista.controlador.update(dt)
+                    vista.ceu.ajustar(vista.controlador.lens)
+                    if vista is self.vistas[0]:
+                        # Atualiza o estado da simulação com os valores atuais da câmera principal
+                        controles.simulation_state['camera_inclination'] = camera_state['camera_inclination']
+                        controles.simulation_state['horizontal_rotation'] = camera_state['horizontal_rotation']
+
+            with perfil['lod']:
+                # Mede o tamanho projetado de órbitas e corpos em cada vista; a geometria é
+                # compartilhada, então vale o maior nível de detalhe pedido por alguma vista
+                ef = self.efemerides
+                focos = np.where(ef.pais[:, None] >= 0, self.posicoes_array[ef.pais], 0.0)
+                centros = focos - (ef.a_escalado * ef.e)[:, None] * ef.P
+                segmentos, visiveis, raio_corpo_px = 0, False, 0.0
+                for vista in self.vistas:
+                    camera_mundo = np.array(vista.controlador.posicao_no_mundo())
+                    fator = vista.controlador.fator_projecao()
+                    segmentos = np.maximum(segmentos, lod.segmentos_orbitas(
+                        ef.a_escalado, lod.distancias_orbitas(camera_mundo, centros, ef.W, ef.a_escalado), fator))
+                    raio_orbita_px = lod.tamanhos_projetados(
+                        ef.a_escalado, np.linalg.norm(centros - camera_mundo, axis=1), fator)
+                    raio_corpo_px = np.maximum(raio_corpo_px, lod.tamanhos_projetados(
+                        self.catalogo.raio_cena, np.linalg.norm(self.posicoes_array - camera_mundo, axis=1), fator))
+                    # Órbitas visíveis: as candidatas pelas regras da vista que ocupam ao menos um pixel
+                    candidatas = vista.candidatas_orbita
+                    visiveis_vista = candidatas & (raio_orbita_px >= lod.RAIO_MIN_ORBITA_PX)
+                    if vista.alvo is not None:
+                        visiveis_vista[vista.alvo] = candidatas[vista.alvo]
+                    visiveis = visiveis | visiveis_vista
+                fator = self.camera_controller.fator_projecao()  # Tamanho dos corpos menores: o da vista principal
+
+            with perfil['orbitas']:
+                self.orbitas.atualizar(set(np.flatnonzero(visiveis).tolist()), self.anomalias, segmentos)
+
+            with perfil['nos']:
+                self.posicionar_nos(raio_corpo_px)
+
+            if controles.simulation_state['rastros']:
+                with perfil['rastros']:
+                    self.rastros.atualizar(self.sim_days, self.posicoes_locais)
+
+            if self.camada_menores is not None:
+                with perfil['corpos_menores']:
+                    self.camada_menores.escrever(self.posicoes_menores, fator)
+
+        self.atualizar_sobreposicao_perfil()
+        return Task.cont
+
+    def posicionar_nos(self, raio_corpo_px):
+        # As luas usam apenas suas posições locais, compartilhadas por todas as vistas;
+        # cada vista posiciona a sua origem flutuante e os corpos de nível mais alto
+        for k in self.luas:
+            self.pivos[k].setPos(Vec3(*self.posicoes_locais[k]))
+        for vista in self.vistas:
+            vista.posicionar(self.posicoes_locais, self.posicoes_array, self.efemerides.raizes)
+
+        # Esconde corpos menores que meio pixel em todas as vistas (exceto o Sol e os alvos),
+        # alterando só os que mudaram
+        mostrar = raio_corpo_px >= lod.RAIO_MIN_CORPO_PX
+        mostrar[self.indice_sol] = True
+        for vista in self.vistas:
+            if vista.alvo is not None:
+                mostrar[vista.alvo] = True
+        for k in np.flatnonzero(mostrar != self.corpos_visiveis):
+            if mostrar[k]:
+                self.nodes[self.catalogo.chaves[k]].show()
             else:
-                if key in parent_moons and zoom < MOON_ZOOM_THRESHOLD:
-                    node.hide()
-                else:
-                    node.show()
-                    node.setPos(pos - self.camera_controller.camera_current_pos)
-                    
-        # Atualiza o texto de foco
-        sim_datetime = ref_date + timedelta(days=sim_days)
-        astro_focus = astros.get(target.lower(), {"nome": target})
-        self.text_focus.setText(astro_focus["nome"])
-        return Task.cont
\ No newline at end of file
+                self.nodes[self.catalogo.chaves[k]].hide()
+        self.corpos_visiveis = mostrar
+
+    def corpo_sob_cursor(self):
+        """Índice (no IndiceEspacial) do corpo sob o mouse, na vista em que ele está, ou None"""
+        if not self.mouseWatcherNode.hasMouse():
+            return None
+        mouse = self.mouseWatcherNode.getMouse()
+        x, y = (mouse.getX() + 1) / 2, (mouse.getY() + 1) / 2
+        largura, altura = self.win.getXSize(), self.win.getYSize()
+        for vista in self.vistas:
+            if vista.contem(x, y):
+                with self.perfil['indice']:
+                    return self.indice.escolher(*vista.projecao(largura, altura),
+                                                vista.controlador.fator_projecao(), (x * largura, y * altura))
+        return None
+
+    def clicar(self):
+        # Só os corpos do catálogo podem ser alvo; um corpo menor é apenas identificado
+        k = self.corpo_sob_cursor()
+        if k is None:
+            return
+        if k < len(self.catalogo):
+            self.focar(self.catalogo.chaves[k])
+        else:
+            print("Corpo menor:", self.indice.nomes[k])
+
+    def atualizar_dica(self, task):
+        # Nome do corpo sob o cursor, refeito a cada INTERVALO_DICA s; entre uma consulta
+        # e outra, a dica só acompanha o cursor
+        if not self.mouseWatcherNode.hasMouse():
+            self.text_dica.hide()
+            return Task.cont
+        mouse = self.mouseWatcherNode.getMouse()
+        self.text_dica.setPos(mouse.getX() * self.getAspectRatio() + 0.03, mouse.getY() - 0.06)
+        agora = globalClock.getFrameTime()
+        if agora - self._dica < INTERVALO_DICA:
+            return Task.cont
+        self._dica = agora
+        k = self.corpo_sob_cursor()
+        if k is None:
+            self.text_dica.hide()
+        else:
+            self.text_dica.setText(self.indice.nomes[k])
+            self.text_dica.show()
+        return Task.cont
+
+    def mostrar_vizinhos(self):
+        """Lista os VIZINHOS corpos mais próximos do alvo, com as distâncias em UA"""
+        if self.indice_alvo is None:
+            return
+        with self.perfil['indice']:
+            indices, distancias = self.indice.vizinhos(self.indice_alvo, VIZINHOS)
+        print("Mais próximos de %s:" % self.catalogo.nomes[self.indice_alvo])
+        for k, distancia in zip(indices, distancias):
+            print("  %-24s %.6f UA" % (self.indice.nomes[k], distancia / self.efemerides.escala))
+
+    def atualizar_sobreposicao_perfil(self):
+        # Atualiza a tabela de tempos na tela a cada meio segundo, quando visível
+        if controles.simulation_state['perfil_visivel'] and globalClock.getFrameCount() % 30 == 0:
+            self.text_perfil.setText(self.perfil.texto())
+
+    def ao_mudar_rastros(self, estado, alterados):
+        # Cada vez que são ligados, os rastros recomeçam do instante atual
+        if estado['rastros'] and self.rastros is None:
+            from src.rastros import Rastros
+            self.rastros = Rastros(self._centros, self.catalogo.cores, self.catalogo.periodo_dias,
+                                   usar_shader=self._usar_shader)
+        elif self.rastros is not None:
+            self.rastros.limpar()
+
+    def definir_textura_ceu(self, textura):
+        for vista in self.vistas:
+            vista.ceu.definir_textura(textura)
+
+    def ajustar_vistas(self):
+        # Proporção das lentes e posição dos rótulos conforme o tamanho de cada região
+        for vista in self.vistas:
+            vista.ajustar_janela(self.getAspectRatio())
+
+    def windowEvent(self, win):
+        # O ShowBase ajusta a lente principal à janela inteira; cada vista ocupa só a sua região
+        ShowBase.windowEvent(self, win)
+        if win == self.win:
+            self.ajustar_vistas()
+
+    def ao_mudar_perfil_visivel(self, estado, alterados):
+        if estado['perfil_visivel']:
+            self.text_perfil.setText(self.perfil.texto())
+            self.text_perfil.show()
+        else:
+            self.text_perfil.hide()
+
+    def salvar_perfil(self):
+        """Grava o relatório de tempos por etapa em JSON"""
+        caminho = self.caminho_perfil or 'perfil_%s.json' % datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        print("Perfil salvo em", self.perfil.salvar(caminho))
+
+    def reproduzir_quadro(self, task):
+        # Aplica as ações gravadas até o instante deste quadro e mede o quadro anterior
+        tempo = globalClock.getFrameTime() - self.inicio_reproducao
+        self.reprodutor.marcar_quadro()
+        if self.reprodutor.terminou(tempo):
+            self.encerrar_reproducao()
+            return Task.done
+        self.reprodutor.aplicar(tempo)
+        return Task.cont
+
+    def encerrar_reproducao(self):
+        """Grava os tempos de quadro da reprodução em JSON e encerra a aplicação"""
+        relatorio = self.reprodutor.relatorio(
+            self.posicoes_array,
+            ambiente={'panda3d': PandaSystem.getVersionString(),
+                      'pipe': self.pipe.getInterfaceName() if self.pipe is not None else None},
+            gravacao=self.caminho_gravacao,
+            tempo_final=self.sim_days,
+            etapas=self.perfil.relatorio()['etapas'])
+        caminho = self.caminho_resultado or 'reproducao_%s.json' % datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        with open(caminho, 'w', encoding='utf8') as f:
+            json.dump(relatorio, f, indent=1, ensure_ascii=False)
+        resumo = relatorio['quadro_ms'] or {}
+        print("Reprodução concluída: %d quadros, p50 %.2f ms, p99 %.2f ms, assinatura %s -> %s" % (
+            relatorio['quadros'], resumo.get('p50', 0), resumo.get('p99', 0), relatorio['assinatura'], caminho))
+        self.userExit()
+
+    def concluir_partida(self, task):
+        # Executada uma vez, ao fim do primeiro quadro desenhado
+        self.partida.marcar('primeiro_quadro')
+        if self.caminho_partida:
+            print("Tempos da partida:\n" + self.partida.texto())
+            if self.caminho_partida != '-':
+                with open(self.caminho_partida, 'w', encoding='utf8') as f:
+                    json.dump(self.partida.relatorio(), f, indent=2, ensure_ascii=False)
+        return Task.done
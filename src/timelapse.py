@@ -0,0 +1,217 @@
+# Time-lapse sem janela: a cena é renderizada em um buffer fora da tela com
+# passo de tempo simulado fixo por quadro, e a codificação (PNG ou RGB bruto) e
+# a gravação de cada imagem ficam com um conjunto de threads com fila limitada.
+# O resultado tem sempre a mesma cadência, por mais que cada quadro demore.
+#
+# Uso: python -m src.timelapse --inicio 2024-01-01 --fim 2025-01-01 --passo 12h \
+#          --alvo sol --zoom 0.02 --saida quadros/ --tinydisplay
+import argparse, json, math, os, struct, time, zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from panda3d.core import loadPrcFileData, ClockObject, GraphicsOutput, Texture
+
+import src.controles as controles
+from src.exportar import ler_data, ler_passo
+from src.vistas import ler_vista
+
+FORMATOS = ('png', 'raw')
+NIVEL_COMPRESSAO = 6      # zlib: o nível padrão equilibra tamanho e tempo por quadro
+QUADROS_NA_FILA = 2       # Quadros pendentes por thread antes de a renderização esperar
+
+
+def codificar_png(pixels):
+    """PNG RGB de 8 bits a partir de um array (altura × largura × 3).
+
+    Usa apenas zlib, que libera o GIL durante a compressão: várias threads
+    codificam quadros em paralelo com a renderização.
+    """
+    altura, largura, _ = pixels.shape
+    linhas = np.empty((altura, 1 + largura * 3), dtype=np.uint8)
+    linhas[:, 0] = 0  # Filtro "nenhum" em todas as linhas
+    linhas[:, 1:] = pixels.reshape(altura, -1)
+
+    def bloco(tipo, dados):
+        return struct.pack('>I', len(dados)) + tipo + dados + struct.pack('>I', zlib.crc32(tipo + dados))
+
+    cabecalho = struct.pack('>IIBBBBB', largura, altura, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + bloco(b'IHDR', cabecalho) +
+            bloco(b'IDAT', zlib.compress(linhas.tobytes(), NIVEL_COMPRESSAO)) + bloco(b'IEND', b''))
+
+
+def gravar_quadro(caminho, dados, largura, altura, formato, componentes=3):
+    # Executado nas threads de gravação; a imagem do Panda3D vem de baixo para cima,
+    # em BGR ou BGRA: as linhas são invertidas e os canais trocados (sem o alfa) aqui
+    pixels = np.frombuffer(dados, dtype=np.uint8).reshape(altura, largura, componentes)[::-1, :, 2::-1]
+    with open(caminho, 'wb') as f:
+        f.write(codificar_png(pixels) if formato == 'png' else pixels.tobytes())
+
+
+class GravadorQuadros:
+    """Grava quadros em segundo plano, com no máximo `fila` quadros pendentes na memória.
+
+    A renderização só espera quando o disco (ou a codificação) fica para trás
+    por mais que a fila inteira; esse tempo fica registrado em `espera`.
+    """
+
+    def __init__(self, diretorio, formato, largura, altura, threads=None, fila=None):
+        if formato not in FORMATOS:
+            raise ValueError("Formato desconhecido: %s" % formato)
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.formato = formato
+        self.largura = largura
+        self.altura = altura
+        threads = threads or os.cpu_count() or 1
+        self.fila = fila or QUADROS_NA_FILA * threads
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='timelapse')
+        self.pendentes = deque()
+        self.quadros = 0
+        self.espera = 0.0  # Segundos em que a renderização ficou parada esperando a fila
+
+    def caminho(self, indice):
+        return os.path.join(self.diretorio, 'quadro_%06d.%s' % (indice, self.formato))
+
+    def enviar(self, dados, componentes=3):
+        """Enfileira os bytes BGR ou BGRA de um quadro (de baixo para cima, como o Panda3D os entrega)"""
+        if len(self.pendentes) >= self.fila:
+            inicio = time.perf_counter()
+            self.pendentes.popleft().result()
+            self.espera += time.perf_counter() - inicio
+        self.pendentes.append(self.executor.submit(
+            gravar_quadro, self.caminho(self.quadros), dados, self.largura, self.altura, self.formato,
+            componentes))
+        self.quadros += 1
+
+    def fechar(self):
+        while self.pendentes:
+            self.pendentes.popleft().result()
+        self.executor.shutdown()
+
+
+class Timelapse:
+    """Captura os quadros renderizados por um SistemaSolar fora da tela.
+
+    O relógio do Panda3D passa a avançar 1/fps por quadro, independentemente
+    do tempo real, e a velocidade da simulação é ajustada para que cada quadro
+    avance exatamente `passo` dias simulados.
+    """
+
+    def __init__(self, app, gravador, quadros, passo, fps):
+        self.app = app
+        self.gravador = gravador
+        self.total = quadros
+        self.fps = fps
+        self.tempos = []  # Dias desde J2000 de cada quadro gravado
+        self.inicio = None
+
+        globalClock = ClockObject.getGlobalClock()
+        globalClock.setMode(ClockObject.MNonRealTime)
+        globalClock.setFrameRate(fps)
+        controles.simulation_state['speed'] = passo * 86400 * fps
+        # A câmera acompanha o alvo sem atraso: com passos grandes, a transição suave ficaria para trás
+        for vista in app.vistas:
+            vista.controlador.transition_speed = fps
+
+        # A cada quadro renderizado, o Panda3D copia a imagem do buffer para a memória da textura
+        self.textura = Texture('timelapse')
+        app.win.addRenderTexture(self.textura, GraphicsOutput.RTMCopyRam)
+        app.taskMgr.add(self.capturar, 'timelapse', sort=55)  # Depois de igLoop (50), que renderiza
+
+    def capturar(self, task):
+        if not self.textura.hasRamImage():
+            return task.cont  # O primeiro quadro ainda não foi renderizado
+        if self.inicio is None:
+            self.inicio = time.perf_counter()
+        # Uma cópia da imagem como está na textura (o próximo quadro a sobrescreve);
+        # a conversão para RGB e a gravação ficam com as threads
+        self.gravador.enviar(bytes(memoryview(self.textura.getRamImage())), self.textura.getNumComponents())
+        self.tempos.append(self.app.simulacao.tempo)
+        if self.gravador.quadros >= self.total:
+            self.concluir()
+            return task.done
+        return task.cont
+
+    def concluir(self):
+        renderizacao = time.perf_counter() - self.inicio
+        self.gravador.fechar()
+        metadados = {
+            'quadros': self.gravador.quadros,
+            'largura': self.gravador.largura,
+            'altura': self.gravador.altura,
+            'formato': self.gravador.formato,
+            'pixels': 'rgb24, de cima para baixo',
+            'fps': self.fps,
+            'dias_j2000': self.tempos,
+            'segundos_renderizacao': renderizacao,
+            'segundos_espera_gravacao': self.gravador.espera,
+        }
+        with open(os.path.join(self.gravador.diretorio, 'timelapse.json'), 'w', encoding='utf8') as f:
+            json.dump(metadados, f, indent=1, ensure_ascii=False)
+        print("%d quadros gravados em %s (%.1f quadros/s, %.1f s esperando a gravação)" % (
+            self.gravador.quadros, self.gravador.diretorio, self.gravador.quadros / max(renderizacao, 1e-9),
+            self.gravador.espera))
+        self.app.userExit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Renderiza um time-lapse do Sistema Solar sem abrir janela")
+    parser.add_argument('--inicio', default='2000-01-01T12:00', help="Data ISO ou dias desde J2000")
+    intervalo = parser.add_mutually_exclusive_group(required=True)
+    intervalo.add_argument('--fim', help="Data ISO ou dias desde J2000 (inclusivo)")
+    intervalo.add_argument('--quadros', type=int, help="Número de quadros")
+    parser.add_argument('--passo', default='1d', help="Tempo simulado por quadro: 30min, 6h, 1d...")
+    parser.add_argument('--fps', type=float, default=30.0, help="Cadência do vídeo final (transições da câmera)")
+    parser.add_argument('--saida', required=True, help="Diretório dos quadros")
+    parser.add_argument('--formato', choices=FORMATOS, default='png')
+    parser.add_argument('--largura', type=int, default=1280)
+    parser.add_argument('--altura', type=int, default=720)
+    parser.add_argument('--alvo', default='terra', help="Corpo em foco")
+    parser.add_argument('--zoom', type=float, default=1.0)
+    parser.add_argument('--inclinacao', type=float, default=0.2, help="Inclinação da câmera (rad)")
+    parser.add_argument('--vista', action='append', default=[], metavar='ALVO[:ZOOM]',
+                        help="Vista adicional, lado a lado com a principal (repetível)")
+    parser.add_argument('--sem-texto', action='store_true', help="Oculta os textos na tela")
+    parser.add_argument('--threads', type=int, default=None, help="Threads de gravação (padrão: número de CPUs)")
+    parser.add_argument('--fila', type=int, default=None, help="Quadros pendentes antes de a renderização esperar")
+    parser.add_argument('--tinydisplay', action='store_true',
+                        help="Rasterizador em software do Panda3D (máquinas sem GPU)")
+    args = parser.parse_args(argv)
+
+    try:
+        inicio = ler_data(args.inicio)
+        passo = ler_passo(args.passo)
+        quadros = args.quadros if args.quadros is not None else \
+            int(math.floor((ler_data(args.fim) - inicio) / passo + 1e-9)) + 1
+        vistas = [ler_vista(texto) for texto in args.vista]
+    except ValueError as erro:
+        parser.error(str(erro))
+    if quadros < 1:
+        parser.error("o intervalo não contém nenhum quadro")
+    if not args.fps > 0:
+        parser.error("--fps deve ser positivo")
+    if args.largura < 1 or args.altura < 1:
+        parser.error("--largura e --altura devem ser positivas")
+
+    loadPrcFileData('', 'win-size %d %d' % (args.largura, args.altura))
+    loadPrcFileData('', 'audio-library-name null')
+    from src.sistema import SistemaSolar
+    # Cada quadro avança um passo antes de ser renderizado: o primeiro mostra `inicio`
+    app = SistemaSolar(offscreen=True, tinydisplay=args.tinydisplay, fisica_sincrona=True, epoca=inicio - passo,
+                       vistas=vistas)
+    estado = controles.simulation_state
+    estado['target'] = args.alvo
+    estado['zoom'] = args.zoom
+    estado['target_inclination'] = args.inclinacao
+    if args.sem_texto:
+        app.aspect2d.hide()
+    app.recursos.aguardar()  # Todos os quadros com as texturas completas, e não com as miniaturas
+    gravador = GravadorQuadros(args.saida, args.formato, app.win.getXSize(), app.win.getYSize(),
+                               args.threads, args.fila)
+    Timelapse(app, gravador, quadros, passo, args.fps)
+    app.run()
+
+
+if __name__ == '__main__':
+    main()
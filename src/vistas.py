@@ -0,0 +1,117 @@
+# Várias vistas simultâneas na mesma janela: cada vista tem a sua câmera, a sua
+# região da janela, o seu alvo e a sua origem flutuante. A cena (corpos, órbitas,
+# rastros, corpos menores) é uma só e é calculada uma vez por quadro: o heliocentro
+# e o pivô de cada corpo de nível mais alto são instanciados sob nós de suporte
+# próprios de cada vista, que recebem as posições relativas ao alvo dessa vista
+# (em precisão dupla). Uma vista a mais custa só a renderização e alguns setPos.
+import math
+
+import numpy as np
+from panda3d.core import Camera, Mat4, NodePath, Vec3, Vec3D, Vec4
+
+from src.camera import CameraController
+from src.ceu import Ceu
+
+
+def ler_vista(texto):
+    """Lê 'alvo[:zoom]' (ex.: 'jupiter:0.02') e devolve (alvo, zoom)"""
+    alvo, _, zoom = texto.partition(':')
+    if not alvo:
+        raise ValueError("Vista sem alvo: %r" % texto)
+    try:
+        zoom = float(zoom) if zoom else 1.0
+    except ValueError:
+        raise ValueError("Zoom inválido na vista %r" % texto) from None
+    if not zoom > 0:
+        raise ValueError("O zoom da vista %r deve ser positivo" % texto)
+    return alvo.lower(), zoom
+
+
+def disposicao(n):
+    """Regiões (esquerda, direita, baixo, cima) de n vistas em grade, a primeira no canto superior esquerdo"""
+    colunas = math.ceil(math.sqrt(n))
+    linhas = math.ceil(n / colunas)
+    regioes = []
+    for i in range(n):
+        linha, coluna = divmod(i, colunas)
+        regioes.append((coluna / colunas, (coluna + 1) / colunas,
+                        1 - (linha + 1) / linhas, 1 - linha / linhas))
+    return regioes
+
+
+class Vista:
+    """Câmera, região da janela, alvo e origem flutuante de uma vista.
+
+    raiz é a raiz da cena desta vista (render para a vista principal), sob a qual
+    ficam a câmera e as luzes; heliocentro e pivos_raiz (índice -> pivô dos corpos
+    de nível mais alto) são os nós compartilhados entre as vistas.
+    """
+
+    def __init__(self, app, raiz, camera, lente, regiao, heliocentro, pivos_raiz, alvo=None, rotulo=None):
+        self.raiz = raiz
+        self.regiao = regiao
+        self.alvo = alvo                 # Índice do corpo em foco (None: o Sol fica na origem)
+        self.rotulo = rotulo             # OnscreenText com o nome do alvo, no topo da região
+        self.candidatas_orbita = None    # Órbitas que as regras de exibição permitem nesta vista
+        self.controlador = CameraController(app, camera=camera, lens=lente, regiao=regiao)
+        self.ceu = Ceu(camera)
+
+        self.origem = raiz.attachNewNode('origem_flutuante')
+        self.suporte_heliocentro = self.origem.attachNewNode('suporte_heliocentro')
+        heliocentro.instanceTo(self.suporte_heliocentro)
+        self.suportes = {}
+        for k, pivo in pivos_raiz.items():
+            self.suportes[k] = self.origem.attachNewNode('suporte_%s' % pivo.getName())
+            pivo.instanceTo(self.suportes[k])
+
+    @classmethod
+    def extra(cls, app, nome, regiao, lente, heliocentro, pivos_raiz, **kwargs):
+        """Vista com uma cena e uma câmera próprias, desenhada em uma nova região da janela"""
+        raiz = NodePath(nome)
+        camera = raiz.attachNewNode('camera')
+        cam = camera.attachNewNode(Camera('cam', lente))
+        regiao = app.win.makeDisplayRegion(*regiao)
+        regiao.setCamera(cam)
+        return cls(app, raiz, camera, lente, regiao, heliocentro, pivos_raiz, **kwargs)
+
+    def encontrar(self, nome):
+        """Caminho de um nó compartilhado pela instância desta vista (ex.: a luz do Sol)"""
+        return self.origem.find('**/' + nome)
+
+    def posicionar(self, posicoes_locais, posicoes, raizes):
+        # Os corpos de nível mais alto ficam em relação ao ancestral de nível mais alto
+        # do alvo (em precisão dupla), e só a origem recebe o deslocamento da câmera
+        ancora = posicoes[raizes[self.alvo]] if self.alvo is not None else np.zeros(3)
+        self.origem.setPos(Vec3(*(Vec3D(*ancora) - self.controlador.camera_current_pos)))
+        self.suporte_heliocentro.setPos(Vec3(*-ancora))
+        for k, suporte in self.suportes.items():
+            suporte.setPos(Vec3(*(posicoes_locais[k] - ancora)))
+
+    def contem(self, x, y):
+        """Se o ponto (frações da janela, a partir do canto inferior esquerdo) está na região"""
+        esquerda, direita, baixo, cima = self.regiao.getDimensions()
+        return esquerda <= x < direita and baixo <= y < cima
+
+    def projecao(self, largura, altura):
+        """Posição da câmera na cena, visão (só rotação) seguida da projeção da lente, e região em pixels.
+
+        É o que src.indice_espacial.projetar espera: a translação da câmera fica
+        de fora da matriz para ser subtraída em precisão dupla.
+        """
+        visao = Mat4()
+        visao.invertFrom(self.controlador.camera.getMat())
+        visao.setRow(3, Vec4(0, 0, 0, 1))
+        matriz = visao * self.controlador.lens.getProjectionMat()
+        esquerda, direita, baixo, cima = self.regiao.getDimensions()
+        return (np.array(self.controlador.posicao_no_mundo()),
+                np.array([list(matriz.getRow(i)) for i in range(4)]),
+                (esquerda * largura, direita * largura, baixo * altura, cima * altura))
+
+    def ajustar_janela(self, aspecto_janela):
+        """Proporção da lente e posição do rótulo após uma mudança no tamanho da janela"""
+        largura, altura = self.regiao.getPixelWidth(), self.regiao.getPixelHeight()
+        if largura > 0 and altura > 0:
+            self.controlador.lens.setAspectRatio(largura / altura)
+        if self.rotulo is not None:
+            esquerda, direita, _, cima = self.regiao.getDimensions()
+            self.rotulo.setPos((esquerda + direita - 1) * aspecto_janela, 2 * cima - 1.1)